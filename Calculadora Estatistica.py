@@ -1,10 +1,39 @@
 import streamlit as st
+import os
+import time
+
 import numpy as np
-from scipy import stats
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 
+from calculadora import (
+    agregar_eventos_por_variante,
+    calcular_tamanho_amostra_ab,
+    calcular_tamanho_amostra_ab_lote,
+    dados_teste_de_estatisticas,
+    resumir_estatisticas,
+)
+from calculadora.arquivos import CACHE_ARQUIVOS, caminho_parquet, ler_tabela
+from calculadora.cache import CACHE_CALCULOS, CACHE_FIGURAS, memoizar
+from calculadora.sequencial import EstadoSequencial, registrar_acumulado, tau2_padrao
+from calculadora.simulacao import simular_plano
+from calculadora.bandit import simular_bandit_plano
+from calculadora.solucionador import poder_teste, resolver_efeito_minimo, resolver_tamanho_amostra
+from calculadora.multivariante import comparacoes_pareadas, tamanho_amostra_k_bracos, teste_qui_quadrado
+from calculadora.bayesiano import analisar_bayesiano, monte_carlo_k_bracos
+from calculadora.bootstrap import bootstrap_diferenca_medias
+from calculadora.armazenamento import COLUNAS_SNAPSHOT, abrir_armazem
+from calculadora.cuped import agregar_cuped, ajustar_plano_cuped, analisar_cuped
+from calculadora.previsao import prever_duracao
+from calculadora.exato import calcular_teste_exato, contagens_validas
+from calculadora.razao import agregar_razao, analisar_razao
+from calculadora.segmentos import (agregar_por_segmento, colunas_disponiveis, matriz_segmentos,
+                                   testar_segmentos)
+from calculadora import instrumentacao
+from calculadora.instrumentacao import medir, secao
+from calculadora.graficos import histograma, limitar_payload, traco_dispersao
+
 # Configurar página
 st.set_page_config(
     page_title="Calculadora A/B Testing",
@@ -51,81 +80,277 @@ st.markdown("""
 st.title("🎯 Calculadora Completa de Testes A/B")
 st.markdown("**Planeje, execute e valide seus testes A/B com precisão estatística**")
 
-# === FUNÇÕES BACKEND (suas funções originais) ===
-def calcular_tamanho_amostra_ab(taxa_base, melhoria_minima_detectar, poder_estatistico=0.80, nivel_significancia=0.05, split_ratio=0.5):
-    # Determinar se é melhoria absoluta ou relativa
-    if melhoria_minima_detectar > taxa_base:
-        taxa_variacao = taxa_base * (1 + melhoria_minima_detectar)
-        effect_size = taxa_variacao - taxa_base
-        tipo_melhoria = "relativa"
-    else:
-        effect_size = melhoria_minima_detectar
-        taxa_variacao = taxa_base + effect_size
-        tipo_melhoria = "absoluta"
-    
-    # Z-scores
-    z_alpha = stats.norm.ppf(1 - nivel_significancia/2)
-    z_beta = stats.norm.ppf(poder_estatistico)
-    
-    # Proporção média
-    p_avg = (taxa_base + taxa_variacao) / 2
-    
-    # Cálculo do tamanho da amostra por grupo
-    numerator = (z_alpha + z_beta) ** 2 * p_avg * (1 - p_avg)
-    denominator = effect_size ** 2
-    n_per_group = numerator / denominator
-    
-    # Ajustar para split ratio
-    n_control = int(np.ceil(n_per_group / split_ratio))
-    n_treatment = int(np.ceil(n_per_group / (1 - split_ratio)))
-    n_total = n_control + n_treatment
-    
-    # Calcular métricas derivadas
-    melhoria_relativa = (effect_size / taxa_base) * 100
-    
-    return {
-        'n_controle': n_control,
-        'n_variacao': n_treatment, 
-        'n_total': n_total,
-        'taxa_base': taxa_base,
-        'taxa_variacao': taxa_variacao,
-        'effect_size': effect_size,
-        'melhoria_relativa': melhoria_relativa,
-        'poder_estatistico': poder_estatistico,
-        'nivel_significancia': nivel_significancia,
-        'tipo_melhoria': tipo_melhoria
-    }
-
-def calcular_teste_atual(conversions_a, visitors_a, conversions_b, visitors_b):
-    """Calcula métricas do teste atual"""
-    p_a = conversions_a / visitors_a
-    p_b = conversions_b / visitors_b
-    diff_abs = p_b - p_a
-    diff_rel = (p_b - p_a) / p_a * 100 if p_a > 0 else 0
-    
-    # Teste estatístico
-    p_pooled = (conversions_a + conversions_b) / (visitors_a + visitors_b)
-    se_diff = np.sqrt(p_pooled * (1 - p_pooled) * (1/visitors_a + 1/visitors_b))
-    z_score = diff_abs / se_diff if se_diff > 0 else 0
-    p_value = 2 * (1 - stats.norm.cdf(abs(z_score))) if z_score != 0 else 1
-    
-    # IC 95%
-    margin = 1.96 * se_diff
-    ci_lower = diff_abs - margin
-    ci_upper = diff_abs + margin
-    
-    return {
-        'p_a': p_a, 'p_b': p_b, 'diff_abs': diff_abs, 'diff_rel': diff_rel,
-        'z_score': z_score, 'p_value': p_value, 'ci_lower': ci_lower, 'ci_upper': ci_upper
-    }
+# === CACHE DE CÁLCULOS E GRÁFICOS ===
+# Compartilhado entre reexecuções e sessões: só recalcula quando as entradas mudam
+calcular_tamanho_amostra_ab = memoizar(CACHE_CALCULOS)(calcular_tamanho_amostra_ab)
+calcular_tamanho_amostra_ab_lote = memoizar(CACHE_CALCULOS)(calcular_tamanho_amostra_ab_lote)
+calcular_teste_exato = memoizar(CACHE_CALCULOS)(calcular_teste_exato)
+simular_plano = memoizar(CACHE_CALCULOS)(simular_plano)
+simular_bandit_plano = memoizar(CACHE_CALCULOS)(simular_bandit_plano)
+resolver_tamanho_amostra = memoizar(CACHE_CALCULOS)(resolver_tamanho_amostra)
+resolver_efeito_minimo = memoizar(CACHE_CALCULOS)(resolver_efeito_minimo)
+comparacoes_pareadas = memoizar(CACHE_CALCULOS)(comparacoes_pareadas)
+analisar_bayesiano = memoizar(CACHE_CALCULOS)(analisar_bayesiano)
+bootstrap_diferenca_medias = memoizar(CACHE_CALCULOS)(bootstrap_diferenca_medias)
+prever_duracao = memoizar(CACHE_CALCULOS)(prever_duracao)
+analisar_cuped = memoizar(CACHE_CALCULOS)(analisar_cuped)
+analisar_razao = memoizar(CACHE_CALCULOS)(analisar_razao)
+# Os uploads chegam aqui como caminhos de Parquet com o hash do conteúdo no nome
+agregar_eventos_por_variante = memoizar(CACHE_CALCULOS)(agregar_eventos_por_variante)
+agregar_por_segmento = memoizar(CACHE_CALCULOS)(agregar_por_segmento)
+agregar_cuped = memoizar(CACHE_CALCULOS)(agregar_cuped)
+agregar_razao = memoizar(CACHE_CALCULOS)(agregar_razao)
+
+# Regras de parada e nomes das políticas do simulador de alocação adaptativa
+REGRAS_BANDIT = {
+    "mSPRT (sempre válido)": 'msprt',
+    "Bayesiana (P(B > A) ≥ 95%)": 'bayesiana',
+    "Horizonte fixo (teste z no fim)": 'horizonte',
+}
+NOMES_POLITICAS = {'fixa': "Divisão fixa", 'thompson': "Thompson sampling", 'epsilon_guloso': "ε-guloso"}
+
+# Opções do solucionador para cada método de cálculo (None = fórmula clássica)
+METODOS_CALCULO = {
+    "Fórmula clássica": None,
+    "Variâncias não agrupadas": {'variancia': 'nao_agrupada'},
+    "Binomial exato": {'variancia': 'agrupada', 'exato': True},
+}
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_cenarios")
+def figura_cenarios(df_cenarios, orcamento_dias):
+    fig = px.bar(
+        df_cenarios, 
+        x='Cenário', 
+        y='Dias Necessários',
+        color='Dias Necessários',
+        title="Duração do Teste por Cenário"
+    )
+    fig.add_hline(y=orcamento_dias, line_dash="dash", line_color="red", 
+                 annotation_text=f"Orçamento: {orcamento_dias} dias")
+    return fig
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_intervalo_confianca")
+def figura_intervalo_confianca(ci_lower, ci_upper, diff_abs):
+    fig_ic = go.Figure()
+    
+    # Linha do intervalo
+    fig_ic.add_trace(go.Scatter(
+        x=[ci_lower*100, ci_upper*100], 
+        y=[1, 1],
+        mode='lines+markers',
+        line=dict(width=8, color='blue'),
+        marker=dict(size=10),
+        name='IC 95%'
+    ))
+    
+    # Ponto da diferença observada
+    fig_ic.add_trace(go.Scatter(
+        x=[diff_abs*100], 
+        y=[1],
+        mode='markers',
+        marker=dict(size=15, color='red'),
+        name='Diferença Observada'
+    ))
+    
+    # Linha do zero
+    fig_ic.add_vline(x=0, line_dash="dash", line_color="gray", 
+                    annotation_text="Diferença = 0")
+    
+    fig_ic.update_layout(
+        title="Intervalo de Confiança da Diferença",
+        xaxis_title="Diferença (%)",
+        yaxis=dict(showticklabels=False, range=[0.5, 1.5]),
+        height=300
+    )
+    return fig_ic
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_pvalores")
+def figura_pvalores(df_resultados):
+    # Agregado no servidor: 50 barras em vez de um valor por experimento
+    fig_pvalores = go.Figure(histograma(df_resultados['p_value'], nbins=50, intervalo=(0, 1)))
+    fig_pvalores.update_layout(title="Distribuição dos P-valores", xaxis_title="p_value",
+                               yaxis_title="Experimentos", bargap=0)
+    fig_pvalores.add_vline(x=0.05, line_dash="dash", line_color="red")
+    return fig_pvalores
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_melhoria_significancia")
+def figura_melhoria_significancia(df_resultados):
+    menos_log10_p = -np.log10(df_resultados['p_value'].clip(lower=1e-300))
+    fig_volcano = go.Figure()
+    for significativo, nome in [(False, "Não significativo"), (True, "Significativo")]:
+        filtro = (df_resultados['significativo'] == significativo).to_numpy()
+        fig_volcano.add_trace(traco_dispersao(
+            df_resultados['diff_rel'].to_numpy()[filtro], menos_log10_p.to_numpy()[filtro],
+            modo='pontos', mode='markers', name=nome
+        ))
+    fig_volcano.update_layout(title="Melhoria vs. Significância", xaxis_title="Melhoria (%)",
+                              yaxis_title="-log10(p-valor)")
+    fig_volcano.add_hline(y=-np.log10(0.05), line_dash="dash", line_color="red")
+    return limitar_payload(fig_volcano)
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_comparacao")
+def figura_comparacao(p_a, p_b):
+    fig_compare = go.Figure(data=[
+        go.Bar(name='Grupo A', x=['Taxa de Conversão'], y=[p_a*100]),
+        go.Bar(name='Grupo B', x=['Taxa de Conversão'], y=[p_b*100])
+    ])
+    
+    fig_compare.update_layout(
+        title="Comparação de Taxa de Conversão",
+        yaxis_title="Taxa de Conversão (%)",
+        barmode='group'
+    )
+    return fig_compare
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_trajetoria_sequencial")
+def figura_trajetoria_sequencial(trajetoria):
+    df_traj = pd.DataFrame(trajetoria)
+    fig_seq = go.Figure()
+    fig_seq.add_trace(traco_dispersao(
+        df_traj['visitantes'], df_traj['limite_z'], mode='lines',
+        line=dict(color='red', dash='dash'), name='Limite superior'
+    ))
+    fig_seq.add_trace(traco_dispersao(
+        df_traj['visitantes'], -df_traj['limite_z'], mode='lines',
+        line=dict(color='red', dash='dash'), name='Limite inferior'
+    ))
+    fig_seq.add_trace(traco_dispersao(
+        df_traj['visitantes'], df_traj['z_score'], mode='lines+markers',
+        line=dict(color='blue'), name='Estatística Z'
+    ))
+    fig_seq.update_layout(
+        title="Trajetória do Teste Sequencial (mSPRT)",
+        xaxis_title="Visitantes Acumulados",
+        yaxis_title="Z-score",
+        height=400
+    )
+    return fig_seq
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_matriz_p_valores")
+def figura_matriz_p_valores(p_ajustado, nomes):
+    fig_matriz = px.imshow(
+        p_ajustado, x=nomes, y=nomes, zmin=0, zmax=1,
+        color_continuous_scale="RdYlGn_r", text_auto=".3f",
+        labels=dict(x="Variante", y="Comparada com", color="P-valor ajustado"),
+        title="P-valores Ajustados por Par"
+    )
+    return fig_matriz
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_mapa_segmentos")
+def figura_mapa_segmentos(melhoria, p_ajustado, nivel_significancia):
+    # Células significativas após a correção ganham um asterisco
+    texto = [[f"{m:+.1f}%{'*' if p < nivel_significancia else ''}<br>p={p:.3f}" if np.isfinite(m) else ""
+              for m, p in zip(linha_m, linha_p)]
+             for linha_m, linha_p in zip(melhoria.to_numpy(), p_ajustado.to_numpy())]
+    limite = np.nanmax(np.abs(melhoria.to_numpy())) if np.isfinite(melhoria.to_numpy()).any() else 1.0
+    fig_mapa = go.Figure(go.Heatmap(
+        z=melhoria.to_numpy(), x=[str(c) for c in melhoria.columns], y=[str(i) for i in melhoria.index],
+        text=texto, texttemplate="%{text}", colorscale="RdYlGn", zmid=0, zmin=-limite, zmax=limite,
+        colorbar=dict(title="Melhoria (%)")
+    ))
+    fig_mapa.update_layout(title="Melhoria por Segmento (* significativo após correção)",
+                           xaxis_title=melhoria.columns.name or "", yaxis_title=melhoria.index.name,
+                           height=max(350, 40 * len(melhoria.index) + 150))
+    return fig_mapa
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_historico_experimento")
+def figura_historico_experimento(historico):
+    fig_historico = go.Figure()
+    fig_historico.add_trace(traco_dispersao(
+        historico['data'], historico['p_value'], mode='lines+markers',
+        line=dict(color='blue'), name='P-valor'
+    ))
+    fig_historico.add_trace(traco_dispersao(
+        historico['data'], historico['progresso'], mode='lines',
+        line=dict(color='green', dash='dot'), name='Progresso (%)', yaxis='y2'
+    ))
+    fig_historico.add_hline(y=0.05, line_dash="dash", line_color="red")
+    fig_historico.update_layout(
+        title="Histórico do Experimento",
+        xaxis_title="Data",
+        yaxis=dict(title="P-valor", type="log"),
+        yaxis2=dict(title="Progresso da Amostra Ideal (%)", overlaying="y", side="right", rangemode="tozero"),
+        height=400
+    )
+    return fig_historico
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_previsao_duracao")
+def figura_previsao_duracao(acumulado_quantis, quantis, data_inicio, n_total, orcamento_dias):
+    datas = pd.date_range(data_inicio, periods=acumulado_quantis.shape[1])
+    inferior, mediana, superior = acumulado_quantis[0], acumulado_quantis[len(quantis) // 2], acumulado_quantis[-1]
+    fig_previsao = go.Figure()
+    fig_previsao.add_trace(go.Scatter(x=datas, y=superior, mode='lines', line=dict(width=0),
+                                      showlegend=False, hoverinfo='skip'))
+    fig_previsao.add_trace(go.Scatter(
+        x=datas, y=inferior, mode='lines', line=dict(width=0), fill='tonexty',
+        fillcolor='rgba(31, 119, 180, 0.2)', name=f"Faixa {quantis[0]:.0%}–{quantis[-1]:.0%}"
+    ))
+    fig_previsao.add_trace(go.Scatter(x=datas, y=mediana, mode='lines', line=dict(color='blue'), name='Mediana'))
+    fig_previsao.add_hline(y=n_total, line_dash="dash", line_color="green", annotation_text="Amostra necessária")
+    fig_previsao.add_vline(x=datas[0] + pd.Timedelta(days=orcamento_dias - 1), line_dash="dot", line_color="red")
+    fig_previsao.update_layout(title="Visitantes Acumulados no Teste", xaxis_title="Data",
+                               yaxis_title="Visitantes", height=400)
+    return fig_previsao
+
+def mostrar_grafico(fig):
+    """Envia a figura ao navegador (serialização do plotly incluída na medição)"""
+    with secao("grafico.st_plotly_chart"):
+        st.plotly_chart(fig, use_container_width=True)
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_curva_poder")
+def figura_curva_poder(taxa_base, taxa_variacao, split_ratio, nivel_significancia, poder_alvo, n_planejado,
+                       reducao_variancia=0.0):
+    n_total = np.linspace(10, 3 * n_planejado, 2000)
+    # Com CUPED cada visitante vale 1 / (1 - redução) visitantes sem ajuste
+    n_efetivo = n_total / (1 - reducao_variancia)
+    poder = poder_teste(taxa_base, taxa_variacao, n_efetivo * split_ratio, n_efetivo * (1 - split_ratio),
+                        nivel_significancia)
+    fig_poder = go.Figure(traco_dispersao(n_total, poder * 100, mode='lines', name='Poder'))
+    fig_poder.add_hline(y=poder_alvo * 100, line_dash="dash", line_color="red",
+                        annotation_text=f"Poder alvo: {poder_alvo:.0%}")
+    fig_poder.add_vline(x=n_planejado, line_dash="dot", line_color="gray",
+                        annotation_text="Amostra planejada")
+    fig_poder.update_layout(title="Curva de Poder", xaxis_title="Visitantes Totais",
+                            yaxis_title="Poder (%)", height=350)
+    return fig_poder
+
+@memoizar(CACHE_FIGURAS)
+@medir("grafico.figura_regret_bandit")
+def figura_regret_bandit(regret_acumulado, nomes, dias_teste):
+    dias = np.arange(1, regret_acumulado.shape[1] + 1)
+    fig_regret = go.Figure([traco_dispersao(dias, regret, mode='lines', name=nome)
+                            for nome, regret in zip(nomes, regret_acumulado)])
+    fig_regret.add_vline(x=dias_teste, line_dash="dot", line_color="gray", annotation_text="Fim do teste")
+    fig_regret.update_layout(title="Regret Acumulado (conversões perdidas por réplica)", xaxis_title="Dia",
+                             yaxis_title="Conversões perdidas", height=400)
+    return fig_regret
 
 # === SIDEBAR PARA NAVEGAÇÃO ===
 st.sidebar.title("🔧 Navegação")
 opcao = st.sidebar.selectbox(
     "Escolha a funcionalidade:",
-    ["🎯 Planejar Novo Teste", "🔍 Validar Teste em Andamento", "⚡ Cálculo Rápido", "📊 Análise Completa"]
+    ["🎯 Planejar Novo Teste", "🔍 Validar Teste em Andamento", "⚡ Cálculo Rápido", "📊 Análise Completa",
+     "🧪 Análise A/B/n"]
 )
 
+# Instrumentação opcional, por sessão (padrão: CALCULADORA_INSTRUMENTACAO): desligada,
+# as medições custam só uma verificação de flag
+execucao_medida = instrumentacao.iniciar_execucao()
+instrumentacao.ativar_execucao(st.sidebar.checkbox("⏱️ Medir desempenho", value=instrumentacao.esta_ativo(),
+                                                   key="medir_desempenho"))
+inicio_pagina_s = time.perf_counter()
+
 # === ABA 1: PLANEJAR NOVO TESTE ===
 if opcao == "🎯 Planejar Novo Teste":
     st.header("🎯 Planejamento de Novo Teste A/B")
@@ -167,6 +392,24 @@ if opcao == "🎯 Planejar Novo Teste":
             "Orçamento Máximo (dias)", 
             min_value=7, max_value=365, value=30, step=1
         )
+        
+        with st.expander("📈 Tráfego Histórico e Rampa"):
+            arquivo_trafego = st.file_uploader("Histórico diário (CSV com data, visitantes)", type="csv", key="trafego")
+            dias_rampa = st.number_input("Dias de Rampa", min_value=0, max_value=30, value=0,
+                                         help="A fração do tráfego no teste cresce linearmente até 100% neste prazo")
+            alocacao = st.slider("Tráfego Alocado ao Teste (%)", min_value=5, max_value=100, value=100, step=5) / 100
+        historico_trafego = None
+        if arquivo_trafego is not None:
+            try:
+                df_trafego = ler_tabela(arquivo_trafego, colunas=['data', 'visitantes'])
+                # Datas e contagens convertidas já na leitura: um arquivo inválido não chega à previsão
+                historico_trafego = pd.Series(pd.to_numeric(df_trafego['visitantes']).to_numpy(dtype=float),
+                                              index=pd.to_datetime(df_trafego['data'])).dropna()
+                if historico_trafego.empty:
+                    raise ValueError("o histórico não tem nenhum dia com visitantes")
+            except (KeyError, ValueError) as erro:
+                historico_trafego = None
+                st.error(f"Não foi possível ler o histórico de tráfego: {erro}")
     
     with col2:
         st.subheader("⚙️ Configurações Avançadas")
@@ -195,18 +438,64 @@ if opcao == "🎯 Planejar Novo Teste":
             value="Meu Teste A/B",
             help="Para identificação nos resultados"
         )
+        
+        metodo_calculo = st.selectbox(
+            "Método de Cálculo",
+            list(METODOS_CALCULO),
+            help="Os métodos alternativos resolvem o n total diretamente, com a variância "
+                 "de cada grupo e a alocação desigual"
+        )
+        
+        reducao_cuped = st.slider(
+            "Redução de Variância com CUPED (%)",
+            min_value=0, max_value=70, value=0, step=5,
+            help="Fração da variância da métrica explicada pela covariável pré-teste "
+                 "(correlação² entre elas). A amostra necessária cai na mesma proporção."
+        ) / 100
+        
+        validar_simulacao = st.checkbox(
+            "Validar com simulação Monte Carlo",
+            help="Confere o poder real do plano com réplicas binomiais do teste usado na análise"
+        )
+    
+    opcoes_metodo = METODOS_CALCULO[metodo_calculo]
+    calcular_plano = calcular_tamanho_amostra_ab if opcoes_metodo is None else resolver_tamanho_amostra
+    calcular_plano_lote = calcular_tamanho_amostra_ab_lote if opcoes_metodo is None else resolver_tamanho_amostra
+    opcoes_trafego = dict(split_ratio=split_ratio, trafego_diario=trafego_diario * alocacao if historico_trafego is None
+                          else None, historico=historico_trafego, dias_rampa=dias_rampa,
+                          alocacao=1.0 if historico_trafego is None else alocacao)
+    resultado = calcular_plano(
+        taxa_base=taxa_base,
+        melhoria_minima_detectar=melhoria,
+        poder_estatistico=poder_estatistico,
+        nivel_significancia=nivel_significancia,
+        split_ratio=split_ratio,
+        **(opcoes_metodo or {})
+    )
+    resultado_sem_cuped = resultado
+    if reducao_cuped > 0:
+        resultado = ajustar_plano_cuped(resultado, reducao_cuped)
+    previsao = prever_duracao(resultado['n_controle'], resultado['n_variacao'], **opcoes_trafego)
+    dias_p = previsao['dias'][0]
+    prob_orcamento = float(np.mean(previsao['dias_caminhos'][:, 0] <= orcamento_dias))
+    
+    # Prévia recalculada a cada ajuste dos controles (plano e previsão ficam em cache)
+    st.info(f"⏱️ Duração prevista: **{dias_p[1]:.0f} dias** (faixa {previsao['quantis'][0]:.0%}–"
+            f"{previsao['quantis'][-1]:.0%}: {dias_p[0]:.0f}–{dias_p[-1]:.0f} dias) · "
+            f"{resultado['n_total']:,} visitantes · chance de caber no orçamento: {prob_orcamento:.0%}")
     
     if st.button("📊 Calcular Tamanho da Amostra", type="primary"):
-        resultado = calcular_tamanho_amostra_ab(
-            taxa_base=taxa_base,
-            melhoria_minima_detectar=melhoria,
+        trafego_efetivo = (trafego_diario * alocacao if historico_trafego is None
+                           else alocacao * np.exp(previsao['modelo']['nivel_log']))
+        efeito_orcamento = resolver_efeito_minimo(
+            taxa_base, trafego_efetivo, orcamento_dias,
             poder_estatistico=poder_estatistico,
             nivel_significancia=nivel_significancia,
             split_ratio=split_ratio
         )
         
         # Cálculos de viabilidade
-        dias_necessarios = resultado['n_total'] // trafego_diario
+        dias_necessarios = int(dias_p[1]) if np.isfinite(dias_p[1]) else previsao['horizonte']
         viavel = dias_necessarios <= orcamento_dias
         
         # Resultados principais
@@ -224,6 +513,23 @@ if opcao == "🎯 Planejar Novo Teste":
         with col4:
             st.metric("Duração Estimada", f"{dias_necessarios} dias")
         
+        if reducao_cuped > 0:
+            st.caption(f"Com CUPED ({reducao_cuped:.0%} de redução de variância): sem o ajuste seriam "
+                       f"{resultado_sem_cuped['n_total']:,} visitantes.")
+        
+        st.caption(f"Controle completa em {previsao['dias_controle'][0][1]:.0f} dias e variação em "
+                   f"{previsao['dias_variacao'][0][1]:.0f} dias (medianas). Teste iniciando em "
+                   f"{previsao['data_inicio']:%d/%m/%Y}.")
+        mostrar_grafico(figura_previsao_duracao(previsao['acumulado_quantis'], previsao['quantis'],
+                                                previsao['data_inicio'], resultado['n_total'], orcamento_dias))
+        
+        if np.isnan(efeito_orcamento['effect_size']):
+            st.caption(f"Com {orcamento_dias} dias de tráfego nenhum efeito atinge o poder desejado.")
+        else:
+            st.caption(f"Com {orcamento_dias} dias de tráfego ({efeito_orcamento['n_total']:,} visitantes), "
+                       f"o menor efeito detectável é {efeito_orcamento['effect_size']:.2%} "
+                       f"({efeito_orcamento['melhoria_relativa']:.1f}% relativo).")
+        
         # Status de viabilidade
         if viavel:
             st.markdown("""
@@ -246,6 +552,29 @@ if opcao == "🎯 Planejar Novo Teste":
             </div>
             """, unsafe_allow_html=True)
         
+        if validar_simulacao:
+            st.subheader("🎲 Validação por Simulação")
+            with st.spinner("Simulando réplicas do teste..."):
+                simulacao = simular_plano(resultado_sem_cuped, replicas=200_000, semente=0)
+            if reducao_cuped > 0:
+                st.caption("A simulação usa o teste sem ajuste, com a amostra equivalente sem CUPED.")
+            
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                st.metric("Poder Planejado", f"{poder_estatistico:.0%}")
+            with col2:
+                st.metric("Poder Simulado", f"{simulacao['poder']:.1%}",
+                          delta=f"{(simulacao['poder'] - poder_estatistico) * 100:+.1f} p.p.")
+                st.caption(f"IC 95%: [{simulacao['poder_ic'][0]:.1%}, {simulacao['poder_ic'][1]:.1%}]")
+            with col3:
+                st.metric("Erro Tipo I Simulado", f"{simulacao['erro_tipo_i']:.2%}")
+                st.caption(f"IC 95%: [{simulacao['erro_tipo_i_ic'][0]:.2%}, {simulacao['erro_tipo_i_ic'][1]:.2%}]")
+        
+        mostrar_grafico(figura_curva_poder(
+            resultado['taxa_base'], resultado['taxa_variacao'], split_ratio,
+            nivel_significancia, poder_estatistico, resultado['n_total'], reducao_cuped
+        ))
+        
         # Gráfico de cenários
         st.subheader("📊 Análise de Cenários")
         
@@ -253,58 +582,113 @@ if opcao == "🎯 Planejar Novo Teste":
         melhorias_cenario = [melhoria*0.5, melhoria, melhoria*1.5, melhoria*2]
         nomes_cenario = ["Conservador", "Esperado", "Otimista", "Agressivo"]
         
-        dados_cenarios = []
-        for i, mel in enumerate(melhorias_cenario):
-            if taxa_base + mel <= 1.0:
-                res_temp = calcular_tamanho_amostra_ab(
-                    taxa_base=taxa_base,
-                    melhoria_minima_detectar=mel,
-                    poder_estatistico=poder_estatistico,
-                    nivel_significancia=nivel_significancia,
-                    split_ratio=split_ratio
-                )
-                dias_temp = res_temp['n_total'] // trafego_diario
-                
-                dados_cenarios.append({
-                    'Cenário': nomes_cenario[i],
-                    'Melhoria (%)': f"{res_temp['melhoria_relativa']:.1f}%",
-                    'Amostra Total': res_temp['n_total'],
-                    'Dias Necessários': dias_temp,
-                    'Viável': "✅ Sim" if dias_temp <= orcamento_dias else "❌ Não"
-                })
-        
-        df_cenarios = pd.DataFrame(dados_cenarios)
+        melhorias_cenario = np.array(melhorias_cenario)
+        validos = taxa_base + melhorias_cenario <= 1.0
+        res_cenarios = calcular_plano_lote(
+            taxa_base=taxa_base,
+            melhoria_minima_detectar=melhorias_cenario[validos],
+            poder_estatistico=poder_estatistico,
+            nivel_significancia=nivel_significancia,
+            split_ratio=split_ratio,
+            **(opcoes_metodo or {})
+        )
+        if reducao_cuped > 0:
+            res_cenarios = ajustar_plano_cuped(res_cenarios, reducao_cuped)
+        dias_cenarios = prever_duracao(res_cenarios['n_controle'], res_cenarios['n_variacao'],
+                                       **opcoes_trafego)['dias'][:, 1]
+        dias_cenarios = np.where(np.isfinite(dias_cenarios), dias_cenarios, np.nan)
+        
+        df_cenarios = pd.DataFrame({
+            'Cenário': np.array(nomes_cenario)[validos],
+            'Melhoria (%)': [f"{m:.1f}%" for m in res_cenarios['melhoria_relativa']],
+            'Amostra Total': res_cenarios['n_total'],
+            'Dias Necessários': dias_cenarios,
+            'Viável': np.where(dias_cenarios <= orcamento_dias, "✅ Sim", "❌ Não")
+        })
         st.dataframe(df_cenarios, use_container_width=True)
         
         # Gráfico de barras
-        fig = px.bar(
-            dados_cenarios, 
-            x='Cenário', 
-            y='Dias Necessários',
-            color='Dias Necessários',
-            title="Duração do Teste por Cenário"
-        )
-        fig.add_hline(y=orcamento_dias, line_dash="dash", line_color="red", 
-                     annotation_text=f"Orçamento: {orcamento_dias} dias")
-        st.plotly_chart(fig, use_container_width=True)
+        fig = figura_cenarios(df_cenarios, orcamento_dias)
+        mostrar_grafico(fig)
+    
+    with st.expander("🎰 Alocação Adaptativa (Bandit)"):
+        st.caption("Simula o plano com divisão fixa, Thompson sampling e ε-guloso no mesmo tráfego, com "
+                   "olhadas diárias. Depois da decisão todo o tráfego vai para a vencedora; sem decisão no "
+                   "prazo previsto, fica o controle. O regret é contado até o fim do orçamento.")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            regra_bandit = st.selectbox("Regra de Decisão", list(REGRAS_BANDIT))
+        with col2:
+            epsilon_bandit = st.slider("ε do ε-guloso", min_value=0.05, max_value=0.5, value=0.1, step=0.05)
+        with col3:
+            replicas_bandit = st.select_slider("Réplicas", options=[2_000, 5_000, 10_000, 20_000], value=5_000)
+        
+        if st.button("🎰 Simular Alocações"):
+            dias_teste_bandit = int(min(dias_p[1], orcamento_dias)) if np.isfinite(dias_p[1]) else orcamento_dias
+            trafego_bandit = (trafego_diario * alocacao if historico_trafego is None
+                              else alocacao * np.exp(previsao['modelo']['nivel_log']))
+            with st.spinner("Simulando réplicas das três políticas..."):
+                bandit = simular_bandit_plano(resultado_sem_cuped, trafego_bandit, orcamento_dias,
+                                              split_ratio=split_ratio, dias_teste=dias_teste_bandit,
+                                              regra=REGRAS_BANDIT[regra_bandit], epsilon=epsilon_bandit,
+                                              replicas=replicas_bandit, semente=0)
+            resumo_bandit = bandit['resumo']
+            
+            col1, col2, col3 = st.columns(3)
+            melhor_regret = resumo_bandit['regret'].idxmin()
+            with col1:
+                st.metric("Menor Regret", NOMES_POLITICAS[melhor_regret],
+                          f"{resumo_bandit.loc[melhor_regret, 'regret']:,.1f} conversões perdidas", delta_color="off")
+            with col2:
+                st.metric("Falso Positivo (Divisão Fixa)", f"{resumo_bandit.loc['fixa', 'falso_positivo']:.1%}")
+            with col3:
+                st.metric("Maior Falso Positivo", f"{resumo_bandit['falso_positivo'].max():.1%}",
+                          NOMES_POLITICAS[resumo_bandit['falso_positivo'].idxmax()], delta_color="off")
+            
+            st.dataframe(pd.DataFrame({
+                'Política': [NOMES_POLITICAS[p] for p in resumo_bandit.index],
+                'Conversões Perdidas': resumo_bandit['regret'].round(1),
+                'Perda (%)': (resumo_bandit['perda_relativa'] * 100).round(2),
+                'P(Decisão Correta)': (resumo_bandit['prob_decisao_correta'] * 100).round(1),
+                'Falso Positivo (%)': (resumo_bandit['falso_positivo'] * 100).round(2),
+                'Dias até Decisão (mediana)': resumo_bandit['dias_decisao_mediana'],
+                'Tráfego em B (%)': (resumo_bandit['fracao_b'] * 100).round(1),
+            }), use_container_width=True, hide_index=True)
+            st.caption(f"{bandit['replicas']:,} réplicas por política, teste de até {bandit['dias_teste']} dias. "
+                       "Falso positivo: fração das réplicas sem efeito real que declararam uma vencedora.")
+            mostrar_grafico(figura_regret_bandit(bandit['regret_acumulado'],
+                                                 [NOMES_POLITICAS[p] for p in resumo_bandit.index],
+                                                 bandit['dias_teste']))
 
 # === ABA 2: VALIDAR TESTE EM ANDAMENTO ===
 elif opcao == "🔍 Validar Teste em Andamento":
     st.header("🔍 Validação de Teste em Andamento")
     
+    # Experimentos salvos preenchem os campos com o snapshot mais recente
+    armazem = abrir_armazem()
+    lista_experimentos = armazem.experimentos()
+    experimento_salvo = st.selectbox("💾 Experimento Salvo", ["(novo)"] + lista_experimentos['experimento'].tolist())
+    ultimo = None if experimento_salvo == "(novo)" else armazem.ultimo_snapshot(experimento_salvo)
+    plano = (None if experimento_salvo == "(novo)" else
+             lista_experimentos.set_index('experimento').loc[experimento_salvo])
+    
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📊 Dados do Grupo A (Controle)")
-        conversions_a = st.number_input("Conversões Grupo A", min_value=0, value=516)
-        visitors_a = st.number_input("Visitantes Grupo A", min_value=1, value=7465)
+        conversions_a = st.number_input("Conversões Grupo A", min_value=0,
+                                        value=int(ultimo['conversions_a']) if ultimo else 516)
+        visitors_a = st.number_input("Visitantes Grupo A", min_value=1,
+                                     value=int(ultimo['visitors_a']) if ultimo else 7465)
         taxa_a = conversions_a / visitors_a if visitors_a > 0 else 0
         st.write(f"Taxa de Conversão A: **{taxa_a:.2%}**")
     
     with col2:
         st.subheader("📊 Dados do Grupo B (Variação)")  
-        conversions_b = st.number_input("Conversões Grupo B", min_value=0, value=453)
-        visitors_b = st.number_input("Visitantes Grupo B", min_value=1, value=6557)
+        conversions_b = st.number_input("Conversões Grupo B", min_value=0,
+                                        value=int(ultimo['conversions_b']) if ultimo else 453)
+        visitors_b = st.number_input("Visitantes Grupo B", min_value=1,
+                                     value=int(ultimo['visitors_b']) if ultimo else 6557)
         taxa_b = conversions_b / visitors_b if visitors_b > 0 else 0
         st.write(f"Taxa de Conversão B: **{taxa_b:.2%}**")
     
@@ -314,23 +698,74 @@ elif opcao == "🔍 Validar Teste em Andamento":
     with col3:
         melhoria_esperada = st.number_input(
             "Melhoria Mínima Esperada (%)", 
-            min_value=1.0, max_value=100.0, value=10.0, step=1.0
+            min_value=1.0, max_value=100.0,
+            value=round(float(plano['melhoria_minima']) * 100, 1) if plano is not None else 10.0, step=1.0
         ) / 100
     
     with col4:
+        opcoes_poder = [0.70, 0.80, 0.85, 0.90]
         poder_validacao = st.select_slider(
             "Poder Estatístico",
-            options=[0.70, 0.80, 0.85, 0.90],
-            value=0.80
+            options=opcoes_poder,
+            value=float(plano['poder_estatistico']) if plano is not None and
+                  float(plano['poder_estatistico']) in opcoes_poder else 0.80
         )
     
-    if st.button("🔍 Analisar Teste Atual", type="primary"):
+    with st.expander("💾 Salvar e Acompanhar"):
+        col1, col2 = st.columns(2)
+        with col1:
+            nome_experimento = st.text_input("Nome do Experimento",
+                                             value="" if experimento_salvo == "(novo)" else experimento_salvo)
+        with col2:
+            data_snapshot = st.date_input("Data do Snapshot")
+        
+        if st.button("💾 Salvar Snapshot do Dia", disabled=not nome_experimento.strip()):
+            nome_experimento = nome_experimento.strip()
+            existente = lista_experimentos.set_index('experimento')['taxa_base'].get(nome_experimento)
+            # A taxa base do plano fica fixa; só melhoria e poder podem ser revistos
+            try:
+                armazem.salvar_com_snapshots([{
+                    'experimento': nome_experimento, 'data': data_snapshot,
+                    'conversions_a': conversions_a, 'visitors_a': visitors_a,
+                    'conversions_b': conversions_b, 'visitors_b': visitors_b
+                }], [nome_experimento], existente if existente is not None else conversions_a / visitors_a,
+                    melhoria_esperada, poder_validacao)
+                st.success(f"Snapshot de {data_snapshot:%d/%m/%Y} salvo em '{nome_experimento}'")
+            except ValueError as erro:
+                st.error(f"Não foi possível salvar: {erro}")
+        
+        st.caption(f"Importação em lote: CSV com as colunas {', '.join(COLUNAS_SNAPSHOT)} (totais acumulados). "
+                   "Experimentos novos recebem o plano com a melhoria e o poder acima.")
+        arquivo_snapshots = st.file_uploader("Importar snapshots (CSV)", type="csv", key="snapshots")
+        if arquivo_snapshots is not None and st.button("📥 Importar Snapshots"):
+            try:
+                df_snapshots = ler_tabela(arquivo_snapshots)
+                novos = df_snapshots[~df_snapshots['experimento'].astype(str).isin(lista_experimentos['experimento'])]
+                # Plano dos experimentos novos a partir da taxa do controle no primeiro snapshot,
+                # gravado na mesma transação dos snapshots (um arquivo rejeitado não deixa planos)
+                primeiros = novos.sort_values('data').groupby(novos['experimento'].astype(str)).first()
+                total = armazem.salvar_com_snapshots(df_snapshots, primeiros.index,
+                                                     primeiros['conversions_a'] / primeiros['visitors_a'],
+                                                     melhoria_esperada, poder_validacao)
+                st.success(f"{total:,} snapshots importados")
+            except (KeyError, ValueError) as erro:
+                st.error(f"Não foi possível importar: {erro}")
+        
+        if experimento_salvo != "(novo)":
+            historico = armazem.historico(experimento_salvo)
+            if not historico.empty:
+                mostrar_grafico(figura_historico_experimento(historico))
+    
+    contagens_ok = bool(contagens_validas(conversions_a, visitors_a, conversions_b, visitors_b))
+    if not contagens_ok:
+        st.error("As conversões de cada grupo não podem passar do número de visitantes")
+    if st.button("🔍 Analisar Teste Atual", type="primary", disabled=not contagens_ok):
         # Calcular métricas do teste atual
-        resultado_atual = calcular_teste_atual(conversions_a, visitors_a, conversions_b, visitors_b)
+        resultado_atual = calcular_teste_exato(conversions_a, visitors_a, conversions_b, visitors_b)
         
-        # Calcular amostra ideal
+        # Calcular amostra ideal (taxa 0 ou 1 no controle: correção de continuidade de meia conversão)
         resultado_ideal = calcular_tamanho_amostra_ab(
-            taxa_base=resultado_atual['p_a'],
+            taxa_base=float(np.clip(resultado_atual['p_a'], 0.5 / visitors_a, 1 - 0.5 / visitors_a)),
             melhoria_minima_detectar=melhoria_esperada,
             poder_estatistico=poder_validacao
         )
@@ -353,6 +788,10 @@ elif opcao == "🔍 Validar Teste em Andamento":
         with col4:
             significativo = "✅ Sim" if resultado_atual['p_value'] < 0.05 else "❌ Não"
             st.metric("Significativo", significativo)
+        if resultado_atual['metodo'] != 'z':
+            st.caption(f"Contagens esperadas abaixo de 5: p-valor do teste exato de "
+                       f"{resultado_atual['metodo'].capitalize()} (a aproximação normal daria "
+                       f"{resultado_atual['p_value_normal']:.4f}).")
         
         # Status do teste
         if resultado_atual['p_value'] < 0.05:
@@ -392,39 +831,63 @@ elif opcao == "🔍 Validar Teste em Andamento":
             st.success(f"IC não contém zero: {ic_texto} - Significativo")
         
         # Gráfico do intervalo de confiança
-        fig_ic = go.Figure()
-        
-        # Linha do intervalo
-        fig_ic.add_trace(go.Scatter(
-            x=[resultado_atual['ci_lower']*100, resultado_atual['ci_upper']*100], 
-            y=[1, 1],
-            mode='lines+markers',
-            line=dict(width=8, color='blue'),
-            marker=dict(size=10),
-            name='IC 95%'
-        ))
-        
-        # Ponto da diferença observada
-        fig_ic.add_trace(go.Scatter(
-            x=[resultado_atual['diff_abs']*100], 
-            y=[1],
-            mode='markers',
-            marker=dict(size=15, color='red'),
-            name='Diferença Observada'
-        ))
-        
-        # Linha do zero
-        fig_ic.add_vline(x=0, line_dash="dash", line_color="gray", 
-                        annotation_text="Diferença = 0")
-        
-        fig_ic.update_layout(
-            title="Intervalo de Confiança da Diferença",
-            xaxis_title="Diferença (%)",
-            yaxis=dict(showticklabels=False, range=[0.5, 1.5]),
-            height=300
+        fig_ic = figura_intervalo_confianca(
+            resultado_atual['ci_lower'], resultado_atual['ci_upper'], resultado_atual['diff_abs']
         )
         
-        st.plotly_chart(fig_ic, use_container_width=True)
+        mostrar_grafico(fig_ic)
+
+    # Modo sequencial: cada olhada atualiza o estado em O(1) sem inflar o falso positivo
+    st.markdown("---")
+    st.subheader("🔁 Modo Sequencial (mSPRT)")
+    st.caption("P-valor sempre válido: pode ser consultado a cada nova parcial sem aumentar "
+               "a taxa de falsos positivos. Informe os totais acumulados acima e registre cada olhada.")
+    
+    # O estado vale para um experimento, uma melhoria (tau2) e um alpha; mudando qualquer um, recomeça.
+    # Experimentos salvos usam a taxa base do plano e partem da trajetória dos snapshots gravados.
+    alpha_seq = 0.05
+    historico_seq = armazem.historico(experimento_salvo) if plano is not None else None
+    taxa_plano = float(plano['taxa_base']) if plano is not None else taxa_a
+    chave_seq = (experimento_salvo, round(melhoria_esperada, 6), alpha_seq,
+                 len(historico_seq) if historico_seq is not None else 0)
+    
+    def estado_sequencial_inicial():
+        estado = EstadoSequencial(tau2=max(tau2_padrao(taxa_plano, melhoria_esperada), 1e-12), alpha=alpha_seq)
+        if historico_seq is not None:
+            for snapshot in historico_seq.itertuples():
+                registrar_acumulado(estado, snapshot.conversions_a, snapshot.visitors_a,
+                                    snapshot.conversions_b, snapshot.visitors_b)
+        return estado
+    
+    chave_salva, estado_seq = st.session_state.get('estado_sequencial', (None, None))
+    if chave_salva != chave_seq:
+        estado_seq = estado_sequencial_inicial()
+        st.session_state['estado_sequencial'] = (chave_seq, estado_seq)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("➕ Registrar Olhada"):
+            try:
+                registrar_acumulado(estado_seq, conversions_a, visitors_a, conversions_b, visitors_b)
+            except ValueError as erro:
+                st.error(str(erro))
+    with col2:
+        if st.button("🔄 Reiniciar Sequência"):
+            estado_seq = estado_sequencial_inicial()
+            st.session_state['estado_sequencial'] = (chave_seq, estado_seq)
+    
+    if estado_seq.trajetoria:
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("Olhadas", estado_seq.olhadas)
+        with col2:
+            st.metric("P-valor Sempre Válido", f"{estado_seq.p_valor:.4f}")
+        with col3:
+            st.metric("Z Atual / Limite", f"{estado_seq.z_score:.2f} / ±{estado_seq.limite_z:.2f}")
+        with col4:
+            st.metric("Decisão", "✅ Parar" if estado_seq.significativo else "⏳ Continuar")
+        
+        mostrar_grafico(figura_trajetoria_sequencial(estado_seq.trajetoria))
 
 # === ABA 3: CÁLCULO RÁPIDO ===
 elif opcao == "⚡ Cálculo Rápido":
@@ -458,7 +921,9 @@ elif opcao == "⚡ Cálculo Rápido":
             melhoria_minima_detectar=melhoria_absoluta
         )
         
-        dias_rapido = resultado_rapido['n_total'] // trafego_rapido
+        previsao_rapida = prever_duracao(resultado_rapido['n_controle'], resultado_rapido['n_variacao'],
+                                         trafego_diario=trafego_rapido)
+        dias_rapido = f"{previsao_rapida['dias'][0, 1]:.0f}"
         
         col1, col2, col3 = st.columns(3)
         
@@ -477,7 +942,9 @@ elif opcao == "📊 Análise Completa":
     # Upload de dados ou entrada manual
     opcao_dados = st.radio(
         "Como você quer inserir os dados?",
-        ["✍️ Entrada Manual", "📁 Upload de Arquivo CSV"]
+        ["✍️ Entrada Manual", "📁 Upload de Arquivo CSV", "🗂️ Log de Eventos por Usuário",
+         "💰 Receita por Usuário (Bootstrap)", "🧩 Quebra por Segmento", "📉 CUPED (Covariável Pré-Teste)",
+         "➗ Métrica de Razão (Método Delta)"]
     )
     
     if opcao_dados == "✍️ Entrada Manual":
@@ -498,28 +965,373 @@ elif opcao == "📊 Análise Completa":
             'conversions_b': conv_b, 'visitors_b': visit_b
         }
         
+    elif opcao_dados == "🗂️ Log de Eventos por Usuário":
+        st.caption("Um ou mais eventos por usuário com as colunas: user_id, variant, converted, revenue. "
+                   "Os eventos de cada usuário são somados (converted vira 0/1) e o arquivo é lido em blocos.")
+        arquivo_eventos = st.file_uploader("Escolha o log de eventos (CSV)", type="csv", key="log_eventos")
+        dados = None
+        if arquivo_eventos is not None:
+            try:
+                estatisticas = agregar_eventos_por_variante(caminho_parquet(arquivo_eventos))
+            except ValueError as erro:
+                st.error(f"Não foi possível ler o log: {erro}")
+                estatisticas = None
+            
+            if estatisticas is not None and len(estatisticas) >= 2:
+                st.dataframe(estatisticas, use_container_width=True)
+                st.dataframe(resumir_estatisticas(estatisticas, 'revenue'), use_container_width=True)
+                
+                variantes = list(estatisticas.index)
+                col1, col2 = st.columns(2)
+                with col1:
+                    controle = st.selectbox("Variante Controle (A)", variantes, index=0)
+                with col2:
+                    variacao = st.selectbox("Variante Variação (B)", variantes, index=1)
+                dados = dados_teste_de_estatisticas(estatisticas, controle, variacao)
+            elif estatisticas is not None:
+                st.error("O log precisa ter pelo menos duas variantes")
+        
+    elif opcao_dados == "💰 Receita por Usuário (Bootstrap)":
+        st.caption("Uma linha por usuário com as colunas: variant, revenue. O intervalo de confiança "
+                   "vem de um bootstrap de Poisson, adequado a métricas com cauda pesada.")
+        arquivo_receita = st.file_uploader("Escolha o arquivo de receita (CSV)", type="csv", key="receita_usuario")
+        dados = None
+        if arquivo_receita is not None:
+            df_receita = ler_tabela(arquivo_receita, colunas=['variant', 'revenue'])
+            variantes = sorted(df_receita['variant'].astype(str).unique())
+            if len(variantes) < 2:
+                st.error("O arquivo precisa ter pelo menos duas variantes")
+            else:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    controle = st.selectbox("Variante Controle (A)", variantes, index=0, key="controle_receita")
+                with col2:
+                    variacao = st.selectbox("Variante Variação (B)", variantes, index=1, key="variacao_receita")
+                with col3:
+                    reamostras = st.select_slider("Reamostras", options=[1000, 2000, 5000, 10000], value=2000)
+                
+                if st.button("💰 Analisar Receita", type="primary"):
+                    grupos = df_receita['variant'].astype(str)
+                    with st.spinner("Reamostrando..."):
+                        resultado_receita = bootstrap_diferenca_medias(
+                            df_receita.loc[grupos == controle, 'revenue'].fillna(0).to_numpy(),
+                            df_receita.loc[grupos == variacao, 'revenue'].fillna(0).to_numpy(),
+                            reamostras=reamostras, semente=0
+                        )
+                    
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Receita/Usuário A", f"{resultado_receita['media_a']:,.2f}")
+                    with col2:
+                        st.metric("Receita/Usuário B", f"{resultado_receita['media_b']:,.2f}")
+                    with col3:
+                        st.metric("Melhoria", f"{resultado_receita['diff_rel']:+.1f}%")
+                    with col4:
+                        st.metric("P-valor (bootstrap)", f"{resultado_receita['p_value']:.4f}")
+                    
+                    ic_texto = f"[{resultado_receita['ci_lower']:+,.3f}, {resultado_receita['ci_upper']:+,.3f}]"
+                    if resultado_receita['ci_lower'] <= 0 <= resultado_receita['ci_upper']:
+                        st.warning(f"IC 95% da diferença contém zero: {ic_texto} - Não significativo")
+                    else:
+                        st.success(f"IC 95% da diferença não contém zero: {ic_texto} - Significativo")
+                    st.caption(f"IC 95% da melhoria relativa: [{resultado_receita['melhoria_ci_lower']:+.1f}%, "
+                               f"{resultado_receita['melhoria_ci_upper']:+.1f}%]")
+        
+    elif opcao_dados == "🧩 Quebra por Segmento":
+        st.caption("Uma linha por usuário com as colunas: variant, converted e as colunas de segmento "
+                   "(ex.: device, country, channel). O arquivo vira Parquet uma única vez, é mapeado em "
+                   "memória e só as colunas escolhidas são lidas.")
+        arquivo_segmentos = st.file_uploader("Escolha o arquivo (Parquet, Arrow ou CSV)", type=["parquet", "arrow", "feather", "csv"], key="segmentos")
+        dados = None
+        if arquivo_segmentos is not None:
+            arquivo_segmentos = caminho_parquet(arquivo_segmentos)
+            colunas = colunas_disponiveis(arquivo_segmentos)
+            candidatas = [c for c in colunas if c not in ('user_id', 'variant', 'converted', 'revenue')]
+            if 'variant' not in colunas or 'converted' not in colunas or not candidatas:
+                st.error("O arquivo precisa ter as colunas variant, converted e pelo menos uma coluna de segmento")
+            else:
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    padrao = [c for c in ('device', 'country', 'channel') if c in candidatas] or candidatas[:1]
+                    segmentos = st.multiselect("Colunas de Segmento", candidatas, default=padrao)
+                with col2:
+                    profundidade = st.slider("Cruzamentos de até", 1, max(1, min(3, len(segmentos))),
+                                             min(2, max(1, len(segmentos))),
+                                             help="Número máximo de colunas cruzadas em cada segmento")
+                with col3:
+                    correcoes_segmento = {"Benjamini-Hochberg (FDR)": 'bh', "Holm": 'holm',
+                                          "Bonferroni": 'bonferroni', "Nenhuma": 'nenhuma'}
+                    correcao_segmento = correcoes_segmento[st.selectbox("Correção Múltipla", list(correcoes_segmento),
+                                                                        key="correcao_segmento")]
+                
+                if segmentos:
+                    with st.spinner("Agregando segmentos..."):
+                        agregado = agregar_por_segmento(arquivo_segmentos, segmentos, profundidade=profundidade)
+                    variantes = list(agregado['n'].columns)
+                    if len(variantes) < 2:
+                        st.error("O arquivo precisa ter pelo menos duas variantes")
+                    else:
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            controle = st.selectbox("Variante Controle (A)", variantes, index=0, key="controle_segmento")
+                        with col2:
+                            variacao = st.selectbox("Variante Variação (B)", variantes, index=1, key="variacao_segmento")
+                        with col3:
+                            minimo_visitantes = st.number_input("Mínimo de Visitantes por Grupo", min_value=1,
+                                                                value=100, key="minimo_segmento")
+                        
+                        resultado_segmentos = testar_segmentos(agregado, controle, variacao, correcao_segmento,
+                                                               minimo_visitantes=minimo_visitantes)
+                        
+                        col1, col2, col3 = st.columns(3)
+                        with col1:
+                            st.metric("Segmentos Testados", f"{len(resultado_segmentos):,}")
+                        with col2:
+                            st.metric("Significativos (após correção)", f"{int(resultado_segmentos['significativo'].sum()):,}")
+                        with col3:
+                            st.metric("Segmentos Descartados", f"{len(agregado) - len(resultado_segmentos):,}")
+                        
+                        col1, col2 = st.columns(2)
+                        with col1:
+                            linha_mapa = st.selectbox("Linhas do Mapa", segmentos, key="linha_mapa")
+                        with col2:
+                            opcoes_coluna = ["(nenhuma)"] + [s for s in segmentos if s != linha_mapa]
+                            coluna_mapa = st.selectbox("Colunas do Mapa", opcoes_coluna,
+                                                       index=1 if len(opcoes_coluna) > 1 and profundidade > 1 else 0,
+                                                       key="coluna_mapa")
+                        coluna_mapa = None if coluna_mapa == "(nenhuma)" else coluna_mapa
+                        
+                        try:
+                            mostrar_grafico(figura_mapa_segmentos(
+                                matriz_segmentos(resultado_segmentos, linha_mapa, coluna_mapa, 'diff_rel'),
+                                matriz_segmentos(resultado_segmentos, linha_mapa, coluna_mapa, 'p_ajustado'),
+                                0.05
+                            ))
+                        except ValueError as erro:
+                            st.info(f"{erro}. Aumente o número de cruzamentos para ver este mapa.")
+                        
+                        st.subheader("Segmentos com Menor P-valor Ajustado")
+                        st.dataframe(
+                            resultado_segmentos.sort_values('p_ajustado').head(50).reset_index()[
+                                ['dimensoes', *segmentos, 'visitors_a', 'visitors_b', 'p_a', 'p_b',
+                                 'diff_rel', 'p_value', 'p_ajustado', 'significativo']
+                            ],
+                            use_container_width=True
+                        )
+        
+    elif opcao_dados == "📉 CUPED (Covariável Pré-Teste)":
+        st.caption("Uma linha por usuário com a variante, a métrica do teste e a mesma métrica (ou outra "
+                   "correlacionada) no período anterior ao teste. O arquivo é reduzido em blocos a somas "
+                   "por variante, sem carregar as linhas na memória.")
+        arquivo_cuped = st.file_uploader("Escolha o arquivo (CSV ou Parquet)", type=["csv", "parquet"], key="cuped")
+        dados = None
+        if arquivo_cuped is not None:
+            arquivo_cuped = caminho_parquet(arquivo_cuped)
+            colunas = [c for c in colunas_disponiveis(arquivo_cuped) if c not in ('user_id', 'variant')]
+            col1, col2 = st.columns(2)
+            with col1:
+                metrica_cuped = st.selectbox("Métrica do Teste", colunas,
+                                             index=colunas.index('converted') if 'converted' in colunas else 0)
+            with col2:
+                candidatas_pre = [c for c in colunas if c != metrica_cuped]
+                padrao_pre = next((i for i, c in enumerate(candidatas_pre) if c.startswith('pre_')), 0)
+                covariavel_cuped = st.selectbox("Covariável Pré-Teste", candidatas_pre, index=padrao_pre)
+            
+            if covariavel_cuped is not None:
+                try:
+                    estatisticas_cuped = agregar_cuped([arquivo_cuped], metrica=metrica_cuped,
+                                                       covariavel=covariavel_cuped)
+                except (KeyError, ValueError) as erro:
+                    st.error(f"Não foi possível ler o arquivo: {erro}")
+                    estatisticas_cuped = None
+                
+                if estatisticas_cuped is not None and len(estatisticas_cuped) >= 2:
+                    variantes = list(estatisticas_cuped.index)
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        controle = st.selectbox("Variante Controle (A)", variantes, index=0, key="controle_cuped")
+                    with col2:
+                        variacao = st.selectbox("Variante Variação (B)", variantes, index=1, key="variacao_cuped")
+                    resultado_cuped = analisar_cuped(estatisticas_cuped, controle, variacao)
+                    
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Melhoria (CUPED)", f"{resultado_cuped['diff_rel']:+.2f}%",
+                                  delta=f"sem ajuste: {resultado_cuped['diff_rel_sem_ajuste']:+.2f}%",
+                                  delta_color="off")
+                    with col2:
+                        st.metric("P-valor (CUPED)", f"{resultado_cuped['p_value']:.4f}",
+                                  delta=f"sem ajuste: {resultado_cuped['p_value_sem_ajuste']:.4f}",
+                                  delta_color="off")
+                    with col3:
+                        st.metric("Redução de Variância", f"{resultado_cuped['reducao_variancia']:.1%}")
+                    with col4:
+                        st.metric("θ", f"{resultado_cuped['theta']:.4f}")
+                    
+                    st.dataframe(pd.DataFrame({
+                        'Média A': [resultado_cuped['media_a_sem_ajuste'], resultado_cuped['media_a']],
+                        'Média B': [resultado_cuped['media_b_sem_ajuste'], resultado_cuped['media_b']],
+                        'Diferença': [resultado_cuped['diff_abs_sem_ajuste'], resultado_cuped['diff_abs']],
+                        'IC 95% Inferior': [resultado_cuped['ci_lower_sem_ajuste'], resultado_cuped['ci_lower']],
+                        'IC 95% Superior': [resultado_cuped['ci_upper_sem_ajuste'], resultado_cuped['ci_upper']],
+                        'P-valor': [resultado_cuped['p_value_sem_ajuste'], resultado_cuped['p_value']],
+                    }, index=["Sem ajuste", "CUPED"]), use_container_width=True)
+                    
+                    if resultado_cuped['ci_lower'] <= 0 <= resultado_cuped['ci_upper']:
+                        st.warning("IC 95% ajustado contém zero - Não significativo")
+                    else:
+                        st.success("IC 95% ajustado não contém zero - Significativo")
+                    st.caption(f"Use {resultado_cuped['reducao_variancia']:.0%} como redução de variância "
+                               "esperada ao planejar o próximo teste com esta covariável.")
+                elif estatisticas_cuped is not None:
+                    st.error("O arquivo precisa ter pelo menos duas variantes")
+        
+    elif opcao_dados == "➗ Métrica de Razão (Método Delta)":
+        st.caption("Uma linha por sessão (ou pedido) com user_id, variant e as colunas da razão. A variância "
+                   "é calculada por usuário com o método delta, pois as sessões de um mesmo usuário não são "
+                   "independentes.")
+        arquivo_razao = st.file_uploader("Escolha o arquivo (CSV ou Parquet)", type=["csv", "parquet"], key="razao")
+        dados = None
+        if arquivo_razao is not None:
+            arquivo_razao = caminho_parquet(arquivo_razao)
+            colunas = [c for c in colunas_disponiveis(arquivo_razao) if c not in ('user_id', 'variant')]
+            col1, col2 = st.columns(2)
+            with col1:
+                numerador = st.selectbox("Numerador", colunas)
+            with col2:
+                opcoes_denominador = ["(uma linha = 1)"] + [c for c in colunas if c != numerador]
+                denominador = st.selectbox("Denominador", opcoes_denominador)
+            denominador = None if denominador == "(uma linha = 1)" else denominador
+            
+            try:
+                momentos = agregar_razao([arquivo_razao], numerador=numerador, denominador=denominador)
+            except (KeyError, ValueError) as erro:
+                st.error(f"Não foi possível ler o arquivo: {erro}")
+                momentos = None
+            
+            if momentos is not None and len(momentos) >= 2:
+                variantes = list(momentos.index)
+                col1, col2 = st.columns(2)
+                with col1:
+                    controle = st.selectbox("Variante Controle (A)", variantes, index=0, key="controle_razao")
+                with col2:
+                    variacao = st.selectbox("Variante Variação (B)", variantes, index=1, key="variacao_razao")
+                try:
+                    resultado_razao = analisar_razao(momentos, controle, variacao)
+                except ValueError as erro:
+                    st.error(str(erro))
+                    resultado_razao = None
+                
+                if resultado_razao is not None:
+                    col1, col2, col3, col4 = st.columns(4)
+                    with col1:
+                        st.metric("Razão A", f"{resultado_razao['razao_a']:.4f}")
+                    with col2:
+                        st.metric("Razão B", f"{resultado_razao['razao_b']:.4f}")
+                    with col3:
+                        st.metric("Melhoria", f"{resultado_razao['diff_rel']:+.2f}%")
+                    with col4:
+                        st.metric("P-valor (Delta)", f"{resultado_razao['p_value']:.4f}")
+                    
+                    ic_texto = (f"[{resultado_razao['diff_rel_ci_lower']:+.2f}%, "
+                                f"{resultado_razao['diff_rel_ci_upper']:+.2f}%]")
+                    if resultado_razao['ci_lower'] <= 0 <= resultado_razao['ci_upper']:
+                        st.warning(f"IC 95% da melhoria contém zero: {ic_texto} - Não significativo")
+                    else:
+                        st.success(f"IC 95% da melhoria não contém zero: {ic_texto} - Significativo")
+                    
+                    if 'p_value_ingenuo' in resultado_razao:
+                        st.caption(f"Tratando cada linha como independente (teste binomial) o p-valor seria "
+                                   f"{resultado_razao['p_value_ingenuo']:.4f}; a variância real é "
+                                   f"{resultado_razao['efeito_desenho']:.2f}× a binomial (efeito de desenho).")
+                    st.dataframe(momentos, use_container_width=True)
+            elif momentos is not None:
+                st.error("O arquivo precisa ter pelo menos duas variantes")
+        
     else:
         uploaded_file = st.file_uploader("Escolha um arquivo CSV", type="csv")
         if uploaded_file is not None:
-            df = pd.read_csv(uploaded_file)
+            df = ler_tabela(uploaded_file)
             st.dataframe(df.head())
             
             # Assumindo colunas específicas
             if all(col in df.columns for col in ['conversions_a', 'visitors_a', 'conversions_b', 'visitors_b']):
-                dados = {
-                    'conversions_a': df['conversions_a'].iloc[0],
-                    'visitors_a': df['visitors_a'].iloc[0],
-                    'conversions_b': df['conversions_b'].iloc[0],
-                    'visitors_b': df['visitors_b'].iloc[0]
-                }
+                # Todas as linhas de uma vez (um experimento por linha)
+                resultado_lote = pd.DataFrame(calcular_teste_exato(
+                    df['conversions_a'], df['visitors_a'],
+                    df['conversions_b'], df['visitors_b']
+                ), index=df.index)
+                # Linhas inválidas ficam com p-valor NaN em vez de derrubar o lote
+                validas = pd.Series(contagens_validas(df['conversions_a'], df['visitors_a'],
+                                                      df['conversions_b'], df['visitors_b']), index=df.index)
+                if not validas.all():
+                    st.warning(f"{(~validas).sum():,} linha(s) com conversões acima dos visitantes ou sem "
+                               "visitantes ficaram sem p-valor")
+                resultado_bayes = analisar_bayesiano(
+                    df['conversions_a'], df['visitors_a'],
+                    df['conversions_b'], df['visitors_b']
+                )
+                with secao("dataframe.resultados_lote"):
+                    df_resultados = pd.concat([df, resultado_lote], axis=1)
+                    df_resultados['prob_b_melhor'] = resultado_bayes['prob_b_melhor']
+                    df_resultados['perda_esperada_b'] = resultado_bayes['perda_esperada_b']
+                    df_resultados['significativo'] = df_resultados['p_value'] < 0.05
+                
+                st.markdown("---")
+                st.subheader(f"📈 Resultados de {len(df_resultados):,} Experimentos")
+                
+                # Resumo e gráficos só com as linhas válidas
+                df_validos = df_resultados[validas]
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    st.metric("Experimentos", f"{len(df_resultados):,}")
+                with col2:
+                    st.metric("Significativos", f"{df_validos['significativo'].mean():.1%}")
+                with col3:
+                    st.metric("B Melhor (sig.)", f"{(df_validos['significativo'] & (df_validos['diff_abs'] > 0)).sum():,}")
+                with col4:
+                    st.metric("Melhoria Mediana", f"{df_validos['diff_rel'].median():+.1f}%")
+                exatos = df_resultados['metodo'].value_counts().drop('z', errors='ignore')
+                if not exatos.empty:
+                    st.caption("P-valor exato (contagens esperadas abaixo de 5): " +
+                               ", ".join(f"{n:,} por {m.capitalize()}" for m, n in exatos.items()))
+                
+                # Ordenação e paginação no servidor (só a página atual vai para o navegador)
+                col1, col2, col3, col4 = st.columns(4)
+                with col1:
+                    coluna_ordem = st.selectbox("Ordenar por", list(df_resultados.columns),
+                                                index=list(df_resultados.columns).index('p_value'))
+                with col2:
+                    crescente = st.radio("Ordem", ["Crescente", "Decrescente"], horizontal=True) == "Crescente"
+                with col3:
+                    linhas_pagina = st.selectbox("Linhas por página", [25, 50, 100, 500], index=1)
+                total_paginas = max(1, int(np.ceil(len(df_resultados) / linhas_pagina)))
+                with col4:
+                    pagina = st.number_input(f"Página (de {total_paginas})", min_value=1,
+                                             max_value=total_paginas, value=1, step=1)
+                
+                df_ordenado = df_resultados.sort_values(coluna_ordem, ascending=crescente, kind='stable')
+                inicio = (pagina - 1) * linhas_pagina
+                st.dataframe(df_ordenado.iloc[inicio:inicio + linhas_pagina], use_container_width=True)
+                
+                # Gráficos de resumo
+                col1, col2 = st.columns(2)
+                with col1:
+                    fig_pvalores = figura_pvalores(df_validos)
+                    mostrar_grafico(fig_pvalores)
+                with col2:
+                    fig_volcano = figura_melhoria_significancia(df_validos)
+                    mostrar_grafico(fig_volcano)
             else:
                 st.error("O arquivo deve conter as colunas: conversions_a, visitors_a, conversions_b, visitors_b")
-                dados = None
-        else:
-            dados = None
+        dados = None
     
-    if dados and st.button("📊 Análise Completa", type="primary"):
-        resultado_completo = calcular_teste_atual(
+    contagens_ok = dados is None or bool(contagens_validas(
+        dados['conversions_a'], dados['visitors_a'], dados['conversions_b'], dados['visitors_b']))
+    if not contagens_ok:
+        st.error("As conversões de cada grupo não podem passar do número de visitantes")
+    if dados and contagens_ok and st.button("📊 Análise Completa", type="primary"):
+        resultado_completo = calcular_teste_exato(
             dados['conversions_a'], dados['visitors_a'],
             dados['conversions_b'], dados['visitors_b']
         )
@@ -540,20 +1352,32 @@ elif opcao == "📊 Análise Completa":
             st.metric("Melhoria", f"{resultado_completo['diff_rel']:+.1f}%")
         with col5:
             st.metric("P-valor", f"{resultado_completo['p_value']:.4f}")
+        if resultado_completo['metodo'] != 'z':
+            st.caption(f"Contagens esperadas abaixo de 5: p-valor do teste exato de "
+                       f"{resultado_completo['metodo'].capitalize()} (a aproximação normal daria "
+                       f"{resultado_completo['p_value_normal']:.4f}).")
         
         # Gráfico de comparação
-        fig_compare = go.Figure(data=[
-            go.Bar(name='Grupo A', x=['Taxa de Conversão'], y=[resultado_completo['p_a']*100]),
-            go.Bar(name='Grupo B', x=['Taxa de Conversão'], y=[resultado_completo['p_b']*100])
-        ])
-        
-        fig_compare.update_layout(
-            title="Comparação de Taxa de Conversão",
-            yaxis_title="Taxa de Conversão (%)",
-            barmode='group'
-        )
+        fig_compare = figura_comparacao(resultado_completo['p_a'], resultado_completo['p_b'])
+        
+        mostrar_grafico(fig_compare)
         
-        st.plotly_chart(fig_compare, use_container_width=True)
+        # Visão bayesiana (prior uniforme Beta(1, 1))
+        st.subheader("🎲 Análise Bayesiana")
+        resultado_bayes = analisar_bayesiano(
+            dados['conversions_a'], dados['visitors_a'],
+            dados['conversions_b'], dados['visitors_b']
+        )
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("P(B > A)", f"{resultado_bayes['prob_b_melhor']:.1%}")
+        with col2:
+            st.metric("Perda Esperada (escolher B)", f"{resultado_bayes['perda_esperada_b']:.4%}")
+        with col3:
+            st.metric("Perda Esperada (manter A)", f"{resultado_bayes['perda_esperada_a']:.4%}")
+        with col4:
+            st.metric("Melhoria (IC 95%)",
+                      f"[{resultado_bayes['melhoria_ic_inferior']:+.1f}%, {resultado_bayes['melhoria_ic_superior']:+.1f}%]")
         
         # Conclusão final
         if resultado_completo['p_value'] < 0.05:
@@ -564,6 +1388,141 @@ elif opcao == "📊 Análise Completa":
         else:
             st.warning("🤷 **SEM DIFERENÇA SIGNIFICATIVA** - Não há evidência de diferença real entre os grupos.")
 
+# === ABA 5: ANÁLISE A/B/n ===
+elif opcao == "🧪 Análise A/B/n":
+    st.header("🧪 Análise de Teste A/B/n (Múltiplas Variantes)")
+    st.caption("A primeira linha é o controle. Adicione ou remova linhas para mudar o número de variantes.")
+    
+    df_variantes = st.data_editor(
+        pd.DataFrame({
+            'Variante': ["Controle", "Variação B", "Variação C", "Variação D"],
+            'Conversões': [245, 312, 270, 298],
+            'Visitantes': [5000, 5200, 5100, 4950]
+        }),
+        num_rows="dynamic", use_container_width=True, key="variantes_abn"
+    ).dropna()
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        modo_comparacao = st.radio("Comparações", ["Contra o controle", "Todos os pares"], horizontal=True)
+    with col2:
+        correcoes = {"Holm": 'holm', "Bonferroni": 'bonferroni', "Benjamini-Hochberg (FDR)": 'bh', "Nenhuma": 'nenhuma'}
+        nome_correcao = st.selectbox("Correção para Comparações Múltiplas", list(correcoes))
+    
+    if len(df_variantes) < 2:
+        st.warning("Informe pelo menos duas variantes.")
+    elif st.button("🧪 Analisar Variantes", type="primary"):
+        nomes = df_variantes['Variante'].astype(str).tolist()
+        conversoes = df_variantes['Conversões'].to_numpy(dtype=float)
+        visitantes = df_variantes['Visitantes'].to_numpy(dtype=float)
+        
+        omnibus = teste_qui_quadrado(conversoes, visitantes)
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("Qui-quadrado", f"{omnibus['qui2']:.2f}")
+        with col2:
+            st.metric("Graus de Liberdade", omnibus['graus_liberdade'])
+        with col3:
+            st.metric("P-valor Omnibus", f"{omnibus['p_value']:.4f}")
+        
+        if omnibus['p_value'] < 0.05:
+            st.success("Há diferença significativa entre pelo menos duas variantes.")
+        else:
+            st.warning("O teste omnibus não encontrou diferença entre as variantes.")
+        
+        controle = 0 if modo_comparacao == "Contra o controle" else None
+        comparacoes = comparacoes_pareadas(conversoes, visitantes, controle=controle,
+                                           correcao=correcoes[nome_correcao])
+        
+        if controle is not None:
+            df_comparacoes = pd.DataFrame({
+                'Variante': nomes[1:],
+                'Taxa': (conversoes / visitantes)[1:],
+                'Diferença': comparacoes['diff_abs'][1:],
+                'Melhoria (%)': comparacoes['diff_rel'][1:],
+                'P-valor': comparacoes['p_value'][1:],
+                'P-valor Ajustado': comparacoes['p_ajustado'][1:],
+                'Significativo': np.where(comparacoes['significativo'][1:], "✅ Sim", "❌ Não")
+            })
+        else:
+            i, j = np.triu_indices(len(nomes), 1)
+            df_comparacoes = pd.DataFrame({
+                'Variante': np.array(nomes)[j],
+                'Comparada com': np.array(nomes)[i],
+                'Diferença': comparacoes['diff_abs'][i, j],
+                'Melhoria (%)': comparacoes['diff_rel'][i, j],
+                'P-valor': comparacoes['p_value'][i, j],
+                'P-valor Ajustado': comparacoes['p_ajustado'][i, j],
+                'Significativo': np.where(comparacoes['significativo'][i, j], "✅ Sim", "❌ Não")
+            })
+            mostrar_grafico(figura_matriz_p_valores(comparacoes['p_ajustado'], nomes))
+        
+        st.dataframe(df_comparacoes, use_container_width=True)
+        
+        # Probabilidade bayesiana de cada variante ser a melhor (Monte Carlo em blocos)
+        bayes_k = monte_carlo_k_bracos(conversoes, visitantes, semente=0)
+        st.dataframe(pd.DataFrame({
+            'Variante': nomes,
+            'Prob. de Ser a Melhor': bayes_k['prob_melhor'],
+            'Perda Esperada': bayes_k['perda_esperada']
+        }), use_container_width=True)
+    
+    with st.expander("📐 Planejar Teste com k Variantes"):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            taxa_base_k = st.number_input("Taxa de Conversão Atual (%)", min_value=0.1, max_value=100.0,
+                                          value=5.0, step=0.1, key="taxa_k") / 100
+        with col2:
+            melhoria_k = st.number_input("Melhoria Esperada (%)", min_value=1.0, max_value=100.0,
+                                         value=20.0, step=1.0, key="melhoria_k") / 100
+        with col3:
+            k_maximo = st.number_input("Máximo de Variantes", min_value=2, max_value=20, value=6, step=1)
+        
+        ks = np.arange(2, k_maximo + 1)
+        plano_k = tamanho_amostra_k_bracos(taxa_base_k, melhoria_k, ks)
+        st.dataframe(pd.DataFrame({
+            'Variantes (k)': ks,
+            'Alpha por Comparação': plano_k['nivel_por_comparacao'],
+            'Amostra por Variante': plano_k['n_por_braco'],
+            'Amostra Total': plano_k['n_total']
+        }), use_container_width=True)
+        st.caption("Comparações contra o controle com correção de Bonferroni e poder de 80% por comparação.")
+
+instrumentacao.registrar(f"pagina[{opcao}]", time.perf_counter() - inicio_pagina_s)
+
+# === PAINEL DE DESEMPENHO ===
+if instrumentacao.esta_ativo():
+    diretorio_metricas = os.environ.get("CALCULADORA_METRICAS_DIR", "metricas")
+    instrumentacao.exportar_jsonl(os.path.join(diretorio_metricas, "execucoes.jsonl"), execucao_medida, rotulo=opcao)
+    instrumentacao.exportar_prometheus(os.path.join(diretorio_metricas, "calculadora.prom"))
+    
+    with st.sidebar.expander("⏱️ Desempenho", expanded=True):
+        st.markdown("**Esta execução**")
+        st.dataframe(pd.DataFrame(execucao_medida.resumo()), use_container_width=True, hide_index=True)
+        st.markdown("**Acumulado do processo**")
+        st.dataframe(pd.DataFrame(instrumentacao.REGISTRO_GLOBAL.resumo()), use_container_width=True, hide_index=True)
+        st.caption(f"Exportado em {diretorio_metricas}/execucoes.jsonl e {diretorio_metricas}/calculadora.prom")
+        if st.button("Zerar medições"):
+            instrumentacao.REGISTRO_GLOBAL.limpar()
+
+# === PAINEL DE CACHE ===
+# Desenhado ao final para refletir os acertos e falhas desta execução
+with st.sidebar.expander("🗄️ Cache"):
+    for nome_cache, cache in [("Cálculos", CACHE_CALCULOS), ("Gráficos", CACHE_FIGURAS)]:
+        est = cache.estatisticas()
+        st.markdown(f"**{nome_cache}**: {est['itens']}/{est['max_itens']} itens")
+        st.caption(f"Acertos: {est['acertos']} | Falhas: {est['falhas']} | "
+                   f"Remoções: {est['remocoes']} | Taxa de acerto: {est['taxa_acerto']:.0%}")
+    est = CACHE_ARQUIVOS.estatisticas()
+    st.markdown(f"**Arquivos**: {est['itens']} em memória "
+                f"({est['bytes'] / 2**20:,.1f}/{est['limite_memoria'] / 2**20:,.0f} MB)")
+    st.caption(f"Memória: {est['acertos_memoria']} | Disco: {est['acertos_disco']} | "
+               f"Leituras: {est['leituras']} | Despejos: {est['despejos']} | Taxa de acerto: {est['taxa_acerto']:.0%}")
+    if st.button("Limpar cache"):
+        CACHE_CALCULOS.limpar()
+        CACHE_FIGURAS.limpar()
+        CACHE_ARQUIVOS.limpar()
+
 # === FOOTER ===
 st.markdown("---")
 st.markdown("""
@@ -0,0 +1,136 @@
+"""Teste de carga da API HTTP (calculadora.servidor).
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.carga                            # sobe um servidor local e mede
+    python -m benchmarks.carga --url http://host:8000     # mede um servidor já no ar
+    python -m benchmarks.carga --conexoes 128 --duracao 20 --rota /teste/lote
+
+Abre `conexoes` conexões keep-alive que disparam requisições em sequência
+durante `duracao` segundos, com corpos sorteados de um conjunto de
+`distintos` variações (para exercitar cache e coalescência). Reporta vazão e
+latência p50/p90/p99/máxima; com --saida grava o resumo em JSON.
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlparse
+
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def gerar_corpos(rota, distintos, tamanho_lote, semente=0):
+    rng = np.random.default_rng(semente)
+    lote = rota.endswith('/lote')
+    n = tamanho_lote if lote else None
+    corpos = []
+    for _ in range(distintos):
+        if rota.startswith('/amostra'):
+            corpo = {'taxa_base': rng.uniform(0.01, 0.2, n), 'melhoria_minima_detectar': rng.uniform(0.05, 0.5, n)}
+        else:
+            visitantes = rng.integers(100, 100_000, (2, n) if lote else 2)
+            conversoes = rng.binomial(visitantes, 0.05)
+            corpo = {'conversions_a': conversoes[0], 'visitors_a': visitantes[0],
+                     'conversions_b': conversoes[1], 'visitors_b': visitantes[1]}
+        corpos.append(json.dumps({k: np.asarray(v).tolist() for k, v in corpo.items()}).encode())
+    return corpos
+
+
+async def _cliente(host, porta, rota, corpos, fim, latencias, erros, rng):
+    leitor, escritor = await asyncio.open_connection(host, porta)
+    try:
+        while time.perf_counter() < fim:
+            corpo = corpos[rng.integers(len(corpos))]
+            inicio = time.perf_counter()
+            escritor.write(f"POST {rota} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                           f"Content-Length: {len(corpo)}\r\n\r\n".encode() + corpo)
+            await escritor.drain()
+            status = int((await leitor.readline()).split()[1])
+            tamanho = 0
+            while (linha := await leitor.readline()) not in (b'\r\n', b''):
+                if linha.lower().startswith(b'content-length:'):
+                    tamanho = int(linha.split(b':')[1])
+            await leitor.readexactly(tamanho)
+            latencias.append(time.perf_counter() - inicio)
+            if status != 200:
+                erros.append(status)
+    finally:
+        escritor.close()
+
+
+async def executar_carga(host, porta, rota, corpos, conexoes, duracao, aquecimento=1.0):
+    if aquecimento > 0:
+        await asyncio.gather(*(_cliente(host, porta, rota, corpos, time.perf_counter() + aquecimento, [], [],
+                                        np.random.default_rng(i)) for i in range(conexoes)))
+    latencias, erros = [], []
+    inicio = time.perf_counter()
+    await asyncio.gather(*(_cliente(host, porta, rota, corpos, inicio + duracao, latencias, erros,
+                                    np.random.default_rng(1000 + i)) for i in range(conexoes)))
+    decorrido = time.perf_counter() - inicio
+    ms = np.asarray(latencias) * 1000
+    return {
+        'rota': rota, 'conexoes': conexoes, 'duracao_s': decorrido, 'requisicoes': len(latencias),
+        'erros': len(erros), 'vazao_rps': len(latencias) / decorrido,
+        'p50_ms': float(np.percentile(ms, 50)), 'p90_ms': float(np.percentile(ms, 90)),
+        'p99_ms': float(np.percentile(ms, 99)), 'max_ms': float(ms.max()),
+    }
+
+
+def _subir_servidor(processos):
+    """Servidor em outro processo, para que cliente e servidor não dividam o event loop"""
+    comando = [sys.executable, "-m", "calculadora", "servir", "--porta", "0"]
+    if processos is not None:
+        comando += ["--processos", str(processos)]
+    servidor = subprocess.Popen(comando, cwd=RAIZ, stderr=subprocess.PIPE, text=True)
+    linha = servidor.stderr.readline()
+    if not linha.startswith("Servindo em"):
+        servidor.kill()
+        raise RuntimeError(f"O servidor não subiu: {linha}{servidor.stderr.read()}")
+    return servidor, urlparse(linha.split()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="servidor já no ar (padrão: sobe um local em porta livre)")
+    parser.add_argument("--rota", default="/teste", choices=["/amostra", "/teste", "/amostra/lote", "/teste/lote"])
+    parser.add_argument("--conexoes", type=int, default=64)
+    parser.add_argument("--duracao", type=float, default=10.0)
+    parser.add_argument("--distintos", type=int, default=1000, help="corpos diferentes sorteados pelos clientes")
+    parser.add_argument("--tamanho-lote", type=int, default=1000, help="elementos por requisição nas rotas /lote")
+    parser.add_argument("--processos", type=int, default=None, help="workers do servidor local")
+    parser.add_argument("--saida", help="grava o resumo em JSON")
+    args = parser.parse_args(argv)
+
+    servidor = None
+    if args.url:
+        endereco = urlparse(args.url)
+    else:
+        servidor, endereco = _subir_servidor(args.processos)
+    try:
+        corpos = gerar_corpos(args.rota, args.distintos, args.tamanho_lote)
+        resumo = asyncio.run(executar_carga(endereco.hostname, endereco.port, args.rota, corpos,
+                                            args.conexoes, args.duracao))
+    finally:
+        if servidor is not None:
+            servidor.terminate()
+            servidor.wait()
+
+    print(f"{resumo['rota']}: {resumo['requisicoes']:,} requisições em {resumo['duracao_s']:.1f} s "
+          f"({resumo['conexoes']} conexões, {resumo['erros']} erros)")
+    print(f"vazão: {resumo['vazao_rps']:,.0f} req/s | p50 {resumo['p50_ms']:.2f} ms | "
+          f"p90 {resumo['p90_ms']:.2f} ms | p99 {resumo['p99_ms']:.2f} ms | máx {resumo['max_ms']:.2f} ms")
+    if args.saida:
+        os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+        with open(args.saida, "w", encoding="utf-8") as arquivo:
+            json.dump(resumo, arquivo, indent=2, ensure_ascii=False)
+    return 1 if resumo['erros'] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
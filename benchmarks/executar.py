@@ -0,0 +1,223 @@
+"""Suíte de benchmarks do backend estatístico e do tempo de execução das páginas.
+
+Uso (a partir da raiz do repositório):
+    python -m benchmarks.executar                       # roda e compara com a referência
+    python -m benchmarks.executar --rapido              # tamanhos menores, sem páginas
+    python -m benchmarks.executar --atualizar-referencia --filtro ingestao
+
+Os resultados vão para um JSON com a mediana e o mínimo de cada caso. Um caso
+regride quando a mediana passa de `tolerancia` vezes a mediana da referência;
+nesse caso o processo termina com código 1. Casos sem referência são listados
+no fim. `--atualizar-referencia` grava só os casos executados na referência,
+mantendo os demais.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+RAIZ = Path(__file__).resolve().parent.parent
+REFERENCIA = Path(__file__).resolve().parent / "referencia.json"
+SCRIPT_APP = RAIZ / "Calculadora Estatistica.py"
+PAGINAS = ["🎯 Planejar Novo Teste", "🔍 Validar Teste em Andamento", "⚡ Cálculo Rápido",
+           "📊 Análise Completa", "🧪 Análise A/B/n"]
+
+
+def medir(funcao, repeticoes=5, aquecimento=1):
+    """Executa `funcao` e retorna mediana e mínimo do tempo de parede, em segundos"""
+    for _ in range(aquecimento):
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {'mediana_s': statistics.median(tempos), 'minimo_s': min(tempos), 'repeticoes': repeticoes}
+
+
+def casos_backend(diretorio, rapido=False):
+    """Casos do backend; os arquivos de ingestão são gerados em `diretorio`"""
+    from calculadora import (
+        agregar_eventos_por_variante,
+        calcular_grade_amostras,
+        calcular_tamanho_amostra_ab,
+        calcular_tamanho_amostra_ab_lote,
+        calcular_teste_atual,
+        calcular_teste_exato,
+        prever_duracao,
+        resolver_tamanho_amostra,
+        simular_bandit,
+    )
+    from calculadora.arquivos import CacheArquivos, caminho_parquet, ler_tabela
+
+    rng = np.random.default_rng(0)
+    historico_trafego = {str(d): v for d, v in zip(np.arange('2026-01-01', '2026-04-01', dtype='datetime64[D]'),
+                                                   rng.lognormal(np.log(1000), 0.1, 90))}
+    tamanhos = [1_000, 100_000] if rapido else [1_000, 100_000, 1_000_000]
+    visitantes_pequenos = np.concatenate([rng.choice([40, 80], (2, 1000)), rng.integers(100, 5000, (2, 4000))], axis=1)
+    pequenas = rng.binomial(visitantes_pequenos, 0.01)
+    casos = {
+        # Chamadas escalares repetidas 1000 vezes para ficarem acima do ruído do relógio
+        'amostra_escalar_x1000': lambda: [calcular_tamanho_amostra_ab(0.05, 0.2) for _ in range(1000)],
+        'teste_escalar_x1000': lambda: [calcular_teste_atual(516, 7465, 453, 6557) for _ in range(1000)],
+        'grade_cenarios_120k': lambda: calcular_grade_amostras(
+            np.linspace(0.01, 0.2, 40), np.linspace(0.005, 0.5, 50),
+            [0.7, 0.8, 0.9, 0.95], [0.01, 0.05, 0.1], [0.3, 0.4, 0.5, 0.6, 0.7]),
+        # Poder binomial exato com taxa baixa e efeito pequeno (≈2,5 milhões de visitantes)
+        'amostra_exata_taxa_2pct_melhoria_2.5pct': lambda: resolver_tamanho_amostra(
+            0.02, 0.025, variancia='agrupada', exato=True),
+        # Contagens pequenas: Fisher em lote e Boschloo com as tabelas por desenho já em cache
+        'teste_exato_5000': lambda: calcular_teste_exato(
+            pequenas[0], visitantes_pequenos[0], pequenas[1], visitantes_pequenos[1]),
+        'bandit_10000_replicas_60_dias': lambda: simular_bandit(0.05, 0.06, 1000, 60, replicas=10_000, semente=0,
+                                                                processos=1),
+        'previsao_duracao_2000_caminhos': lambda: prever_duracao(
+            [8159, 2000, 40000], [8159, 2000, 40000], historico=historico_trafego, dias_rampa=3),
+    }
+    for n in tamanhos:
+        taxas = rng.uniform(0.01, 0.2, n)
+        melhorias = rng.uniform(0.05, 0.5, n)
+        visitantes = rng.integers(100, 100_000, (2, n))
+        conversoes = rng.binomial(visitantes, 0.05)
+        casos[f'amostra_lote_{n}'] = lambda t=taxas, m=melhorias: calcular_tamanho_amostra_ab_lote(t, m)
+        casos[f'teste_lote_{n}'] = lambda c=conversoes, v=visitantes: calcular_teste_atual(c[0], v[0], c[1], v[1])
+
+    # Ingestão de CSV: arquivos sintéticos gerados uma vez por execução
+    cache_arquivos = CacheArquivos(os.path.join(diretorio, "cache"))
+    for linhas in ([100_000] if rapido else [100_000, 1_000_000]):
+        caminho = os.path.join(diretorio, f"eventos_{linhas}.csv")
+        variantes = rng.choice(['controle', 'variacao'], linhas)
+        convertidos = rng.random(linhas) < 0.05
+        with open(caminho, "w") as arquivo:
+            arquivo.write("user_id,variant,converted,revenue\n")
+            np.savetxt(arquivo, np.column_stack([
+                np.arange(linhas).astype(str), variantes, convertidos.astype(int).astype(str),
+                np.round(convertidos * rng.lognormal(3, 1, linhas), 2).astype(str)
+            ]), fmt="%s", delimiter=",")
+        casos[f'ingestao_csv_{linhas}'] = lambda c=caminho: agregar_eventos_por_variante(c)
+        # Reexecuções: o arquivo já lido volta do cache pelo hash, e a agregação lê o Parquet convertido
+        casos[f'releitura_cache_{linhas}'] = lambda c=caminho: ler_tabela(c, cache=cache_arquivos)
+        casos[f'ingestao_parquet_{linhas}'] = lambda c=caminho: agregar_eventos_por_variante(
+            caminho_parquet(c, cache=cache_arquivos))
+
+    # Partida a frio da CLI: processo novo a cada repetição (interpretador, imports e cálculo)
+    caminho_teste = os.path.join(diretorio, "experimentos.csv")
+    with open(caminho_teste, "w") as arquivo:
+        arquivo.write("conversions_a,visitors_a,conversions_b,visitors_b\n")
+        np.savetxt(arquivo, np.column_stack([pequenas[0], visitantes_pequenos[0], pequenas[1], visitantes_pequenos[1]]),
+                   fmt="%d", delimiter=",")
+    comandos_cli = {
+        'cli_partida_fria_amostra': ["amostra", "--taxa-base", "0.05", "--melhoria", "0.1"],
+        'cli_partida_fria_teste_5000': ["teste", caminho_teste],
+    }
+    for nome, argumentos in comandos_cli.items():
+        casos[nome] = lambda a=argumentos: subprocess.run(
+            [sys.executable, "-m", "calculadora", *a], cwd=RAIZ, check=True, stdout=subprocess.DEVNULL)
+    return casos
+
+
+def casos_paginas():
+    """Execução headless completa do script para cada página, com o botão principal acionado"""
+    from streamlit.testing.v1 import AppTest
+
+    from calculadora.cache import CACHE_CALCULOS, CACHE_FIGURAS
+
+    def executar(pagina):
+        CACHE_CALCULOS.limpar()
+        CACHE_FIGURAS.limpar()
+        app = AppTest.from_file(str(SCRIPT_APP), default_timeout=300).run()
+        app.sidebar.selectbox[0].set_value(pagina).run()
+        principais = [b for b in app.button if b.proto.type == "primary"]
+        if principais:
+            principais[0].click().run()
+        if app.exception:
+            raise RuntimeError(f"Página {pagina!r} falhou: {app.exception[0].value}")
+
+    return {f'pagina[{p}]': (lambda p=p: executar(p)) for p in PAGINAS}
+
+
+def comparar(resultados, referencia, tolerancia):
+    """Retorna (regressões, nomes dos casos sem referência)"""
+    regressoes, sem_referencia = [], []
+    for nome, medida in resultados['casos'].items():
+        base = referencia.get('casos', {}).get(nome)
+        if base is None:
+            sem_referencia.append(nome)
+            continue
+        limite = base.get('tolerancia', tolerancia) * base['mediana_s']
+        medida['referencia_s'] = base['mediana_s']
+        medida['razao'] = medida['mediana_s'] / base['mediana_s']
+        if medida['mediana_s'] > limite:
+            regressoes.append((nome, medida['mediana_s'], limite))
+    return regressoes, sem_referencia
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--saida", default="benchmarks/resultados.json")
+    parser.add_argument("--referencia", default=str(REFERENCIA))
+    parser.add_argument("--tolerancia", type=float, default=1.5,
+                        help="fator máximo sobre a mediana de referência (padrão: 1.5)")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--rapido", action="store_true", help="tamanhos menores e sem páginas")
+    parser.add_argument("--filtro", help="roda só os casos cujo nome contém este texto")
+    parser.add_argument("--atualizar-referencia", action="store_true")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory(prefix="bench_calculadora_") as diretorio:
+        return executar(args, diretorio)
+
+
+def executar(args, diretorio):
+    casos = casos_backend(diretorio, args.rapido)
+    if not args.rapido:
+        casos.update(casos_paginas())
+    if args.filtro:
+        casos = {n: f for n, f in casos.items() if args.filtro in n}
+
+    resultados = {
+        'ambiente': {
+            'python': platform.python_version(), 'numpy': np.__version__,
+            'plataforma': platform.platform(), 'cpus': os.cpu_count(),
+        },
+        'casos': {},
+    }
+    for nome, funcao in casos.items():
+        repeticoes = max(1, args.repeticoes // 2) if nome.startswith('pagina') else args.repeticoes
+        resultados['casos'][nome] = medir(funcao, repeticoes)
+        print(f"{nome:<45} {resultados['casos'][nome]['mediana_s'] * 1000:>10.2f} ms", flush=True)
+
+    referencia = {}
+    if os.path.exists(args.referencia):
+        with open(args.referencia) as arquivo:
+            referencia = json.load(arquivo)
+
+    regressoes, sem_referencia = [], []
+    if args.atualizar_referencia:
+        # Os casos que não rodaram (filtro, --rapido) continuam com a referência anterior
+        destino = args.referencia
+        resultados['casos'] = {**referencia.get('casos', {}), **resultados['casos']}
+    else:
+        destino = args.saida
+        regressoes, sem_referencia = comparar(resultados, referencia, args.tolerancia)
+    with open(destino, "w") as arquivo:
+        json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+    print(f"Resultados salvos em {destino}")
+
+    for nome in sem_referencia:
+        print(f"SEM REFERÊNCIA: {nome} (não comparado; use --atualizar-referencia --filtro)", file=sys.stderr)
+    for nome, tempo, limite in regressoes:
+        print(f"REGRESSÃO: {nome}: {tempo * 1000:.2f} ms > limite {limite * 1000:.2f} ms", file=sys.stderr)
+    return 1 if regressoes else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
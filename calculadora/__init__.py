@@ -0,0 +1,71 @@
+"""Backend estatístico da Calculadora A/B, sem dependência do Streamlit.
+
+Os submódulos só são importados quando algum nome é usado pela primeira vez,
+e SciPy/pandas só quando uma função que precisa deles é chamada.
+"""
+import importlib
+
+_EXPORTACOES = {
+    'calcular_tamanho_amostra_ab': 'amostra',
+    'calcular_tamanho_amostra_ab_lote': 'amostra',
+    'calcular_grade_amostras': 'amostra',
+    'gerar_grade': 'amostra',
+    'calcular_teste_atual': 'teste',
+    'calcular_teste_exato': 'exato',
+    'selecionar_metodo': 'exato',
+    'pvalores_desenho': 'exato',
+    'contagens_validas': 'exato',
+    'agregar_eventos_por_variante': 'ingestao',
+    'resumir_estatisticas': 'ingestao',
+    'dados_teste_de_estatisticas': 'ingestao',
+    'EstadoSequencial': 'sequencial',
+    'atualizar_sequencial': 'sequencial',
+    'registrar_acumulado': 'sequencial',
+    'simular_poder': 'simulacao',
+    'simular_plano': 'simulacao',
+    'poder_teste': 'solucionador',
+    'resolver_tamanho_amostra': 'solucionador',
+    'resolver_efeito_minimo': 'solucionador',
+    'ajustar_p_valores': 'multivariante',
+    'comparacoes_pareadas': 'multivariante',
+    'teste_qui_quadrado': 'multivariante',
+    'tamanho_amostra_k_bracos': 'multivariante',
+    'analisar_bayesiano': 'bayesiano',
+    'monte_carlo_k_bracos': 'bayesiano',
+    'prob_maior': 'bayesiano',
+    'BootstrapPoisson': 'bootstrap',
+    'bootstrap_diferenca_medias': 'bootstrap',
+    'agregar_por_segmento': 'segmentos',
+    'testar_segmentos': 'segmentos',
+    'matriz_segmentos': 'segmentos',
+    'ArmazemExperimentos': 'armazenamento',
+    'abrir_armazem': 'armazenamento',
+    'ajustar_trafego': 'previsao',
+    'prever_duracao': 'previsao',
+    'estatisticas_cuped': 'cuped',
+    'combinar_estatisticas': 'cuped',
+    'agregar_cuped': 'cuped',
+    'analisar_cuped': 'cuped',
+    'ajustar_plano_cuped': 'cuped',
+    'agregar_razao': 'razao',
+    'analisar_razao': 'razao',
+    'estatisticas_razao': 'razao',
+    'simular_bandit': 'bandit',
+    'simular_bandit_plano': 'bandit',
+    'ler_tabela': 'arquivos',
+    'caminho_parquet': 'arquivos',
+}
+
+__all__ = sorted(_EXPORTACOES)
+
+
+def __getattr__(nome):
+    if nome not in _EXPORTACOES:
+        raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
+    valor = getattr(importlib.import_module(f".{_EXPORTACOES[nome]}", __name__), nome)
+    globals()[nome] = valor
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,124 @@
+"""Cálculo do tamanho de amostra para testes A/B"""
+import numpy as np
+
+from .instrumentacao import medir
+
+
+@medir()
+def calcular_tamanho_amostra_ab(taxa_base, melhoria_minima_detectar, poder_estatistico=0.80, nivel_significancia=0.05, split_ratio=0.5):
+    from scipy import special
+
+    # Determinar se é melhoria absoluta ou relativa
+    if melhoria_minima_detectar > taxa_base:
+        taxa_variacao = taxa_base * (1 + melhoria_minima_detectar)
+        effect_size = taxa_variacao - taxa_base
+        tipo_melhoria = "relativa"
+    else:
+        effect_size = melhoria_minima_detectar
+        taxa_variacao = taxa_base + effect_size
+        tipo_melhoria = "absoluta"
+    
+    # Z-scores
+    z_alpha = special.ndtri(1 - nivel_significancia/2)
+    z_beta = special.ndtri(poder_estatistico)
+    
+    # Proporção média
+    p_avg = (taxa_base + taxa_variacao) / 2
+    
+    # Cálculo do tamanho da amostra por grupo
+    numerator = (z_alpha + z_beta) ** 2 * p_avg * (1 - p_avg)
+    denominator = effect_size ** 2
+    n_per_group = numerator / denominator
+    
+    # Ajustar para split ratio
+    n_control = int(np.ceil(n_per_group / split_ratio))
+    n_treatment = int(np.ceil(n_per_group / (1 - split_ratio)))
+    n_total = n_control + n_treatment
+    
+    # Calcular métricas derivadas
+    melhoria_relativa = (effect_size / taxa_base) * 100
+    
+    return {
+        'n_controle': n_control,
+        'n_variacao': n_treatment, 
+        'n_total': n_total,
+        'taxa_base': taxa_base,
+        'taxa_variacao': taxa_variacao,
+        'effect_size': effect_size,
+        'melhoria_relativa': melhoria_relativa,
+        'poder_estatistico': poder_estatistico,
+        'nivel_significancia': nivel_significancia,
+        'tipo_melhoria': tipo_melhoria
+    }
+
+
+@medir()
+def calcular_tamanho_amostra_ab_lote(taxa_base, melhoria_minima_detectar, poder_estatistico=0.80, nivel_significancia=0.05, split_ratio=0.5):
+    """Versão vetorizada de calcular_tamanho_amostra_ab.
+
+    Todos os argumentos aceitam escalares ou arrays, combinados por broadcasting
+    do NumPy. Retorna um dicionário com um array por métrica (mesmas chaves da
+    versão escalar).
+    """
+    from scipy import special
+
+    taxa_base, melhoria, poder, alpha, split = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in
+          (taxa_base, melhoria_minima_detectar, poder_estatistico, nivel_significancia, split_ratio))
+    )
+
+    # Determinar, elemento a elemento, se é melhoria absoluta ou relativa
+    relativa = melhoria > taxa_base
+    taxa_variacao = np.where(relativa, taxa_base * (1 + melhoria), taxa_base + melhoria)
+    effect_size = taxa_variacao - taxa_base
+
+    # Z-scores (ndtri é a inversa da normal padrão, sem o overhead de stats.norm)
+    z_alpha = special.ndtri(1 - alpha/2)
+    z_beta = special.ndtri(poder)
+
+    # Proporção média e tamanho por grupo
+    p_avg = (taxa_base + taxa_variacao) / 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n_per_group = (z_alpha + z_beta) ** 2 * p_avg * (1 - p_avg) / effect_size ** 2
+    if not np.all(np.isfinite(n_per_group)):
+        raise ValueError("Há combinações com efeito nulo ou parâmetros inválidos")
+
+    # Ajustar para split ratio
+    n_control = np.ceil(n_per_group / split).astype(np.int64)
+    n_treatment = np.ceil(n_per_group / (1 - split)).astype(np.int64)
+
+    return {
+        'n_controle': n_control,
+        'n_variacao': n_treatment,
+        'n_total': n_control + n_treatment,
+        'taxa_base': taxa_base,
+        'taxa_variacao': taxa_variacao,
+        'effect_size': effect_size,
+        'melhoria_relativa': effect_size / taxa_base * 100,
+        'poder_estatistico': poder,
+        'nivel_significancia': alpha,
+        'tipo_melhoria': np.where(relativa, "relativa", "absoluta")
+    }
+
+
+def gerar_grade(taxas_base, melhorias, poderes=(0.80,), niveis_significancia=(0.05,), split_ratios=(0.5,)):
+    """Produto cartesiano dos parâmetros, achatado em arrays 1-D"""
+    grade = np.meshgrid(
+        np.asarray(taxas_base, dtype=float), np.asarray(melhorias, dtype=float),
+        np.asarray(poderes, dtype=float), np.asarray(niveis_significancia, dtype=float),
+        np.asarray(split_ratios, dtype=float), indexing='ij'
+    )
+    nomes = ('taxa_base', 'melhoria_minima_detectar', 'poder_estatistico', 'nivel_significancia', 'split_ratio')
+    return {nome: g.ravel() for nome, g in zip(nomes, grade)}
+
+
+@medir()
+def calcular_grade_amostras(taxas_base, melhorias, poderes=(0.80,), niveis_significancia=(0.05,), split_ratios=(0.5,)):
+    """Calcula o tamanho da amostra para o produto cartesiano dos parâmetros"""
+    import pandas as pd
+
+    grade = gerar_grade(taxas_base, melhorias, poderes, niveis_significancia, split_ratios)
+    resultado = calcular_tamanho_amostra_ab_lote(**grade)
+    resultado['melhoria_minima_detectar'] = grade['melhoria_minima_detectar']
+    resultado['split_ratio'] = grade['split_ratio']
+    return pd.DataFrame(resultado)
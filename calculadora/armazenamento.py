@@ -0,0 +1,234 @@
+"""Armazenamento local de experimentos e de seus snapshots diários.
+
+Usa SQLite embutido: cada experimento guarda o plano (taxa base, melhoria,
+poder e a amostra ideal) e cada snapshot guarda os totais acumulados de um
+dia. As métricas derivadas (z, p-valor, melhoria) são calculadas só para os
+snapshots inseridos ou alterados, de uma vez, e gravadas junto com eles; o
+progresso contra a amostra ideal sai de um join na leitura.
+"""
+import datetime
+import functools
+import os
+import sqlite3
+import threading
+
+from .instrumentacao import medir
+
+CAMINHO_PADRAO = os.environ.get('CALCULADORA_BANCO', 'experimentos.db')
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS experimentos (
+    experimento TEXT PRIMARY KEY,
+    taxa_base REAL NOT NULL,
+    melhoria_minima REAL NOT NULL,
+    poder_estatistico REAL NOT NULL,
+    nivel_significancia REAL NOT NULL,
+    n_planejado INTEGER NOT NULL,
+    atualizado_em TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS snapshots (
+    experimento TEXT NOT NULL,
+    data TEXT NOT NULL,
+    conversions_a INTEGER NOT NULL,
+    visitors_a INTEGER NOT NULL,
+    conversions_b INTEGER NOT NULL,
+    visitors_b INTEGER NOT NULL,
+    diff_rel REAL,
+    z_score REAL,
+    p_value REAL,
+    PRIMARY KEY (experimento, data)
+) WITHOUT ROWID;
+"""
+
+COLUNAS_SNAPSHOT = ('experimento', 'data', 'conversions_a', 'visitors_a', 'conversions_b', 'visitors_b')
+
+_CONSULTA_HISTORICO = """
+SELECT s.experimento, s.data, s.conversions_a, s.visitors_a, s.conversions_b, s.visitors_b,
+       s.diff_rel, s.z_score, s.p_value, e.n_planejado,
+       100.0 * (s.visitors_a + s.visitors_b) / e.n_planejado AS progresso
+FROM snapshots AS s LEFT JOIN experimentos AS e USING (experimento)
+"""
+
+
+def _data_iso(valor):
+    if isinstance(valor, (datetime.date, datetime.datetime)):
+        return valor.strftime('%Y-%m-%d')
+    return str(valor)[:10]
+
+
+class ArmazemExperimentos:
+    """Experimentos e snapshots diários em um arquivo SQLite, seguro entre threads"""
+
+    def __init__(self, caminho=CAMINHO_PADRAO):
+        self.caminho = caminho
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False)
+        self._trava = threading.Lock()
+        with self._trava, self._conexao:
+            if caminho != ':memory:':
+                self._conexao.execute("PRAGMA journal_mode=WAL")
+            self._conexao.execute("PRAGMA synchronous=NORMAL")
+            self._conexao.executescript(_ESQUEMA)
+
+    def fechar(self):
+        with self._trava:
+            self._conexao.close()
+
+    @staticmethod
+    def _planos(experimentos, taxa_base, melhoria_minima, poder_estatistico, nivel_significancia):
+        """Linhas da tabela de experimentos e amostra ideal de cada plano"""
+        import numpy as np
+
+        from .amostra import calcular_tamanho_amostra_ab_lote
+
+        experimentos = [str(e) for e in experimentos]
+        parametros = np.broadcast_arrays(*(np.asarray(v, dtype=float) for v in
+                                           (taxa_base, melhoria_minima, poder_estatistico, nivel_significancia)),
+                                         np.empty(len(experimentos)))[:4]
+        n_planejado = calcular_tamanho_amostra_ab_lote(*parametros)['n_total']
+        agora = datetime.datetime.now().isoformat(timespec='seconds')
+        linhas = list(zip(experimentos, *(p.tolist() for p in parametros), n_planejado.tolist(),
+                          [agora] * len(experimentos)))
+        return linhas, n_planejado
+
+    @staticmethod
+    def _snapshots(snapshots):
+        """Valida os snapshots e devolve as linhas da tabela, com as métricas derivadas"""
+        import pandas as pd
+
+        from .exato import calcular_teste_exato, contagens_validas
+
+        df = pd.DataFrame(snapshots)
+        faltando = set(COLUNAS_SNAPSHOT) - set(df.columns)
+        if faltando:
+            raise ValueError(f"Colunas ausentes nos snapshots: {', '.join(sorted(faltando))}")
+        if df.empty:
+            return []
+        df = df[list(COLUNAS_SNAPSHOT)].copy()
+        df['experimento'] = df['experimento'].astype(str)
+        df['data'] = [_data_iso(d) for d in df['data']]
+        contagens = [df[c].astype('int64').to_numpy() for c in COLUNAS_SNAPSHOT[2:]]
+        if not contagens_validas(*contagens).all():
+            raise ValueError("Os snapshots precisam de visitantes positivos e 0 <= conversões <= visitantes")
+
+        metricas = calcular_teste_exato(*contagens)
+        return list(zip(df['experimento'], df['data'], *(c.tolist() for c in contagens),
+                        metricas['diff_rel'].tolist(), metricas['z_score'].tolist(), metricas['p_value'].tolist()))
+
+    def _gravar(self, planos=(), snapshots=()):
+        # Uma transação: ou entram planos e snapshots, ou nada
+        with self._trava, self._conexao:
+            self._conexao.executemany(
+                """INSERT INTO experimentos VALUES (?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (experimento) DO UPDATE SET
+                       taxa_base = excluded.taxa_base, melhoria_minima = excluded.melhoria_minima,
+                       poder_estatistico = excluded.poder_estatistico,
+                       nivel_significancia = excluded.nivel_significancia,
+                       n_planejado = excluded.n_planejado, atualizado_em = excluded.atualizado_em""",
+                planos
+            )
+            self._conexao.executemany(
+                """INSERT INTO snapshots VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (experimento, data) DO UPDATE SET
+                       conversions_a = excluded.conversions_a, visitors_a = excluded.visitors_a,
+                       conversions_b = excluded.conversions_b, visitors_b = excluded.visitors_b,
+                       diff_rel = excluded.diff_rel, z_score = excluded.z_score, p_value = excluded.p_value""",
+                snapshots
+            )
+
+    @medir()
+    def salvar_experimentos(self, experimentos, taxa_base, melhoria_minima, poder_estatistico=0.80,
+                            nivel_significancia=0.05):
+        """Cria ou atualiza planos em lote e devolve a amostra ideal de cada um.
+
+        Os parâmetros do plano aceitam escalares ou um valor por experimento; as
+        amostras ideais saem de uma única chamada vetorizada.
+        """
+        planos, n_planejado = self._planos(experimentos, taxa_base, melhoria_minima, poder_estatistico,
+                                           nivel_significancia)
+        self._gravar(planos=planos)
+        return n_planejado
+
+    def salvar_experimento(self, experimento, taxa_base, melhoria_minima, poder_estatistico=0.80,
+                           nivel_significancia=0.05):
+        """Cria ou atualiza o plano de um experimento e devolve a amostra ideal"""
+        return int(self.salvar_experimentos([experimento], taxa_base, melhoria_minima, poder_estatistico,
+                                            nivel_significancia)[0])
+
+    @medir()
+    def registrar_snapshots(self, snapshots):
+        """Insere ou substitui snapshots em lote.
+
+        `snapshots` é um DataFrame (ou lista de dicionários) com as colunas de
+        COLUNAS_SNAPSHOT, com totais acumulados até a data. As métricas
+        derivadas são calculadas só para essas linhas, em uma passada
+        vetorizada, e tudo é gravado em uma única transação. Contagens
+        inválidas (conversões acima dos visitantes, visitantes zerados)
+        levantam ValueError sem gravar nada.
+        """
+        linhas = self._snapshots(snapshots)
+        self._gravar(snapshots=linhas)
+        return len(linhas)
+
+    @medir()
+    def salvar_com_snapshots(self, snapshots, experimentos, taxa_base, melhoria_minima, poder_estatistico=0.80,
+                             nivel_significancia=0.05):
+        """salvar_experimentos e registrar_snapshots em uma única transação.
+
+        Os snapshots são validados antes de qualquer escrita: se forem
+        rejeitados, nenhum plano é criado. Devolve o número de snapshots.
+        """
+        linhas = self._snapshots(snapshots)
+        planos, _ = self._planos(experimentos, taxa_base, melhoria_minima, poder_estatistico, nivel_significancia)
+        self._gravar(planos, linhas)
+        return len(linhas)
+
+    def _consultar(self, sql, parametros=()):
+        import pandas as pd
+
+        with self._trava:
+            return pd.read_sql_query(sql, self._conexao, params=parametros)
+
+    def experimentos(self):
+        """Planos salvos com o snapshot mais recente de cada experimento"""
+        return self._consultar(
+            """SELECT e.*, s.data AS ultima_data, s.visitors_a + s.visitors_b AS visitantes, s.p_value,
+                      100.0 * (s.visitors_a + s.visitors_b) / e.n_planejado AS progresso
+               FROM experimentos AS e
+               LEFT JOIN snapshots AS s ON s.experimento = e.experimento
+                   AND s.data = (SELECT MAX(data) FROM snapshots WHERE experimento = e.experimento)
+               ORDER BY e.experimento"""
+        )
+
+    def ultimo_snapshot(self, experimento):
+        """Snapshot mais recente do experimento, ou None se ainda não houver"""
+        df = self._consultar(_CONSULTA_HISTORICO + " WHERE s.experimento = ? ORDER BY s.data DESC LIMIT 1",
+                             (experimento,))
+        return None if df.empty else df.iloc[0].to_dict()
+
+    @medir()
+    def historico(self, experimentos=None):
+        """Trajetória de snapshots, ordenada por experimento e data.
+
+        Sem argumentos devolve o histórico de todos os experimentos em uma
+        única consulta, que percorre a chave primária na ordem já gravada.
+        """
+        if experimentos is None:
+            return self._consultar(_CONSULTA_HISTORICO + " ORDER BY s.experimento, s.data")
+        if isinstance(experimentos, str):
+            experimentos = [experimentos]
+        marcadores = ', '.join('?' * len(experimentos))
+        return self._consultar(
+            _CONSULTA_HISTORICO + f" WHERE s.experimento IN ({marcadores}) ORDER BY s.experimento, s.data",
+            tuple(experimentos)
+        )
+
+    def remover_experimento(self, experimento):
+        with self._trava, self._conexao:
+            self._conexao.execute("DELETE FROM snapshots WHERE experimento = ?", (experimento,))
+            self._conexao.execute("DELETE FROM experimentos WHERE experimento = ?", (experimento,))
+
+
+@functools.lru_cache(maxsize=None)
+def abrir_armazem(caminho=CAMINHO_PADRAO):
+    """Armazém compartilhado por todas as sessões do processo"""
+    return ArmazemExperimentos(caminho)
@@ -0,0 +1,364 @@
+"""Cache de arquivos enviados, indexado pelo conteúdo.
+
+O Streamlit reexecuta a página inteira a cada clique, e um CSV grande seria
+lido de novo em cada reexecução. Aqui cada arquivo é identificado pelo hash
+do conteúdo (o mesmo arquivo enviado de novo, ou por outra sessão, cai na
+mesma entrada) e lido uma única vez, com tipos explícitos para as colunas
+conhecidas. Os DataFrames ficam em um LRU limitado em bytes; os que saem da
+memória são gravados em Parquet e voltam por mapeamento em memória. O
+caminho do Parquet também serve às funções que leem arquivos em blocos ou
+por colunas (agregar_cuped, agregar_por_segmento, ...), e como ele contém o
+hash, é uma chave estável para memoizar os resultados delas.
+"""
+import glob
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from .instrumentacao import medir
+
+DIRETORIO_PADRAO = os.environ.get('CALCULADORA_CACHE_ARQUIVOS',
+                                  os.path.join(tempfile.gettempdir(), 'calculadora_arquivos'))
+LIMITE_MEMORIA_PADRAO = int(float(os.environ.get('CALCULADORA_CACHE_ARQUIVOS_MB', 512)) * 2 ** 20)
+LIMITE_DISCO_PADRAO = 8 * LIMITE_MEMORIA_PADRAO
+FORMATOS_PARQUET = ('.parquet', '.pq')
+FORMATOS_ARROW = ('.arrow', '.feather', '.ipc')
+TAMANHO_BLOCO_HASH = 2 ** 20
+
+# Tipos das colunas que as páginas conhecem; as demais são inferidas
+TIPOS_COLUNAS = {
+    'variant': 'categoria',
+    'device': 'categoria',
+    'country': 'categoria',
+    'channel': 'categoria',
+    'experimento': 'texto',
+    'data': 'texto',
+    'conversions_a': 'int64',
+    'visitors_a': 'int64',
+    'conversions_b': 'int64',
+    'visitors_b': 'int64',
+    'visitantes': 'float64',
+    'converted': 'float64',
+    'revenue': 'float64',
+    'clicks': 'float64',
+    'pre_converted': 'float64',
+    'pre_revenue': 'float64',
+}
+
+
+def _tipos_arrow():
+    import pyarrow as pa
+
+    tipos = {'categoria': pa.dictionary(pa.int32(), pa.string()), 'texto': pa.string(),
+             'int64': pa.int64(), 'float64': pa.float64()}
+    return {coluna: tipos[tipo] for coluna, tipo in TIPOS_COLUNAS.items()}
+
+
+def _nome(arquivo):
+    return str(getattr(arquivo, 'name', arquivo)).lower()
+
+
+def _fonte(arquivo):
+    """Caminho ou leitor do Arrow; uploads em memória são lidos do buffer, sem cópia"""
+    import pyarrow as pa
+
+    if hasattr(arquivo, 'getbuffer'):
+        return pa.BufferReader(pa.py_buffer(arquivo.getbuffer()))
+    if hasattr(arquivo, 'read'):
+        arquivo.seek(0)
+        return pa.BufferReader(arquivo.read())
+    return os.fspath(arquivo)
+
+
+def _conteudo(arquivo):
+    if hasattr(arquivo, 'getbuffer'):
+        return bytes(arquivo.getbuffer())
+    if hasattr(arquivo, 'read'):
+        arquivo.seek(0)
+        return arquivo.read()
+    with open(arquivo, 'rb') as entrada:
+        return entrada.read()
+
+
+def _ler_csv(arquivo, blocos=False):
+    """Tabela (ou leitor em lotes) do Arrow com os tipos de TIPOS_COLUNAS"""
+    import pyarrow.csv as pcsv
+
+    opcoes = pcsv.ConvertOptions(column_types=_tipos_arrow())
+    if blocos:
+        return pcsv.open_csv(_fonte(arquivo), convert_options=opcoes)
+    return pcsv.read_csv(_fonte(arquivo), convert_options=opcoes)
+
+
+def _ler_arquivo(arquivo):
+    """DataFrame completo de um CSV, Parquet ou Arrow"""
+    import pyarrow as pa
+
+    nome = _nome(arquivo)
+    if nome.endswith(FORMATOS_PARQUET):
+        import pyarrow.parquet as pq
+        tabela = pq.read_table(_fonte(arquivo))
+    elif nome.endswith(FORMATOS_ARROW):
+        from pyarrow import feather
+        tabela = feather.read_table(_fonte(arquivo))
+    else:
+        try:
+            tabela = _ler_csv(arquivo)
+        except pa.ArrowInvalid:
+            # Coluna conhecida com conteúdo de outro tipo: volta à inferência
+            import pyarrow.csv as pcsv
+            tabela = pcsv.read_csv(_fonte(arquivo))
+    return tabela.to_pandas()
+
+
+def _verificar_colunas(disponiveis, colunas):
+    ausentes = [c for c in colunas if c not in set(disponiveis)]
+    if ausentes:
+        raise ValueError(f"Colunas ausentes no arquivo: {', '.join(ausentes)}")
+
+
+class CacheArquivos:
+    """LRU de DataFrames limitado em bytes, com despejo para Parquet em disco, thread-safe"""
+
+    def __init__(self, diretorio=DIRETORIO_PADRAO, limite_memoria=LIMITE_MEMORIA_PADRAO,
+                 limite_disco=LIMITE_DISCO_PADRAO, max_resumos=1024):
+        self.diretorio = diretorio
+        self.limite_memoria = limite_memoria
+        self.limite_disco = limite_disco
+        self.max_resumos = max_resumos
+        self._itens = OrderedDict()
+        self._resumos = OrderedDict()
+        self._bytes = 0
+        self._trava = threading.Lock()
+        self.acertos_memoria = 0
+        self.acertos_disco = 0
+        self.leituras = 0
+        self.despejos = 0
+
+    def resumo(self, arquivo):
+        """Hash do conteúdo; o mesmo upload (ou o mesmo arquivo não modificado) só é lido uma vez"""
+        if hasattr(arquivo, 'file_id'):
+            identidade = ('upload', arquivo.file_id, getattr(arquivo, 'size', None))
+        elif isinstance(arquivo, (str, os.PathLike)):
+            estado = os.stat(arquivo)
+            identidade = ('caminho', os.path.abspath(arquivo), estado.st_mtime_ns, estado.st_size)
+        else:
+            identidade = None
+        with self._trava:
+            resumo = self._resumos.get(identidade)
+        if resumo is not None:
+            return resumo
+
+        soma = hashlib.blake2b(digest_size=16)
+        if hasattr(arquivo, 'getbuffer'):
+            soma.update(arquivo.getbuffer())
+        elif hasattr(arquivo, 'read'):
+            posicao = arquivo.tell()
+            arquivo.seek(0)
+            for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_HASH), b''):
+                soma.update(bloco)
+            arquivo.seek(posicao)
+        else:
+            with open(arquivo, 'rb') as entrada:
+                for bloco in iter(lambda: entrada.read(TAMANHO_BLOCO_HASH), b''):
+                    soma.update(bloco)
+        resumo = soma.hexdigest()
+        if identidade is not None:
+            with self._trava:
+                self._resumos[identidade] = resumo
+                while len(self._resumos) > self.max_resumos:
+                    self._resumos.popitem(last=False)
+        return resumo
+
+    def _caminho(self, resumo):
+        return os.path.join(self.diretorio, f"{resumo}.parquet")
+
+    def tabela(self, arquivo, colunas=None):
+        """DataFrame do arquivo, da memória, do Parquet em disco ou, na primeira vez, do próprio arquivo.
+
+        Com `colunas`, um acerto em disco lê só essas colunas do Parquet. O
+        DataFrame é compartilhado entre sessões e não deve ser modificado.
+        """
+        resumo = self.resumo(arquivo)
+        with self._trava:
+            item = self._itens.get(resumo)
+            if item is not None:
+                self._itens.move_to_end(resumo)
+                self.acertos_memoria += 1
+        if item is not None:
+            return self._selecionar(item[0], colunas)
+
+        caminho = self._caminho(resumo)
+        if os.path.exists(caminho):
+            import pyarrow.parquet as pq
+            try:
+                if colunas is not None:
+                    _verificar_colunas(pq.read_schema(caminho).names, colunas)
+                df = pq.read_table(caminho, columns=colunas, memory_map=True).to_pandas()
+                os.utime(caminho)
+            except FileNotFoundError:
+                # Removido pela poda de outra sessão: lê do arquivo original
+                pass
+            else:
+                with self._trava:
+                    self.acertos_disco += 1
+                if colunas is None:
+                    self._guardar(resumo, df)
+                return df
+
+        df = _ler_arquivo(arquivo)
+        with self._trava:
+            self.leituras += 1
+        self._guardar(resumo, df)
+        return self._selecionar(df, colunas)
+
+    @staticmethod
+    def _selecionar(df, colunas):
+        if colunas is None:
+            return df
+        _verificar_colunas(df.columns, colunas)
+        return df[list(colunas)]
+
+    def caminho_parquet(self, arquivo):
+        """Caminho de um Parquet com o conteúdo do arquivo, gravado na primeira chamada.
+
+        Parquet enviado é copiado como está; um DataFrame já em memória é
+        gravado direto; um CSV é convertido em lotes, sem carregá-lo inteiro.
+        """
+        resumo = self.resumo(arquivo)
+        caminho = self._caminho(resumo)
+        if os.path.exists(caminho):
+            try:
+                os.utime(caminho)
+                return caminho
+            except FileNotFoundError:
+                pass
+
+        with self._trava:
+            item = self._itens.get(resumo)
+        if item is not None:
+            self._gravar(caminho, item[0])
+        elif _nome(arquivo).endswith(FORMATOS_PARQUET):
+            self._gravar(caminho, _conteudo(arquivo))
+        elif _nome(arquivo).endswith(FORMATOS_ARROW):
+            from pyarrow import feather
+            self._gravar(caminho, feather.read_table(_fonte(arquivo), memory_map=True))
+        else:
+            import pyarrow as pa
+            try:
+                self._gravar(caminho, _ler_csv(arquivo, blocos=True))
+            except pa.ArrowInvalid:
+                # Tipos inferidos do primeiro lote não valem para os seguintes
+                self._gravar(caminho, self.tabela(arquivo))
+        self._podar_disco(manter=caminho)
+        return caminho
+
+    def _gravar(self, caminho, dados):
+        """Grava DataFrame, tabela, leitor em lotes ou bytes Parquet em `caminho`, de forma atômica"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as saida:
+                if isinstance(dados, bytes):
+                    saida.write(dados)
+                elif isinstance(dados, pa.RecordBatchReader):
+                    with pq.ParquetWriter(saida, dados.schema) as escritor:
+                        for lote in dados:
+                            escritor.write_batch(lote)
+                else:
+                    if not isinstance(dados, pa.Table):
+                        dados = pa.Table.from_pandas(dados, preserve_index=False)
+                    pq.write_table(dados, saida)
+            os.replace(temporario, caminho)
+        except BaseException:
+            os.unlink(temporario)
+            raise
+
+    def _guardar(self, resumo, df):
+        tamanho = int(df.memory_usage(index=True, deep=True).sum())
+        despejados = []
+        with self._trava:
+            if resumo in self._itens:
+                self._bytes -= self._itens.pop(resumo)[1]
+            self._itens[resumo] = (df, tamanho)
+            self._bytes += tamanho
+            # Um DataFrame maior que o limite também sai: fica só no disco
+            while self._bytes > self.limite_memoria and self._itens:
+                chave, (despejado, tamanho_despejado) = self._itens.popitem(last=False)
+                self._bytes -= tamanho_despejado
+                self.despejos += 1
+                despejados.append((chave, despejado))
+        for chave, despejado in despejados:
+            if not os.path.exists(self._caminho(chave)):
+                self._gravar(self._caminho(chave), despejado)
+        if despejados:
+            self._podar_disco(manter=self._caminho(despejados[-1][0]))
+
+    def _podar_disco(self, manter=None):
+        """Remove os Parquet usados há mais tempo até caber em `limite_disco`"""
+        arquivos = []
+        for caminho in glob.glob(os.path.join(self.diretorio, '*.parquet')):
+            try:
+                estado = os.stat(caminho)
+            except FileNotFoundError:
+                continue
+            arquivos.append((estado.st_mtime, estado.st_size, caminho))
+        total = sum(tamanho for _, tamanho, _ in arquivos)
+        for _, tamanho, caminho in sorted(arquivos):
+            if total <= self.limite_disco:
+                break
+            if caminho == manter:
+                continue
+            try:
+                os.remove(caminho)
+            except FileNotFoundError:
+                pass
+            total -= tamanho
+
+    def limpar(self, disco=False):
+        """Esvazia a memória e, com `disco=True`, remove também os Parquet gravados"""
+        with self._trava:
+            self._itens.clear()
+            self._resumos.clear()
+            self._bytes = 0
+            self.acertos_memoria = self.acertos_disco = self.leituras = self.despejos = 0
+        if disco:
+            for caminho in glob.glob(os.path.join(self.diretorio, '*.parquet')):
+                try:
+                    os.remove(caminho)
+                except FileNotFoundError:
+                    pass
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos_memoria + self.acertos_disco + self.leituras
+            return {
+                'itens': len(self._itens),
+                'bytes': self._bytes,
+                'limite_memoria': self.limite_memoria,
+                'acertos_memoria': self.acertos_memoria,
+                'acertos_disco': self.acertos_disco,
+                'leituras': self.leituras,
+                'despejos': self.despejos,
+                'taxa_acerto': (self.acertos_memoria + self.acertos_disco) / consultas if consultas else 0.0,
+            }
+
+
+CACHE_ARQUIVOS = CacheArquivos()
+
+
+@medir()
+def ler_tabela(arquivo, colunas=None, cache=CACHE_ARQUIVOS):
+    """DataFrame de um upload ou caminho (CSV, Parquet ou Arrow), lido uma vez por conteúdo"""
+    return cache.tabela(arquivo, colunas)
+
+
+@medir()
+def caminho_parquet(arquivo, cache=CACHE_ARQUIVOS):
+    """Parquet em disco com o conteúdo do arquivo, para as leituras em blocos e por colunas"""
+    return cache.caminho_parquet(arquivo)
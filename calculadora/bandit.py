@@ -0,0 +1,219 @@
+"""Simulação de alocação adaptativa (bandit) contra a divisão fixa do planejador.
+
+Cada réplica é um experimento com tráfego diário, em que a fração do dia que
+vai para B é decidida pela política com os dados até o dia anterior:
+
+- `fixa`: sempre 1 - split_ratio, como no planejador;
+- `thompson`: probabilidade de B ser melhor sob posteriores Beta(1, 1)
+  (Thompson sampling em lotes diários);
+- `epsilon_guloso`: a variante com maior taxa observada recebe 1 - ε/2.
+
+Todas usam a mesma regra de parada; depois da decisão (ou do fim do teste
+sem decisão, quando fica o controle) todo o tráfego vai para a variante
+escolhida. As réplicas, as políticas e os cenários com e sem efeito andam
+juntos em arrays (cenários × políticas × réplicas), com um laço só sobre os
+dias, e os blocos de réplicas podem ser distribuídos em um pool de processos,
+com sementes como em simular_poder.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .instrumentacao import medir
+
+POLITICAS = ('fixa', 'thompson', 'epsilon_guloso')
+REGRAS = ('msprt', 'bayesiana', 'horizonte')
+
+
+def _alocacao_b(conversoes, visitantes, split_ratio, epsilon, alocacao_minima):
+    """Fração do tráfego do dia para B em cada (cenário, política, réplica)"""
+    from .bayesiano import prob_maior
+
+    (c_a, c_b), (n_a, n_b) = conversoes, visitantes
+    thompson = prob_maior(1 + c_a[:, 1], 1 + n_a[:, 1] - c_a[:, 1], 1 + c_b[:, 1], 1 + n_b[:, 1] - c_b[:, 1],
+                          metodo='normal')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        diferenca = c_b[:, 2] / n_b[:, 2] - c_a[:, 2] / n_a[:, 2]
+    guloso = np.where(diferenca > 0, 1.0, np.where(diferenca < 0, 0.0, 0.5))
+    alocacao = np.empty(c_a.shape)
+    alocacao[:, 0] = 1 - split_ratio
+    alocacao[:, 1] = thompson
+    alocacao[:, 2] = epsilon / 2 + (1 - epsilon) * guloso
+    alocacao[:, 1:] = np.clip(alocacao[:, 1:], alocacao_minima, 1 - alocacao_minima)
+    return alocacao
+
+
+def _decidir(regra, conversoes, visitantes, dia, dias_teste, nivel_significancia, limiar, tau2):
+    """(decidiu, B venceu) para cada experimento ainda em andamento"""
+    (c_a, c_b), (n_a, n_b) = conversoes, visitantes
+    if regra == 'horizonte':
+        if dia < dias_teste - 1:
+            falso = np.zeros(c_a.shape, dtype=bool)
+            return falso, falso
+        from .teste import calcular_teste_atual
+
+        teste = calcular_teste_atual(c_a, n_a, c_b, n_b)
+        return teste['p_value'] < nivel_significancia, teste['diff_abs'] > 0
+    if regra == 'msprt':
+        from .sequencial import estatisticas_msprt
+
+        z, log_lambda, _ = estatisticas_msprt(c_a, n_a, c_b, n_b, tau2, nivel_significancia)
+        return log_lambda >= np.log(1 / nivel_significancia), z > 0
+
+    from .bayesiano import prob_maior
+
+    prob_b = prob_maior(1 + c_a, 1 + n_a - c_a, 1 + c_b, 1 + n_b - c_b, metodo='normal')
+    com_dados = (n_a > 0) & (n_b > 0)
+    return com_dados & ((prob_b >= limiar) | (prob_b <= 1 - limiar)), prob_b > 0.5
+
+
+def _simular_bloco(tarefa):
+    (semente, replicas, taxas, trafego, split_ratio, epsilon, alocacao_minima, regra, dias_teste,
+     nivel_significancia, limiar, tau2) = tarefa
+    rng = np.random.default_rng(semente)
+    taxas = np.asarray(taxas)
+    cenarios, dias = len(taxas), len(trafego)
+    forma = (cenarios, len(POLITICAS), replicas)
+    taxa_a, taxa_b = (taxas[:, i, None, None] for i in range(2))
+    lacuna = taxas.max(axis=1, keepdims=True) - taxas
+
+    conversoes = np.zeros((2,) + forma)
+    visitantes = np.zeros((2,) + forma)
+    ativo = np.ones(forma, dtype=bool)
+    fracao_final = np.zeros(forma)
+    decisao = np.zeros(forma, dtype=np.int8)
+    dia_decisao = np.zeros(forma, dtype=np.int64)
+    regret_dia = np.zeros((cenarios, len(POLITICAS), dias))
+    regret = np.zeros(forma)
+
+    for dia in range(dias):
+        alocacao = np.where(ativo, _alocacao_b(conversoes, visitantes, split_ratio, epsilon, alocacao_minima),
+                            fracao_final)
+        # O mesmo tráfego do dia para as três políticas (números aleatórios comuns)
+        total = rng.poisson(trafego[dia], (cenarios, 1, replicas))
+        n_b = rng.binomial(total, alocacao)
+        n_a = total - n_b
+        c_a, c_b = rng.binomial(n_a, taxa_a), rng.binomial(n_b, taxa_b)
+        perda = n_a * lacuna[:, 0, None, None] + n_b * lacuna[:, 1, None, None]
+        regret += perda
+        regret_dia[:, :, dia] = perda.sum(axis=-1)
+
+        conversoes += np.where(ativo, np.stack([c_a, c_b]), 0)
+        visitantes += np.where(ativo, np.stack([n_a, n_b]), 0)
+        decidiu, b_venceu = _decidir(regra, conversoes, visitantes, dia, dias_teste, nivel_significancia,
+                                     limiar, tau2)
+        decidiu &= ativo
+        encerra = ativo & (decidiu | (dia >= dias_teste - 1))
+        # Depois do teste todo o tráfego vai para o vencedor (ou fica no controle, sem decisão)
+        fracao_final = np.where(encerra, (decidiu & b_venceu).astype(float), fracao_final)
+        decisao = np.where(decidiu, np.where(b_venceu, 1, -1), decisao).astype(np.int8)
+        dia_decisao = np.where(decidiu, dia + 1, dia_decisao)
+        ativo &= ~encerra
+
+    # Dia da decisão (0 = sem decisão) por cenário e política
+    histograma = np.zeros((cenarios, len(POLITICAS), dias + 1))
+    for s in range(cenarios):
+        for p in range(len(POLITICAS)):
+            histograma[s, p] = np.bincount(dia_decisao[s, p], minlength=dias + 1)
+    fracao_b = visitantes[1] / np.maximum(visitantes.sum(axis=0), 1)
+    return {
+        'regret': regret.sum(axis=-1), 'regret2': (regret ** 2).sum(axis=-1), 'regret_dia': regret_dia,
+        'decisoes_b': (decisao == 1).sum(axis=-1), 'decisoes_a': (decisao == -1).sum(axis=-1),
+        'histograma_dias': histograma, 'fracao_b': fracao_b.sum(axis=-1),
+    }
+
+
+@medir()
+def simular_bandit(taxa_base, taxa_variacao, trafego_diario, dias, split_ratio=0.5, dias_teste=None,
+                   regra='msprt', nivel_significancia=0.05, limiar=0.95, tau2=None, epsilon=0.1,
+                   alocacao_minima=0.0, replicas=10_000, semente=None, processos=None, tamanho_bloco=2_500):
+    """Compara a divisão fixa com Thompson sampling e ε-guloso por simulação.
+
+    `trafego_diario` é um número (média de um Poisson diário) ou uma sequência
+    de `dias` valores. O teste dura no máximo `dias_teste` dias (padrão:
+    `dias`) e para na primeira olhada diária em que a `regra` decide:
+
+    - `msprt`: p-valor sempre válido do mSPRT abaixo de `nivel_significancia`
+      (`tau2` padrão: quadrado do efeito absoluto esperado);
+    - `bayesiana`: P(B > A) acima de `limiar` ou abaixo de 1 - `limiar`;
+    - `horizonte`: teste z único no último dia do teste, como no planejador.
+
+    Cada réplica é simulada com o efeito (`taxa_variacao`) e sem efeito (as
+    duas em `taxa_base`). Retorna `resumo` (DataFrame por política: regret
+    médio em conversões perdidas e seu IC, perda relativa, P(decisão correta),
+    P(escolher A por engano), taxa de falso positivo sem efeito, quantis dos
+    dias até a decisão e fração média do tráfego do teste em B) e
+    `regret_acumulado` (políticas × dias, média por réplica).
+    """
+    import pandas as pd
+
+    if regra not in REGRAS:
+        raise ValueError(f"Regra desconhecida: {regra}")
+    if not 0 <= epsilon <= 1 or not 0 <= alocacao_minima < 0.5:
+        raise ValueError("ε deve estar em [0, 1] e a alocação mínima em [0, 0.5)")
+    trafego = np.broadcast_to(np.asarray(trafego_diario, dtype=float), (int(dias),))
+    dias_teste = int(min(dias_teste or dias, dias))
+    tau2 = (taxa_variacao - taxa_base) ** 2 if tau2 is None else tau2
+    if tau2 <= 0:
+        raise ValueError("tau2 deve ser positivo (informe um efeito diferente de zero)")
+    taxas = ((taxa_base, taxa_variacao), (taxa_base, taxa_base))
+
+    n_blocos = int(np.ceil(replicas / tamanho_bloco))
+    tamanhos = [tamanho_bloco] * (n_blocos - 1) + [replicas - tamanho_bloco * (n_blocos - 1)]
+    sementes = np.random.SeedSequence(semente).spawn(n_blocos)
+    tarefas = [(sementes[i], tamanho, taxas, trafego, split_ratio, epsilon, alocacao_minima, regra, dias_teste,
+                nivel_significancia, limiar, tau2) for i, tamanho in enumerate(tamanhos)]
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            parciais = list(executor.map(_simular_bloco, tarefas))
+    else:
+        parciais = [_simular_bloco(t) for t in tarefas]
+    total = {k: sum(p[k] for p in parciais) for k in parciais[0]}
+
+    # Cenário 0: com efeito; cenário 1: sem efeito
+    media = total['regret'][0] / replicas
+    desvio = np.sqrt(np.maximum(total['regret2'][0] / replicas - media ** 2, 0))
+    conversoes_possiveis = trafego.sum() * max(taxa_base, taxa_variacao)
+    decididos = total['histograma_dias'][0, :, 1:]
+    acumulado = np.cumsum(decididos, axis=-1)
+
+    def quantil_dias(q):
+        # Dia em que a fração q dos experimentos que decidiram já tinha decidido
+        alvo = q * acumulado[:, -1:]
+        dia = (acumulado < alvo).sum(axis=-1) + 1.0
+        return np.where(acumulado[:, -1] > 0, dia, np.nan)
+
+    b_melhor = taxa_variacao >= taxa_base
+    resumo = pd.DataFrame({
+        'regret': media,
+        'regret_ic_inferior': media - 1.96 * desvio / np.sqrt(replicas),
+        'regret_ic_superior': media + 1.96 * desvio / np.sqrt(replicas),
+        'perda_relativa': media / conversoes_possiveis if conversoes_possiveis > 0 else np.nan,
+        'prob_decisao_correta': (total['decisoes_b'][0] if b_melhor else total['decisoes_a'][0]) / replicas,
+        'prob_decisao_errada': (total['decisoes_a'][0] if b_melhor else total['decisoes_b'][0]) / replicas,
+        'falso_positivo': (total['decisoes_a'][1] + total['decisoes_b'][1]) / replicas,
+        'dias_decisao_p10': quantil_dias(0.1),
+        'dias_decisao_mediana': quantil_dias(0.5),
+        'dias_decisao_p90': quantil_dias(0.9),
+        'fracao_b': total['fracao_b'][0] / replicas,
+    }, index=pd.Index(POLITICAS, name='politica'))
+    return {
+        'resumo': resumo,
+        'regret_acumulado': np.cumsum(total['regret_dia'][0], axis=-1) / replicas,
+        'replicas': replicas,
+        'dias': int(dias),
+        'dias_teste': dias_teste,
+        'regra': regra,
+    }
+
+
+def simular_bandit_plano(resultado_plano, trafego_diario, dias, **kwargs):
+    """simular_bandit para um plano retornado por calcular_tamanho_amostra_ab"""
+    kwargs.setdefault('split_ratio', resultado_plano['n_controle'] / resultado_plano['n_total'])
+    return simular_bandit(
+        resultado_plano['taxa_base'], resultado_plano['taxa_variacao'], trafego_diario, dias,
+        nivel_significancia=resultado_plano['nivel_significancia'], **kwargs
+    )
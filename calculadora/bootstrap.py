@@ -0,0 +1,186 @@
+"""Bootstrap de Poisson para métricas contínuas (receita por visitante, ticket médio).
+
+Cada usuário recebe, em cada reamostra, um peso Poisson(1) independente, então
+blocos de usuários podem ser processados em qualquer ordem e em streaming: o
+estado guarda só Σw e Σw·y por reamostra e por grupo. Os pesos são gerados em
+blocos de no máximo `max_elementos_bloco` (reamostras x usuários), o que fixa o
+pico de memória independentemente do número de usuários.
+"""
+import functools
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .instrumentacao import medir
+
+# Quantis de Poisson(1) em 2^16 níveis: um uint16 uniforme vira um peso por consulta
+_NIVEIS = 1 << 16
+_REAMOSTRAS_POR_TAREFA = 1000
+# Separa as sementes derivadas de (grupo, bloco) das geradas por spawn
+_CHAVE_BLOCOS = 0xB10C0
+
+
+@functools.lru_cache(maxsize=1)
+def _tabela_poisson():
+    from scipy import stats
+
+    u = (np.arange(_NIVEIS) + 0.5) / _NIVEIS
+    return stats.poisson.ppf(u, 1.0).astype(np.float32)
+
+
+class BootstrapPoisson:
+    """Acumulador de reamostras de Poisson para a média de dois grupos.
+
+    Use `adicionar(valores, grupo)` com blocos de usuários do controle (grupo 0)
+    ou da variação (grupo 1), quantas vezes for preciso, e `combinar` para
+    juntar acumuladores calculados em paralelo sobre as mesmas reamostras.
+    Acumuladores combinados precisam de sementes distintas, ou de um `bloco`
+    distinto em cada chamada de `adicionar`.
+    """
+
+    def __init__(self, reamostras=10_000, semente=None, max_elementos_bloco=1 << 20):
+        self.reamostras = reamostras
+        self.max_elementos_bloco = max_elementos_bloco
+        self.soma_pesos = np.zeros((2, reamostras))
+        self.soma_ponderada = np.zeros((2, reamostras))
+        self.n = np.zeros(2, dtype=np.int64)
+        self.soma = np.zeros(2)
+        if not isinstance(semente, np.random.SeedSequence):
+            semente = np.random.SeedSequence(semente)
+        self._sementes = semente
+        self._chaves = set()
+        self._tabela = _tabela_poisson()
+
+    def adicionar(self, valores, grupo, bloco=None):
+        """Acumula um bloco de usuários de `grupo`.
+
+        Sem `bloco`, os pesos vêm do próximo filho da semente do acumulador.
+        Com `bloco` (inteiro), vêm de (semente, grupo, bloco): acumuladores com
+        a mesma semente podem ser combinados se cada bloco de usuários tiver
+        um identificador único.
+        """
+        valores = np.asarray(valores, dtype=np.float32).ravel()
+        base = (self._sementes.entropy, self._sementes.spawn_key)
+        if bloco is None:
+            chave = base + ('filho', self._sementes.n_children_spawned)
+            semente = self._sementes.spawn(1)[0]
+        else:
+            chave = base + ('bloco', int(grupo), int(bloco))
+            semente = np.random.SeedSequence(
+                self._sementes.entropy, spawn_key=self._sementes.spawn_key + (_CHAVE_BLOCOS, int(grupo), int(bloco)))
+        if chave in self._chaves:
+            raise ValueError(f"O bloco {bloco} do grupo {grupo} já foi adicionado")
+        self._chaves.add(chave)
+        rng = np.random.default_rng(semente)
+        usuarios_bloco = max(1, self.max_elementos_bloco // self.reamostras)
+        for inicio in range(0, len(valores), usuarios_bloco):
+            y = valores[inicio:inicio + usuarios_bloco]
+            uniformes = rng.integers(0, _NIVEIS, size=(self.reamostras, len(y)), dtype=np.uint16)
+            pesos = np.take(self._tabela, uniformes)
+            # Uma única multiplicação produz Σw (coluna de uns) e Σw·y por reamostra
+            somas = pesos @ np.column_stack([np.ones_like(y), y])
+            self.soma_pesos[grupo] += somas[:, 0]
+            self.soma_ponderada[grupo] += somas[:, 1]
+        self.n[grupo] += len(valores)
+        self.soma[grupo] += valores.sum(dtype=np.float64)
+        return self
+
+    def combinar(self, outro):
+        """Soma outro acumulador com as mesmas reamostras, de outros usuários.
+
+        Os pesos dos dois precisam ser independentes: acumuladores criados com
+        a mesma semente repetiriam os pesos (e subestimariam o erro-padrão),
+        a menos que cada chamada de `adicionar` tenha um `bloco` distinto.
+        """
+        if outro.reamostras != self.reamostras:
+            raise ValueError("Os acumuladores precisam ter o mesmo número de reamostras")
+        if self._chaves & outro._chaves:
+            raise ValueError("Os acumuladores repetem pesos: use sementes distintas ou `bloco` distinto em adicionar")
+        self._chaves |= outro._chaves
+        self.soma_pesos += outro.soma_pesos
+        self.soma_ponderada += outro.soma_ponderada
+        self.n += outro.n
+        self.soma += outro.soma
+        return self
+
+    def diferencas(self):
+        """Diferença de médias (variação - controle) em cada reamostra"""
+        with np.errstate(divide='ignore', invalid='ignore'):
+            medias = self.soma_ponderada / self.soma_pesos
+        return medias[1] - medias[0], medias
+
+    def resultado(self, confianca=0.95):
+        if np.any(self.n == 0):
+            raise ValueError("Os dois grupos precisam de pelo menos um usuário")
+        diferencas, medias = self.diferencas()
+        validas = np.isfinite(diferencas)
+        diferencas, medias = diferencas[validas], medias[:, validas]
+        media_a, media_b = self.soma / self.n
+        cauda = (1 - confianca) / 2
+        with np.errstate(divide='ignore', invalid='ignore'):
+            melhorias = (medias[1] / medias[0] - 1) * 100
+        # p-valor bicaudal pela proporção de reamostras de cada lado do zero
+        p_value = min(1.0, 2 * min(np.mean(diferencas <= 0), np.mean(diferencas >= 0)))
+        return {
+            'media_a': media_a, 'media_b': media_b,
+            'diff_abs': media_b - media_a,
+            'diff_rel': (media_b / media_a - 1) * 100 if media_a != 0 else 0.0,
+            'erro_padrao': float(np.std(diferencas, ddof=1)),
+            'ci_lower': float(np.quantile(diferencas, cauda)),
+            'ci_upper': float(np.quantile(diferencas, 1 - cauda)),
+            'melhoria_ci_lower': float(np.nanquantile(melhorias, cauda)),
+            'melhoria_ci_upper': float(np.nanquantile(melhorias, 1 - cauda)),
+            'p_value': max(p_value, 1 / len(diferencas)),
+            'reamostras': int(len(diferencas)),
+        }
+
+
+_DADOS_PROCESSO = {}
+
+
+def _iniciar_processo(valores_a, valores_b):
+    _DADOS_PROCESSO['valores'] = (valores_a, valores_b)
+
+
+def _executar_tarefa(tarefa):
+    semente, reamostras, max_elementos_bloco = tarefa
+    acumulador = BootstrapPoisson(reamostras, semente, max_elementos_bloco)
+    for grupo, valores in enumerate(_DADOS_PROCESSO['valores']):
+        acumulador.adicionar(valores, grupo)
+    return acumulador.soma_pesos, acumulador.soma_ponderada
+
+
+@medir()
+def bootstrap_diferenca_medias(valores_a, valores_b, reamostras=10_000, confianca=0.95, semente=None,
+                               processos=None, max_elementos_bloco=1 << 20):
+    """IC e p-valor bootstrap da diferença de médias entre dois grupos de usuários.
+
+    As reamostras são divididas em tarefas de tamanho fixo, cada uma com sua
+    semente, e distribuídas em um pool de processos; o resultado depende só de
+    `semente`, não de `processos`.
+    """
+    valores_a = np.asarray(valores_a, dtype=np.float32)
+    valores_b = np.asarray(valores_b, dtype=np.float32)
+    tamanhos = [_REAMOSTRAS_POR_TAREFA] * (reamostras // _REAMOSTRAS_POR_TAREFA)
+    if reamostras % _REAMOSTRAS_POR_TAREFA:
+        tamanhos.append(reamostras % _REAMOSTRAS_POR_TAREFA)
+    sementes = np.random.SeedSequence(semente).spawn(len(tamanhos))
+    tarefas = [(s, r, max_elementos_bloco) for s, r in zip(sementes, tamanhos)]
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos > 1:
+        with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo,
+                                 initargs=(valores_a, valores_b)) as executor:
+            partes = list(executor.map(_executar_tarefa, tarefas))
+    else:
+        _iniciar_processo(valores_a, valores_b)
+        partes = [_executar_tarefa(t) for t in tarefas]
+        _DADOS_PROCESSO.clear()
+
+    acumulador = BootstrapPoisson(reamostras, semente, max_elementos_bloco)
+    acumulador.soma_pesos = np.concatenate([p[0] for p in partes], axis=1)
+    acumulador.soma_ponderada = np.concatenate([p[1] for p in partes], axis=1)
+    acumulador.n = np.array([len(valores_a), len(valores_b)], dtype=np.int64)
+    acumulador.soma = np.array([valores_a.sum(dtype=np.float64), valores_b.sum(dtype=np.float64)])
+    return acumulador.resultado(confianca)
@@ -0,0 +1,139 @@
+"""Cache em memória compartilhado entre sessões, com expiração por TTL e LRU.
+
+O Streamlit reexecuta o script inteiro a cada interação, mas os módulos do
+pacote são importados uma única vez por processo, então os caches definidos
+aqui valem para todas as sessões do mesmo servidor.
+"""
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+_AUSENTE = object()
+
+
+class CacheLRU:
+    """Cache LRU thread-safe com limite de itens, TTL e contadores de uso"""
+
+    def __init__(self, max_itens=256, ttl=3600.0, relogio=time.monotonic):
+        self.max_itens = max_itens
+        self.ttl = ttl
+        self._relogio = relogio
+        self._itens = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+        self.remocoes = 0
+
+    def obter(self, chave, padrao=None):
+        """Consulta sem calcular; conta acerto ou falha como obter_ou_calcular"""
+        agora = self._relogio()
+        with self._trava:
+            item = self._itens.get(chave)
+            if item is not None and item[0] > agora:
+                self._itens.move_to_end(chave)
+                self.acertos += 1
+                return item[1]
+            self.falhas += 1
+            return padrao
+
+    def guardar(self, chave, valor):
+        agora = self._relogio()
+        with self._trava:
+            self._itens[chave] = (agora + self.ttl, valor)
+            self._itens.move_to_end(chave)
+            self._remover_excedentes(agora)
+
+    def obter_ou_calcular(self, chave, calcular):
+        valor = self.obter(chave, _AUSENTE)
+        if valor is _AUSENTE:
+            # Calcula fora da trava para não serializar sessões diferentes
+            valor = calcular()
+            self.guardar(chave, valor)
+        return valor
+
+    def _remover_excedentes(self, agora):
+        expirados = [c for c, (validade, _) in self._itens.items() if validade <= agora]
+        for chave in expirados:
+            del self._itens[chave]
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+            self.remocoes += 1
+        self.remocoes += len(expirados)
+
+    def limpar(self):
+        with self._trava:
+            self._itens.clear()
+            self.acertos = self.falhas = self.remocoes = 0
+
+    def estatisticas(self):
+        with self._trava:
+            consultas = self.acertos + self.falhas
+            return {
+                'itens': len(self._itens),
+                'max_itens': self.max_itens,
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'remocoes': self.remocoes,
+                'taxa_acerto': self.acertos / consultas if consultas else 0.0,
+            }
+
+
+def _resumo_bytes(dados):
+    return hashlib.blake2b(dados, digest_size=16).hexdigest()
+
+
+def normalizar(valor):
+    """Converte argumentos em uma chave hashable e estável.
+
+    Floats são arredondados a 12 dígitos significativos, para que 0.1 + 0.2 e
+    0.3 caiam na mesma entrada; arrays e DataFrames entram pelo hash do conteúdo.
+    """
+    if isinstance(valor, (bool, int, str, bytes, type(None))):
+        return valor
+    if isinstance(valor, (float, np.floating)):
+        return float(f"{float(valor):.12g}")
+    if isinstance(valor, np.integer):
+        return int(valor)
+    if isinstance(valor, np.ndarray):
+        if valor.dtype == object:
+            return ('ndarray', valor.shape, tuple(normalizar(v) for v in valor.ravel()))
+        return ('ndarray', valor.dtype.str, valor.shape, _resumo_bytes(np.ascontiguousarray(valor).tobytes()))
+    if isinstance(valor, dict):
+        return tuple(sorted((str(k), normalizar(v)) for k, v in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return tuple(normalizar(v) for v in valor)
+    if type(valor).__module__.startswith('pandas'):
+        import pandas as pd
+
+        conteudo = pd.util.hash_pandas_object(valor, index=True).to_numpy()
+        colunas = tuple(map(str, getattr(valor, 'columns', ())))
+        return (type(valor).__name__, colunas, _resumo_bytes(conteudo.tobytes()))
+    hash(valor)
+    return valor
+
+
+def memoizar(cache):
+    """Decorador que guarda o resultado da função em `cache`.
+
+    Os valores retornados são compartilhados entre chamadas e sessões, então
+    não devem ser modificados por quem os recebe.
+    """
+    def decorador(funcao):
+        nome = f"{funcao.__module__}.{funcao.__qualname__}"
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            chave = (nome, normalizar(args), normalizar(kwargs))
+            return cache.obter_ou_calcular(chave, lambda: funcao(*args, **kwargs))
+
+        envoltorio.cache = cache
+        return envoltorio
+    return decorador
+
+
+CACHE_CALCULOS = CacheLRU(max_itens=2048, ttl=3600.0)
+CACHE_FIGURAS = CacheLRU(max_itens=256, ttl=900.0)
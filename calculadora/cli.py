@@ -0,0 +1,219 @@
+"""Interface de linha de comando para execuções em lote, sem Streamlit.
+
+Exemplos:
+    python -m calculadora amostra --taxa-base 0.02 0.05 --melhoria 0.1 0.2 --poder 0.8 0.9
+    python -m calculadora teste experimentos.csv --saida resultados.csv
+    python -m calculadora cuped dados/ --metrica revenue --covariavel pre_revenue --processos 8
+    python -m calculadora razao logs/ --numerador clicks --processos 8
+    python -m calculadora bandit --taxa-base 0.05 --taxa-variacao 0.06 --trafego 1000 --dias 60 --replicas 100000
+    python -m calculadora servir --porta 8000
+"""
+import time
+
+_INICIO = time.perf_counter()
+
+import argparse
+import csv
+import os
+import sys
+
+
+def _escrever_csv(colunas, destino):
+    nomes = list(colunas)
+    escritor = csv.writer(destino)
+    escritor.writerow(nomes)
+    escritor.writerows(zip(*(colunas[n].tolist() for n in nomes)))
+
+
+def _comando_amostra(args, destino):
+    from .amostra import calcular_tamanho_amostra_ab_lote, gerar_grade
+
+    grade = gerar_grade(args.taxa_base, args.melhoria, args.poder, args.nivel_significancia, args.split_ratio)
+    resultado = calcular_tamanho_amostra_ab_lote(**grade)
+    resultado['melhoria_minima_detectar'] = grade['melhoria_minima_detectar']
+    resultado['split_ratio'] = grade['split_ratio']
+    _escrever_csv(resultado, destino)
+    return len(grade['taxa_base'])
+
+
+def _comando_teste(args, destino):
+    import pandas as pd
+    from .exato import calcular_teste_exato
+
+    colunas = ['conversions_a', 'visitors_a', 'conversions_b', 'visitors_b']
+    df = pd.read_csv(args.arquivo)
+    faltando = [c for c in colunas if c not in df.columns]
+    if faltando:
+        raise SystemExit(f"Colunas ausentes em {args.arquivo}: {', '.join(faltando)}")
+    resultado = calcular_teste_exato(*(df[c].to_numpy() for c in colunas), metodo=args.metodo)
+    pd.concat([df, pd.DataFrame(resultado, index=df.index)], axis=1).to_csv(destino, index=False)
+    return len(df)
+
+
+def _comando_cuped(args, destino):
+    from .cuped import agregar_cuped, analisar_cuped
+
+    estatisticas = agregar_cuped(args.arquivos, processos=args.processos, metrica=args.metrica,
+                                 covariavel=args.covariavel, coluna_variante=args.coluna_variante)
+    variantes = list(estatisticas.index)
+    controle = args.controle or variantes[0]
+    linhas = []
+    for variacao in [v for v in variantes if v != controle]:
+        resultado = analisar_cuped(estatisticas, controle, variacao, args.nivel_significancia)
+        linhas.append({'controle': controle, 'variacao': variacao, **resultado})
+    escritor = csv.DictWriter(destino, fieldnames=list(linhas[0]))
+    escritor.writeheader()
+    escritor.writerows(linhas)
+    return int(estatisticas['n'].sum())
+
+
+def _comando_razao(args, destino):
+    from .razao import agregar_razao, analisar_razao
+
+    momentos = agregar_razao(args.arquivos, processos=args.processos,
+                             usuarios_particionados=not args.usuarios_entre_shards,
+                             numerador=args.numerador, denominador=args.denominador,
+                             coluna_usuario=args.coluna_usuario, coluna_variante=args.coluna_variante)
+    variantes = list(momentos.index)
+    controle = args.controle or variantes[0]
+    linhas = [{'controle': controle, 'variacao': variacao,
+               **analisar_razao(momentos, controle, variacao, args.nivel_significancia)}
+              for variacao in variantes if variacao != controle]
+    escritor = csv.DictWriter(destino, fieldnames=list(dict.fromkeys(k for linha in linhas for k in linha)))
+    escritor.writeheader()
+    escritor.writerows(linhas)
+    return int(momentos['linhas'].sum())
+
+
+def _comando_bandit(args, destino):
+    from .bandit import simular_bandit
+
+    resultado = simular_bandit(args.taxa_base, args.taxa_variacao, args.trafego, args.dias,
+                               split_ratio=args.split_ratio, dias_teste=args.dias_teste, regra=args.regra,
+                               nivel_significancia=args.nivel_significancia, epsilon=args.epsilon,
+                               replicas=args.replicas, semente=args.semente, processos=args.processos)
+    resultado['resumo'].to_csv(destino)
+    return args.replicas
+
+
+def _comando_servir(args, destino):
+    import asyncio
+
+    from .servidor import servir
+
+    def pronto(porta):
+        print(f"Servindo em http://{args.host}:{porta}", file=sys.stderr, flush=True)
+
+    try:
+        asyncio.run(servir(args.host, args.porta, args.processos, pronto))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def _desde_inicio_processo():
+    """Segundos desde a criação do processo (Linux), ou None se o sistema não informa.
+
+    O início vem de /proc/self/stat, em ticks do relógio desde o boot
+    (resolução de 10 ms), e inclui a partida do interpretador e os imports.
+    """
+    try:
+        with open("/proc/self/stat") as arquivo:
+            # O nome do executável (campo 2) pode ter espaços; os campos seguem o último ')'
+            campos = arquivo.read().rsplit(")", 1)[1].split()
+        inicio = int(campos[19]) / os.sysconf("SC_CLK_TCK")
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - inicio
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog="calculadora", description="Calculadora A/B em modo headless")
+    parser.add_argument("--saida", help="arquivo CSV de saída (padrão: stdout)")
+    parser.add_argument("--tempo", action="store_true",
+                        help="mostra no stderr o tempo de inicialização (desde o início do processo: "
+                             "interpretador e imports) e o de cálculo (com pandas/SciPy, importados sob demanda)")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    amostra = sub.add_parser("amostra", help="tamanho de amostra para uma grade de parâmetros")
+    amostra.add_argument("--taxa-base", type=float, nargs="+", required=True)
+    amostra.add_argument("--melhoria", type=float, nargs="+", required=True,
+                         help="melhoria mínima (relativa se maior que a taxa base, senão absoluta)")
+    amostra.add_argument("--poder", type=float, nargs="+", default=[0.80])
+    amostra.add_argument("--nivel-significancia", type=float, nargs="+", default=[0.05])
+    amostra.add_argument("--split-ratio", type=float, nargs="+", default=[0.5])
+    amostra.set_defaults(funcao=_comando_amostra)
+
+    teste = sub.add_parser("teste", help="significância para cada linha de um CSV")
+    teste.add_argument("arquivo", help="CSV com conversions_a, visitors_a, conversions_b, visitors_b")
+    teste.add_argument("--metodo", default="auto", choices=["auto", "z", "fisher", "barnard", "boschloo"],
+                       help="teste de cada linha (padrão: exato quando as contagens são pequenas)")
+    teste.set_defaults(funcao=_comando_teste)
+
+    cuped = sub.add_parser("cuped", help="teste com ajuste CUPED, em map-reduce sobre vários arquivos")
+    cuped.add_argument("arquivos", nargs="+", help="CSV/Parquet, diretórios ou padrões glob")
+    cuped.add_argument("--metrica", default="converted")
+    cuped.add_argument("--covariavel", default="pre_converted", help="métrica do período pré-teste")
+    cuped.add_argument("--coluna-variante", default="variant")
+    cuped.add_argument("--controle", help="variante controle (padrão: a primeira em ordem alfabética)")
+    cuped.add_argument("--nivel-significancia", type=float, default=0.05)
+    cuped.add_argument("--processos", type=int, default=None, help="processos do pool (padrão: 1)")
+    cuped.set_defaults(funcao=_comando_cuped)
+
+    razao = sub.add_parser("razao", help="métrica de razão pelo método delta, em map-reduce sobre shards")
+    razao.add_argument("arquivos", nargs="+", help="CSV/Parquet, diretórios ou padrões glob")
+    razao.add_argument("--numerador", default="clicks")
+    razao.add_argument("--denominador", help="coluna do denominador (padrão: cada linha conta 1)")
+    razao.add_argument("--coluna-usuario", default="user_id")
+    razao.add_argument("--coluna-variante", default="variant")
+    razao.add_argument("--controle", help="variante controle (padrão: a primeira em ordem alfabética)")
+    razao.add_argument("--nivel-significancia", type=float, default=0.05)
+    razao.add_argument("--processos", type=int, default=None, help="processos do pool (padrão: 1)")
+    razao.add_argument("--usuarios-entre-shards", action="store_true",
+                       help="os shards não são particionados por usuário (combina somas por usuário)")
+    razao.set_defaults(funcao=_comando_razao)
+
+    bandit = sub.add_parser("bandit", help="divisão fixa × Thompson × ε-guloso por simulação")
+    bandit.add_argument("--taxa-base", type=float, required=True)
+    bandit.add_argument("--taxa-variacao", type=float, required=True)
+    bandit.add_argument("--trafego", type=float, required=True, help="visitantes por dia")
+    bandit.add_argument("--dias", type=int, required=True, help="período em que o regret é contado")
+    bandit.add_argument("--dias-teste", type=int, help="duração máxima do teste (padrão: --dias)")
+    bandit.add_argument("--regra", default="msprt", choices=["msprt", "bayesiana", "horizonte"])
+    bandit.add_argument("--split-ratio", type=float, default=0.5)
+    bandit.add_argument("--nivel-significancia", type=float, default=0.05)
+    bandit.add_argument("--epsilon", type=float, default=0.1)
+    bandit.add_argument("--replicas", type=int, default=10_000)
+    bandit.add_argument("--semente", type=int, default=None)
+    bandit.add_argument("--processos", type=int, default=None, help="processos do pool (padrão: número de CPUs)")
+    bandit.set_defaults(funcao=_comando_bandit)
+
+    servir = sub.add_parser("servir", help="API HTTP/JSON com os cálculos de amostra e teste")
+    servir.add_argument("--host", default="127.0.0.1")
+    servir.add_argument("--porta", type=int, default=8000, help="0 escolhe uma porta livre")
+    servir.add_argument("--processos", type=int, default=None,
+                        help="workers para lotes grandes (padrão: número de CPUs; 1 calcula no próprio processo)")
+    servir.set_defaults(funcao=_comando_servir)
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    inicio_calculo = time.perf_counter()
+    ate_main = _desde_inicio_processo()
+    if args.saida:
+        with open(args.saida, "w", newline="") as destino:
+            linhas = args.funcao(args, destino)
+    else:
+        linhas = args.funcao(args, sys.stdout)
+    fim = time.perf_counter()
+
+    if args.tempo:
+        # Sem o início do processo, a inicialização só conta a partir do import da CLI
+        if ate_main is None:
+            inicializacao = f"inicialização (desde o import da CLI): {(inicio_calculo - _INICIO) * 1000:.1f} ms"
+        else:
+            inicializacao = f"inicialização: {ate_main * 1000:.0f} ms"
+        print(f"{inicializacao} | cálculo ({linhas:,} linhas): {(fim - inicio_calculo) * 1000:.1f} ms",
+              file=sys.stderr)
+    return 0
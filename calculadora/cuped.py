@@ -0,0 +1,131 @@
+"""CUPED: redução de variância com uma covariável do período pré-teste.
+
+Tudo sai de estatísticas suficientes por variante (n, Σx, Σy, Σx², Σy², Σxy,
+com x = covariável pré-teste e y = métrica do teste). Elas se somam, então
+cada arquivo ou bloco é reduzido separadamente (map), em paralelo, e os
+parciais são combinados (reduce) sem nunca juntar as linhas em memória.
+"""
+import numpy as np
+
+from .ingestao import ler_em_blocos, mapear_arquivos
+from .instrumentacao import medir
+
+COLUNAS_CUPED = ('n', 'soma_x', 'soma_y', 'soma_x2', 'soma_y2', 'soma_xy')
+
+
+@medir()
+def estatisticas_cuped(arquivo, metrica='converted', covariavel='pre_converted', coluna_variante='variant',
+                       tamanho_lote=500_000):
+    """Estatísticas suficientes por variante de um arquivo CSV ou Parquet.
+
+    O arquivo é lido em blocos e só com as três colunas usadas. Valores
+    ausentes contam como zero. Retorna um DataFrame indexado pela variante
+    com as colunas de COLUNAS_CUPED.
+    """
+    import pandas as pd
+
+    acumulado = None
+    for bloco in ler_em_blocos(arquivo, [coluna_variante, metrica, covariavel], tamanho_lote):
+        x = pd.to_numeric(bloco[covariavel], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+        y = pd.to_numeric(bloco[metrica], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+        partes = pd.DataFrame({'n': 1.0, 'soma_x': x, 'soma_y': y, 'soma_x2': x * x, 'soma_y2': y * y,
+                               'soma_xy': x * y})
+        parcial = partes.groupby(bloco[coluna_variante].astype(str).to_numpy(), sort=False).sum()
+        acumulado = parcial if acumulado is None else acumulado.add(parcial, fill_value=0.0)
+
+    if acumulado is None:
+        raise ValueError("O arquivo não contém usuários")
+    acumulado = acumulado[list(COLUNAS_CUPED)].sort_index()
+    acumulado.index.name = coluna_variante
+    return acumulado
+
+
+def combinar_estatisticas(parciais):
+    """Soma estatísticas suficientes de arquivos ou blocos diferentes (reduce)"""
+    total = None
+    for parcial in parciais:
+        total = parcial if total is None else total.add(parcial, fill_value=0.0)
+    if total is None:
+        raise ValueError("Nenhuma estatística para combinar")
+    return total.sort_index()
+
+
+@medir()
+def agregar_cuped(arquivos, processos=None, **kwargs):
+    """Map-reduce de estatisticas_cuped sobre vários arquivos.
+
+    `arquivos` é um caminho, um diretório (todos os CSV/Parquet dentro dele),
+    um padrão glob ou uma lista deles. Com `processos` > 1 cada arquivo é
+    reduzido em um processo do pool; os demais argumentos vão para
+    estatisticas_cuped.
+    """
+    return combinar_estatisticas(mapear_arquivos(estatisticas_cuped, arquivos, processos, **kwargs))
+
+
+@medir()
+def analisar_cuped(estatisticas, controle, variacao, nivel_significancia=0.05):
+    """Teste da diferença de médias com e sem o ajuste CUPED.
+
+    θ = cov(x, y) / var(x), com as covariâncias dentro de cada grupo somadas
+    (o tratamento não altera x, então θ não absorve o efeito). A média ajustada
+    de cada grupo é ȳ - θ(x̄ - x̄ geral) e a variância ajustada é
+    var(y) - 2θ cov(x, y) + θ² var(x). Retorna as métricas do teste ajustado,
+    as do teste sem ajuste (com sufixo `_sem_ajuste`), θ e a redução de
+    variância obtida.
+    """
+    from scipy import special
+
+    grupos = estatisticas.loc[[controle, variacao]]
+    n = grupos['n'].to_numpy(dtype=float)
+    if np.any(n < 2):
+        raise ValueError("Cada grupo precisa de pelo menos dois usuários")
+    media_x = grupos['soma_x'].to_numpy() / n
+    media_y = grupos['soma_y'].to_numpy() / n
+    soma_qx = grupos['soma_x2'].to_numpy() - n * media_x ** 2
+    soma_qy = grupos['soma_y2'].to_numpy() - n * media_y ** 2
+    soma_pxy = grupos['soma_xy'].to_numpy() - n * media_x * media_y
+
+    theta = soma_pxy.sum() / soma_qx.sum() if soma_qx.sum() > 0 else 0.0
+    media_x_geral = grupos['soma_x'].sum() / n.sum()
+    variancia_y = np.clip(soma_qy / (n - 1), 0, None)
+    variancia_ajustada = np.clip((soma_qy - 2 * theta * soma_pxy + theta ** 2 * soma_qx) / (n - 1), 0, None)
+    media_ajustada = media_y - theta * (media_x - media_x_geral)
+
+    z_critico = special.ndtri(1 - nivel_significancia / 2)
+    resultado = {'theta': float(theta), 'media_x_a': float(media_x[0]), 'media_x_b': float(media_x[1])}
+    for sufixo, medias, variancias in (('', media_ajustada, variancia_ajustada),
+                                       ('_sem_ajuste', media_y, variancia_y)):
+        diff_abs = medias[1] - medias[0]
+        se = np.sqrt((variancias / n).sum())
+        z = diff_abs / se if se > 0 else 0.0
+        resultado.update({
+            f'media_a{sufixo}': float(medias[0]),
+            f'media_b{sufixo}': float(medias[1]),
+            f'diff_abs{sufixo}': float(diff_abs),
+            f'diff_rel{sufixo}': float(diff_abs / medias[0] * 100) if medias[0] != 0 else 0.0,
+            f'z_score{sufixo}': float(z),
+            f'p_value{sufixo}': float(2 * special.ndtr(-abs(z))) if z != 0 else 1.0,
+            f'ci_lower{sufixo}': float(diff_abs - z_critico * se),
+            f'ci_upper{sufixo}': float(diff_abs + z_critico * se),
+        })
+    total_y = variancia_y @ (n - 1)
+    resultado['reducao_variancia'] = float(1 - variancia_ajustada @ (n - 1) / total_y) if total_y > 0 else 0.0
+    return resultado
+
+
+def ajustar_plano_cuped(plano, reducao_variancia):
+    """Reduz as amostras de um plano pela fração de variância que o CUPED deve remover.
+
+    O n necessário é proporcional à variância da métrica, então cada grupo
+    precisa de (1 - reducao_variancia) vezes o n original. Aceita planos
+    escalares ou vetorizados.
+    """
+    if not 0 <= reducao_variancia < 1:
+        raise ValueError("A redução de variância deve estar em [0, 1)")
+    ajustado = dict(plano)
+    fator = 1 - reducao_variancia
+    for chave in ('n_controle', 'n_variacao'):
+        valor = np.ceil(np.asarray(plano[chave]) * fator).astype(np.int64)
+        ajustado[chave] = valor.item() if np.ndim(plano[chave]) == 0 else valor
+    ajustado['n_total'] = ajustado['n_controle'] + ajustado['n_variacao']
+    return ajustado
@@ -0,0 +1,266 @@
+"""Testes exatos para contagens pequenas (Fisher, Barnard e Boschloo).
+
+Com poucas conversões (ou poucas não conversões) a aproximação normal de
+calcular_teste_atual erra o p-valor. Os testes aqui usam uma tabela de
+log(n!) compartilhada, que cresce sob demanda até um limite fixo, e são
+avaliados em lote:
+
+- Fisher (condicional na margem): todas as linhas de uma vez, agrupadas
+  pela largura do suporte hipergeométrico.
+- Barnard e Boschloo (incondicionais): o p-valor de todas as tabelas de um
+  desenho (visitantes A, visitantes B) sai de uma única maximização sobre a
+  taxa comum, e fica em cache; cada experimento vira uma consulta.
+"""
+import functools
+
+import numpy as np
+
+from .instrumentacao import medir
+
+LIMITE_TABELA = 1 << 20
+LIMITE_CELULAS = 1 << 20
+LIMITE_INCONDICIONAL = 250
+LIMITE_AUTOMATICO = 100
+MINIMO_ESPERADO = 5
+METODOS = ('z', 'fisher', 'barnard', 'boschloo')
+
+
+class TabelaLogFatorial:
+    """log(n!) tabelado para n < `limite`; acima do limite usa gammaln.
+
+    A tabela dobra de tamanho quando um n maior aparece, então o custo de
+    construção é amortizado entre chamadas e a memória fica limitada a
+    `limite` floats (8 MB no padrão).
+    """
+
+    def __init__(self, limite=LIMITE_TABELA):
+        self.limite = limite
+        self._valores = np.zeros(1)
+
+    def __len__(self):
+        return len(self._valores)
+
+    def _crescer(self, maximo):
+        from scipy import special
+
+        tamanho = min(self.limite, max(2 * len(self._valores), maximo + 1))
+        novos = special.gammaln(np.arange(len(self._valores), tamanho) + 1.0)
+        self._valores = np.concatenate([self._valores, novos])
+
+    def __call__(self, n):
+        n = np.asarray(n, dtype=np.int64)
+        maximo = int(n.max()) if n.size else 0
+        if maximo >= len(self._valores) and len(self._valores) < self.limite:
+            self._crescer(maximo)
+        valores = self._valores
+        if maximo < len(valores):
+            return valores[n]
+        from scipy import special
+
+        fora = n >= len(valores)
+        return np.where(fora, special.gammaln(n + 1.0), valores[np.where(fora, 0, n)])
+
+
+LOG_FATORIAL = TabelaLogFatorial()
+
+
+def log_combinacoes(n, k):
+    """log C(n, k) pela tabela compartilhada"""
+    n, k = np.asarray(n, dtype=np.int64), np.asarray(k, dtype=np.int64)
+    return LOG_FATORIAL(n) - LOG_FATORIAL(k) - LOG_FATORIAL(n - k)
+
+
+def _fisher(a, na, b, nb):
+    """P-valor bilateral de Fisher para arrays 1-d de contagens inteiras"""
+    k = a + b
+    inicio = np.maximum(0, k - nb)
+    larguras = np.minimum(k, na) - inicio + 1
+    p_value = np.empty(len(a))
+    # Linhas de largura parecida juntas, em blocos de até LIMITE_CELULAS células
+    ordem = np.argsort(larguras, kind='stable')
+    larguras_ordenadas = larguras[ordem]
+    posicao = 0
+    while posicao < len(ordem):
+        # A largura no fim do bloco tentativo limita o número de linhas do bloco
+        tentativa = posicao + LIMITE_CELULAS // int(larguras_ordenadas[posicao])
+        linhas = max(1, LIMITE_CELULAS // int(larguras_ordenadas[min(len(ordem), tentativa) - 1]))
+        bloco = ordem[posicao:posicao + linhas]
+        largura = int(larguras[bloco].max())
+        x = inicio[bloco, None] + np.arange(largura)
+        validos = x < (inicio[bloco] + larguras[bloco])[:, None]
+        x = np.where(validos, x, inicio[bloco, None])
+        log_pmf = (log_combinacoes(na[bloco, None], x) + log_combinacoes(nb[bloco, None], k[bloco, None] - x)
+                   - log_combinacoes(na[bloco] + nb[bloco], k[bloco])[:, None])
+        observado = log_pmf[np.arange(len(bloco)), a[bloco] - inicio[bloco]]
+        extremos = validos & (log_pmf <= observado[:, None] + np.log1p(1e-7))
+        p_value[bloco] = np.minimum(1.0, np.where(extremos, np.exp(log_pmf), 0.0).sum(axis=1))
+        posicao += linhas
+    return p_value
+
+
+def _grade_nuisance(na, nb):
+    """Taxas comuns para a maximização, uniformes em arcsen(√p) (resolução proporcional ao erro-padrão)"""
+    pontos = int(np.clip(16 * np.sqrt(max(na, nb)), 64, 512))
+    return np.sin(np.linspace(0, np.pi / 2, pontos + 2)[1:-1]) ** 2
+
+
+def _maximo_incondicional(na, nb, estatistica):
+    """max sobre a taxa comum de P(tabela pelo menos tão extrema), para cada tabela do desenho.
+
+    `estatistica` tem formato (na+1, nb+1), e valores menores são mais
+    extremos. Com as tabelas ordenadas pela estatística, a probabilidade do
+    conjunto extremo de cada tabela é uma soma acumulada. O máximo na grade
+    é refinado por interpolação parabólica com os dois vizinhos.
+    """
+    plana = estatistica.ravel()
+    ordem = np.argsort(plana, kind='stable')
+    ordenada = plana[ordem]
+    # Empates (com tolerância relativa) entram no conjunto extremo
+    ultimo = np.searchsorted(ordenada, ordenada + 1e-7 * np.abs(ordenada), side='right') - 1
+
+    taxas = _grade_nuisance(na, nb)
+    log_taxa, log_complemento = np.log(taxas)[:, None], np.log1p(-taxas)[:, None]
+    xa, xb = np.arange(na + 1), np.arange(nb + 1)
+    log_pa = log_combinacoes(na, xa) + xa * log_taxa + (na - xa) * log_complemento
+    log_pb = log_combinacoes(nb, xb) + xb * log_taxa + (nb - xb) * log_complemento
+
+    colunas = np.arange(len(plana))
+    maximo, anterior, seguinte = np.full(len(plana), -1.0), np.zeros(len(plana)), np.zeros(len(plana))
+    passo = max(1, LIMITE_CELULAS // len(plana))
+    for i in range(0, len(taxas), passo):
+        # Blocos de taxas com uma linha de sobreposição de cada lado, para ter os vizinhos do máximo
+        inicio, fim = max(i - 1, 0), min(i + passo + 1, len(taxas))
+        pesos = np.exp(log_pa[inicio:fim, :, None] + log_pb[inicio:fim, None, :]).reshape(-1, len(plana))
+        valores = np.cumsum(pesos[:, ordem], axis=1)[:, ultimo]
+        proprios = slice(i - inicio, min(i + passo, len(taxas)) - inicio)
+        linha = valores[proprios].argmax(axis=0) + proprios.start
+        candidato = valores[linha, colunas]
+        melhorou = candidato > maximo
+        maximo[melhorou] = candidato[melhorou]
+        anterior[melhorou] = valores[np.maximum(linha - 1, 0), colunas][melhorou]
+        seguinte[melhorou] = valores[np.minimum(linha + 1, len(valores) - 1), colunas][melhorou]
+
+    curvatura = anterior - 2 * maximo + seguinte
+    with np.errstate(divide='ignore', invalid='ignore'):
+        maximo = np.where(curvatura < 0, maximo - (seguinte - anterior) ** 2 / (8 * curvatura), maximo)
+    p_value = np.empty(len(plana))
+    p_value[ordem] = np.minimum(maximo, 1.0)
+    return p_value.reshape(estatistica.shape)
+
+
+@functools.lru_cache(maxsize=128)
+def pvalores_desenho(na, nb, metodo='boschloo'):
+    """P-valores bilaterais de todas as tabelas (conversões A × conversões B) de um desenho.
+
+    Barnard usa o z com variância agrupada como estatística; Boschloo usa o
+    p-valor unilateral de Fisher e, como no SciPy, o bilateral é o dobro do
+    menor unilateral. Resultado em cache (até 128 desenhos).
+    """
+    if metodo not in ('barnard', 'boschloo'):
+        raise ValueError("O método deve ser 'barnard' ou 'boschloo'")
+    if max(na, nb) > LIMITE_INCONDICIONAL:
+        raise ValueError(f"Testes incondicionais só até {LIMITE_INCONDICIONAL} visitantes por grupo")
+    xa, xb = np.arange(na + 1)[:, None], np.arange(nb + 1)[None, :]
+
+    if metodo == 'barnard':
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p_pooled = (xa + xb) / (na + nb)
+            se = np.sqrt(p_pooled * (1 - p_pooled) * (1 / na + 1 / nb))
+            z = np.where(se > 0, (xb / nb - xa / na) / se, 0.0)
+        return _maximo_incondicional(na, nb, -np.abs(z))
+
+    # P(X <= xa | xa + xb) e P(X >= xa | xa + xb), X hipergeométrica, para cada margem k
+    k = np.arange(na + nb + 1)[:, None]
+    x = np.arange(na + 1)[None, :]
+    validos = (k - x >= 0) & (k - x <= nb)
+    log_pmf = (log_combinacoes(na, x) + log_combinacoes(nb, np.clip(k - x, 0, nb))
+               - log_combinacoes(na + nb, k))
+    pmf = np.where(validos, np.exp(log_pmf), 0.0)
+    menor = np.cumsum(pmf, axis=1)
+    maior = np.cumsum(pmf[:, ::-1], axis=1)[:, ::-1]
+    unilaterais = [_maximo_incondicional(na, nb, np.minimum(cdf[xa + xb, xa], 1.0)) for cdf in (menor, maior)]
+    return np.minimum(1.0, 2 * np.minimum(*unilaterais))
+
+
+def _incondicional(a, na, b, nb, metodo):
+    p_value = np.empty(len(a))
+    desenhos = np.stack([na, nb], axis=1)
+    unicos, grupo = np.unique(desenhos, axis=0, return_inverse=True)
+    for i, (n_a, n_b) in enumerate(unicos):
+        linhas = grupo.ravel() == i
+        p_value[linhas] = pvalores_desenho(int(n_a), int(n_b), metodo)[a[linhas], b[linhas]]
+    return p_value
+
+
+def selecionar_metodo(conversions_a, visitors_a, conversions_b, visitors_b):
+    """Teste indicado para cada linha: 'z' quando todas as contagens esperadas são >= 5.
+
+    Abaixo disso usa Boschloo (mais poderoso que Fisher) se os dois grupos
+    têm até LIMITE_AUTOMATICO visitantes, e Fisher nos demais casos.
+    """
+    conversions_a, visitors_a, conversions_b, visitors_b = (
+        np.asarray(v, dtype=float) for v in (conversions_a, visitors_a, conversions_b, visitors_b)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_pooled = (conversions_a + conversions_b) / (visitors_a + visitors_b)
+    # Menor contagem esperada da tabela 2x2 sob H0 (NaN sem visitantes: fica no teste z)
+    esperado = np.minimum(visitors_a, visitors_b) * np.minimum(p_pooled, 1 - p_pooled)
+    pequeno = esperado < MINIMO_ESPERADO
+    incondicional = np.maximum(visitors_a, visitors_b) <= LIMITE_AUTOMATICO
+    return np.where(pequeno, np.where(incondicional, 'boschloo', 'fisher'), 'z')
+
+
+def contagens_validas(conversions_a, visitors_a, conversions_b, visitors_b):
+    """Máscara das linhas com 0 <= conversões <= visitantes e visitantes > 0 nos dois grupos"""
+    a, na, b, nb = (np.asarray(v, dtype=float) for v in (conversions_a, visitors_a, conversions_b, visitors_b))
+    return (na > 0) & (nb > 0) & (a >= 0) & (b >= 0) & (a <= na) & (b <= nb)
+
+
+@medir()
+def calcular_teste_exato(conversions_a, visitors_a, conversions_b, visitors_b, metodo='auto'):
+    """calcular_teste_atual com p-valor exato onde as contagens são pequenas.
+
+    `metodo` é 'auto' (selecionar_metodo linha a linha) ou um de METODOS
+    aplicado a todas as linhas. Retorna as métricas de calcular_teste_atual,
+    com `p_value` do teste escolhido, `p_value_normal` (aproximação normal)
+    e `metodo`. O IC continua o da aproximação normal. Em lote, linhas com
+    contagens inválidas (ver contagens_validas) recebem p-valores NaN; uma
+    entrada escalar inválida levanta ValueError.
+    """
+    from .teste import calcular_teste_atual
+
+    escalar = all(np.ndim(v) == 0 for v in (conversions_a, visitors_a, conversions_b, visitors_b))
+    entradas = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=float))
+                                     for v in (conversions_a, visitors_a, conversions_b, visitors_b)))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Linhas inválidas geram NaN/inf aqui e são anuladas abaixo
+        resultado = calcular_teste_atual(*entradas)
+    if metodo == 'auto':
+        metodos = selecionar_metodo(*entradas)
+    elif metodo in METODOS:
+        metodos = np.full(entradas[0].shape, metodo)
+    else:
+        raise ValueError(f"Método desconhecido: {metodo}")
+
+    validas = contagens_validas(*entradas)
+    if escalar and not validas.all():
+        raise ValueError("As contagens precisam ter 0 <= conversões <= visitantes e visitantes > 0")
+    metodos = np.where(validas, metodos, 'z')
+    exatos = metodos != 'z'
+    a, na, b, nb = (np.rint(np.where(exatos, v, 0)).astype(np.int64) for v in entradas)
+
+    p_value = resultado['p_value'].copy()
+    for nome in METODOS[1:]:
+        linhas = metodos == nome
+        if not linhas.any():
+            continue
+        argumentos = (a[linhas], na[linhas], b[linhas], nb[linhas])
+        p_value[linhas] = _fisher(*argumentos) if nome == 'fisher' else _incondicional(*argumentos, nome)
+
+    p_value[~validas] = np.nan
+    resultado['p_value_normal'] = np.where(validas, resultado['p_value'], np.nan)
+    resultado['p_value'] = p_value
+    resultado['metodo'] = metodos
+    if escalar:
+        resultado = {k: (str(v[0]) if k == 'metodo' else float(v[0])) for k, v in resultado.items()}
+    return resultado
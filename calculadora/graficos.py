@@ -0,0 +1,138 @@
+"""Traços plotly para séries grandes: WebGL, redução no servidor e payload limitado.
+
+Acima de `LIMITE_WEBGL` pontos os traços viram Scattergl, que o navegador
+desenha na GPU em vez de criar um elemento SVG por ponto. Acima de
+`LIMITE_PONTOS` a série é reduzida no servidor: linhas pelo algoritmo LTTB
+(Largest-Triangle-Three-Buckets), que preserva picos e vales, e nuvens de
+pontos por amostragem que mantém os extremos. `limitar_payload` garante um
+teto para o JSON enviado ao navegador.
+"""
+import numpy as np
+
+LIMITE_WEBGL = 1_000
+LIMITE_PONTOS = 5_000
+LIMITE_PAYLOAD = 1_500_000
+
+
+def lttb(x, y, limite):
+    """Índices dos `limite` pontos escolhidos pelo LTTB (x deve estar ordenado)"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n = len(x)
+    if limite >= n or limite < 3:
+        return np.arange(n)
+
+    # Primeiro e último pontos fixos; os demais divididos em limite - 2 baldes
+    limites_baldes = np.linspace(1, n - 1, limite - 1).astype(np.int64)
+    escolhidos = np.empty(limite, dtype=np.int64)
+    escolhidos[0], escolhidos[-1] = 0, n - 1
+    anterior = 0
+    for b in range(limite - 2):
+        inicio, fim = limites_baldes[b], limites_baldes[b + 1]
+        proximo_inicio, proximo_fim = fim, limites_baldes[b + 2] if b + 2 < len(limites_baldes) else n
+        media_x = x[proximo_inicio:proximo_fim].mean()
+        media_y = y[proximo_inicio:proximo_fim].mean()
+        # Área do triângulo (anterior, candidato, média do próximo balde)
+        areas = np.abs((x[anterior] - media_x) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (media_y - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos[b + 1] = anterior
+    return escolhidos
+
+
+def _eixo_numerico(x):
+    """Posição numérica de x para o LTTB: datas viram nanossegundos e rótulos, a ordem em que vieram"""
+    if np.issubdtype(x.dtype, np.number):
+        return x.astype(float)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype('datetime64[ns]').astype(np.int64).astype(float)
+    return np.arange(len(x), dtype=float)
+
+
+def amostrar_pontos(y, limite, semente=0, extremos=0.1):
+    """Índices de uma amostra de `limite` pontos que sempre inclui os valores extremos de y"""
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if limite >= n:
+        return np.arange(n)
+    n_extremos = int(limite * extremos) // 2
+    ordem = np.argsort(y, kind='stable')
+    fixos = np.concatenate([ordem[:n_extremos], ordem[n - n_extremos:]])
+    restantes = np.setdiff1d(np.arange(n), fixos, assume_unique=True)
+    sorteados = np.random.default_rng(semente).choice(restantes, limite - len(fixos), replace=False)
+    return np.sort(np.concatenate([fixos, sorteados]))
+
+
+def traco_dispersao(x, y, modo='linha', limite_pontos=LIMITE_PONTOS, limite_webgl=LIMITE_WEBGL, **kwargs):
+    """Scatter/Scattergl reduzido para no máximo `limite_pontos` pontos.
+
+    `modo='linha'` usa LTTB (ordena por x se preciso); `modo='pontos'` usa a
+    amostragem que preserva extremos. Os demais argumentos vão para o traço.
+    """
+    import plotly.graph_objects as go
+
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=float)
+    if modo == 'linha':
+        posicao = _eixo_numerico(x)
+        if len(x) > 1 and np.any(np.diff(posicao) < 0):
+            ordem = np.argsort(posicao, kind='stable')
+            x, y, posicao = x[ordem], y[ordem], posicao[ordem]
+        indices = lttb(posicao, y, limite_pontos)
+    else:
+        indices = amostrar_pontos(y, limite_pontos)
+
+    classe = go.Scattergl if len(indices) > limite_webgl else go.Scatter
+    traco = classe(x=x[indices], y=y[indices], **kwargs)
+    if len(indices) < len(x):
+        traco.meta = {'pontos_originais': int(len(x))}
+    return traco
+
+
+def histograma(valores, nbins=50, intervalo=None, **kwargs):
+    """Histograma agregado no servidor: envia nbins barras em vez de todos os valores"""
+    import plotly.graph_objects as go
+
+    contagens, bordas = np.histogram(np.asarray(valores, dtype=float), bins=nbins, range=intervalo)
+    return go.Bar(x=(bordas[:-1] + bordas[1:]) / 2, y=contagens, width=np.diff(bordas), **kwargs)
+
+
+def tamanho_payload(fig):
+    import plotly.io as pio
+
+    return len(pio.to_json(fig, validate=False))
+
+
+def _desenha_linha(traco):
+    """Scatter com linhas; sem `mode`, o plotly liga os pontos (com marcadores abaixo de 20 pontos)"""
+    if traco.type not in ('scatter', 'scattergl'):
+        return False
+    return traco.mode is None or 'lines' in traco.mode
+
+
+def limitar_payload(fig, max_bytes=LIMITE_PAYLOAD, max_iteracoes=6):
+    """Reduz pela metade os traços x/y grandes até o JSON da figura caber em `max_bytes`"""
+    for _ in range(max_iteracoes):
+        if tamanho_payload(fig) <= max_bytes:
+            break
+        for traco in fig.data:
+            if getattr(traco, 'x', None) is None or getattr(traco, 'y', None) is None:
+                continue
+            if len(traco.x) < 2 * LIMITE_WEBGL:
+                continue
+            x, y = np.asarray(traco.x), np.asarray(traco.y, dtype=float)
+            if _desenha_linha(traco):
+                # Índices na ordem de x, para que os atributos por ponto continuem alinhados
+                posicao = _eixo_numerico(x)
+                ordem = np.argsort(posicao, kind='stable')
+                indices = ordem[lttb(posicao[ordem], y[ordem], len(x) // 2)]
+            else:
+                indices = amostrar_pontos(y, len(x) // 2)
+            # Atributos por ponto acompanham a redução
+            atualizacao = {'x': x[indices], 'y': y[indices]}
+            for nome in ('text', 'customdata', 'hovertext'):
+                valor = getattr(traco, nome, None)
+                if valor is not None and not isinstance(valor, str) and len(valor) == len(x):
+                    atualizacao[nome] = np.asarray(valor)[indices]
+            traco.update(atualizacao)
+    return fig
@@ -0,0 +1,166 @@
+"""Ingestão em streaming de logs de eventos por usuário"""
+import functools
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .instrumentacao import medir
+
+EXTENSOES_DADOS = ('*.csv', '*.parquet', '*.pq')
+
+
+def expandir_arquivos(entradas):
+    """Lista de arquivos a partir de caminhos, diretórios (CSV/Parquet dentro deles) ou padrões glob"""
+    if isinstance(entradas, (str, os.PathLike)) or hasattr(entradas, 'read'):
+        entradas = [entradas]
+    arquivos = []
+    for entrada in entradas:
+        if not isinstance(entrada, (str, os.PathLike)):
+            arquivos.append(entrada)
+            continue
+        caminho = os.fspath(entrada)
+        if os.path.isdir(caminho):
+            arquivos.extend(sorted(p for extensao in EXTENSOES_DADOS for p in glob.glob(os.path.join(caminho, extensao))))
+        else:
+            arquivos.extend(sorted(glob.glob(caminho)) or [caminho])
+    if not arquivos:
+        raise ValueError("Nenhum arquivo encontrado")
+    return arquivos
+
+
+def mapear_arquivos(funcao, arquivos, processos=None, **kwargs):
+    """Aplica `funcao(arquivo, **kwargs)` a cada arquivo (map), em um pool quando `processos` > 1"""
+    arquivos = expandir_arquivos(arquivos)
+    tarefa = functools.partial(funcao, **kwargs)
+    processos = min(processos or 1, len(arquivos))
+    if processos == 1:
+        return [tarefa(arquivo) for arquivo in arquivos]
+    with ProcessPoolExecutor(processos) as pool:
+        return list(pool.map(tarefa, arquivos))
+
+
+def ler_em_blocos(arquivo, colunas, tamanho_lote=500_000):
+    """Itera DataFrames de até `tamanho_lote` linhas com só as `colunas` pedidas.
+
+    Parquet é lido por lotes do Arrow a partir de um mapeamento em memória; os
+    demais arquivos são tratados como CSV.
+    """
+    import pandas as pd
+
+    if str(getattr(arquivo, 'name', arquivo)).lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        for lote in pq.ParquetFile(arquivo, memory_map=True).iter_batches(batch_size=tamanho_lote, columns=colunas):
+            yield lote.to_pandas()
+    else:
+        yield from pd.read_csv(arquivo, usecols=colunas, chunksize=tamanho_lote)
+
+
+def _somas_por_variante(valores, variantes):
+    """n, somas e somas dos quadrados das métricas por variante (rótulos como texto)"""
+    import pandas as pd
+
+    codigos, rotulos = pd.factorize(variantes, use_na_sentinel=False)
+    somas = {'n': np.bincount(codigos, minlength=len(rotulos)).astype(float)}
+    for metrica in valores.columns:
+        x = valores[metrica].to_numpy(dtype=float)
+        somas[f"{metrica}_soma"] = np.bincount(codigos, weights=x, minlength=len(rotulos))
+        somas[f"{metrica}_soma_quadrados"] = np.bincount(codigos, weights=x * x, minlength=len(rotulos))
+    return pd.DataFrame(somas, index=pd.Index(rotulos).astype(str)).groupby(level=0, sort=False).sum()
+
+
+def _somar_por_usuario(partes, coluna_variante, coluna_usuario):
+    """Soma as métricas por (variante, usuário) sobre uma chave inteira única"""
+    import pandas as pd
+
+    dados = pd.concat(partes, ignore_index=True) if len(partes) > 1 else partes[0]
+    codigos_variante, variantes = pd.factorize(dados[coluna_variante], use_na_sentinel=False)
+    codigos_usuario, usuarios = pd.factorize(dados[coluna_usuario], use_na_sentinel=False)
+    chave = codigos_usuario.astype(np.int64) * len(variantes) + codigos_variante
+    metricas = dados.drop(columns=[coluna_variante, coluna_usuario])
+    tamanho = len(usuarios) * len(variantes)
+    if tamanho <= 4 * len(dados):
+        # Chaves densas: somas por bincount, sem fatorar a chave de novo como o groupby faria
+        chaves = np.flatnonzero(np.bincount(chave, minlength=tamanho))
+        somas = pd.DataFrame({m: np.bincount(chave, weights=metricas[m].to_numpy(), minlength=tamanho)[chaves]
+                              for m in metricas.columns})
+    else:
+        somas = metricas.groupby(chave, sort=False).sum()
+        chaves = somas.index.to_numpy()
+        somas = somas.reset_index(drop=True)
+    somas.insert(0, coluna_usuario, usuarios.take(chaves // len(variantes)))
+    somas.insert(0, coluna_variante, variantes.take(chaves % len(variantes)))
+    return somas
+
+
+@medir()
+def agregar_eventos_por_variante(arquivo, coluna_variante='variant', metricas=('converted', 'revenue'),
+                                 coluna_usuario='user_id', binarias=('converted',), tamanho_lote=500_000):
+    """Reduz um log de eventos por usuário a estatísticas suficientes por variante.
+
+    O arquivo (CSV ou Parquet) é lido em blocos de `tamanho_lote` linhas e só
+    as colunas necessárias são carregadas. Um usuário pode ter várias linhas:
+    as métricas são somadas por (variante, `coluna_usuario`) e as `binarias`
+    viram 0/1 (converteu se converteu em algum evento), então `n` conta
+    usuários e a memória cresce com o número de usuários, não de linhas. Com
+    `coluna_usuario=None` cada linha já é um usuário e o pico de memória não
+    depende do tamanho do arquivo. Retorna um DataFrame indexado pela variante
+    com `n` e, para cada métrica, `<metrica>_soma` e `<metrica>_soma_quadrados`.
+    Valores ausentes nas métricas contam como zero.
+    """
+    metricas = list(metricas)
+    colunas = [coluna_variante] + ([coluna_usuario] if coluna_usuario else []) + metricas
+    acumulado = None
+    # Linhas por usuário ainda não somadas e tamanho da última soma: só soma de novo quando as
+    # pendentes passam do dobro dela, então cada linha entra em O(1) somas em média
+    pendentes, linhas_pendentes, linhas_somadas = [], 0, 0
+    for bloco in ler_em_blocos(arquivo, colunas, tamanho_lote):
+        valores = bloco[metricas].astype(float).fillna(0.0)
+        if not coluna_usuario:
+            parcial = _somas_por_variante(valores, bloco[coluna_variante])
+            acumulado = parcial if acumulado is None else acumulado.add(parcial, fill_value=0.0)
+            continue
+        valores.insert(0, coluna_usuario, bloco[coluna_usuario])
+        valores.insert(0, coluna_variante, bloco[coluna_variante])
+        pendentes.append(valores)
+        linhas_pendentes += len(valores)
+        if linhas_pendentes > max(tamanho_lote, 2 * linhas_somadas):
+            pendentes = [_somar_por_usuario(pendentes, coluna_variante, coluna_usuario)]
+            linhas_pendentes = linhas_somadas = len(pendentes[0])
+    if pendentes:
+        por_usuario = (pendentes[0] if len(pendentes) == 1 and linhas_somadas
+                       else _somar_por_usuario(pendentes, coluna_variante, coluna_usuario))
+        for metrica in binarias:
+            if metrica in metricas:
+                por_usuario[metrica] = (por_usuario[metrica] > 0).astype(float)
+        acumulado = _somas_por_variante(por_usuario[metricas], por_usuario[coluna_variante])
+
+    if acumulado is None:
+        raise ValueError("O arquivo não contém eventos")
+    colunas = ['n'] + [f"{m}_{s}" for m in metricas for s in ('soma', 'soma_quadrados')]
+    acumulado = acumulado[colunas].sort_index()
+    acumulado.index.name = coluna_variante
+    return acumulado
+
+
+def resumir_estatisticas(estatisticas, metrica):
+    """Média e variância amostral de uma métrica a partir das estatísticas suficientes"""
+    import pandas as pd
+
+    n = estatisticas['n']
+    soma = estatisticas[f"{metrica}_soma"]
+    soma_quadrados = estatisticas[f"{metrica}_soma_quadrados"]
+    media = soma / n
+    variancia = (soma_quadrados - n * media ** 2) / (n - 1)
+    return pd.DataFrame({'n': n, 'media': media, 'variancia': variancia.clip(lower=0)})
+
+
+def dados_teste_de_estatisticas(estatisticas, controle, variacao, metrica='converted'):
+    """Monta as entradas de calcular_teste_atual a partir das estatísticas suficientes"""
+    return {
+        'conversions_a': estatisticas.at[controle, f"{metrica}_soma"],
+        'visitors_a': estatisticas.at[controle, 'n'],
+        'conversions_b': estatisticas.at[variacao, f"{metrica}_soma"],
+        'visitors_b': estatisticas.at[variacao, 'n']
+    }
@@ -0,0 +1,181 @@
+"""Instrumentação opcional dos caminhos críticos (cálculos, gráficos e páginas).
+
+Desligada por padrão: nesse caso `medir` custa uma verificação de flag por
+chamada e `secao` devolve um gerenciador de contexto vazio compartilhado. Liga
+para o processo inteiro com `ativar()` ou com a variável de ambiente
+CALCULADORA_INSTRUMENTACAO=1, ou só para a execução corrente da thread com
+`ativar_execucao()` (a opção de cada sessão do Streamlit, sem afetar as outras).
+
+As medições vão para um registro global do processo e, se houver, para o
+registro da execução corrente da thread (cada reexecução do script Streamlit
+roda em uma thread da sessão), que pode ser exportado em JSON lines ou no
+formato texto do Prometheus.
+"""
+import functools
+import json
+import os
+import threading
+import time
+
+
+class _Estado:
+    ativo = os.environ.get('CALCULADORA_INSTRUMENTACAO', '') not in ('', '0')
+
+
+_ESTADO = _Estado()
+_LOCAL = threading.local()
+
+
+class Registro:
+    """Contagem, tempo total e tempo máximo por nome de medição"""
+
+    def __init__(self):
+        self._trava = threading.Lock()
+        self.medicoes = {}
+
+    def adicionar(self, nome, segundos):
+        with self._trava:
+            medicao = self.medicoes.setdefault(nome, [0, 0.0, 0.0])
+            medicao[0] += 1
+            medicao[1] += segundos
+            medicao[2] = max(medicao[2], segundos)
+
+    def resumo(self):
+        with self._trava:
+            itens = sorted(self.medicoes.items(), key=lambda item: -item[1][1])
+            return [{'nome': nome, 'chamadas': chamadas, 'total_s': total, 'maximo_s': maximo,
+                     'medio_s': total / chamadas}
+                    for nome, (chamadas, total, maximo) in itens]
+
+    def limpar(self):
+        with self._trava:
+            self.medicoes.clear()
+
+
+REGISTRO_GLOBAL = Registro()
+
+
+def ativar(ativo=True):
+    """Liga ou desliga a instrumentação em todo o processo"""
+    _ESTADO.ativo = bool(ativo)
+
+
+def ativar_execucao(ativo=True):
+    """Liga ou desliga só a execução corrente desta thread, sobrepondo o valor do processo"""
+    _LOCAL.ativo = bool(ativo)
+
+
+def esta_ativo():
+    ativo = getattr(_LOCAL, 'ativo', None)
+    return _ESTADO.ativo if ativo is None else ativo
+
+
+def iniciar_execucao():
+    """Começa um novo registro para a execução corrente desta thread e o retorna.
+
+    A opção de `ativar_execucao` de uma execução anterior na mesma thread é
+    descartada: a nova execução segue o valor do processo até escolher o seu.
+    """
+    _LOCAL.ativo = None
+    _LOCAL.execucao = Registro()
+    return _LOCAL.execucao
+
+
+def execucao_atual():
+    return getattr(_LOCAL, 'execucao', None)
+
+
+def registrar(nome, segundos):
+    if not esta_ativo():
+        return
+    REGISTRO_GLOBAL.adicionar(nome, segundos)
+    execucao = getattr(_LOCAL, 'execucao', None)
+    if execucao is not None:
+        execucao.adicionar(nome, segundos)
+
+
+class _Secao:
+    __slots__ = ('nome', 'inicio')
+
+    def __init__(self, nome):
+        self.nome = nome
+
+    def __enter__(self):
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        registrar(self.nome, time.perf_counter() - self.inicio)
+        return False
+
+
+class _SecaoVazia:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_SECAO_VAZIA = _SecaoVazia()
+
+
+def secao(nome):
+    """Gerenciador de contexto que mede o bloco quando a instrumentação está ativa"""
+    return _Secao(nome) if esta_ativo() else _SECAO_VAZIA
+
+
+def medir(nome=None):
+    """Decorador que mede cada chamada da função quando a instrumentação está ativa"""
+    def decorador(funcao):
+        rotulo = nome or f"{funcao.__module__}.{funcao.__qualname__}"
+
+        @functools.wraps(funcao)
+        def envoltorio(*args, **kwargs):
+            if not esta_ativo():
+                return funcao(*args, **kwargs)
+            inicio = time.perf_counter()
+            try:
+                return funcao(*args, **kwargs)
+            finally:
+                registrar(rotulo, time.perf_counter() - inicio)
+        return envoltorio
+    return decorador
+
+
+def exportar_jsonl(caminho, registro=None, rotulo=None):
+    """Acrescenta uma linha JSON por medição do registro (padrão: execução atual)"""
+    registro = registro or execucao_atual() or REGISTRO_GLOBAL
+    momento = time.time()
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    with open(caminho, "a", encoding="utf-8") as arquivo:
+        for medicao in registro.resumo():
+            arquivo.write(json.dumps({'timestamp': momento, 'execucao': rotulo, **medicao},
+                                     ensure_ascii=False) + "\n")
+
+
+def _escapar(valor):
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def exportar_prometheus(caminho, registro=None):
+    """Grava o registro (padrão: global) no formato texto do Prometheus"""
+    registro = registro or REGISTRO_GLOBAL
+    linhas = [
+        "# HELP calculadora_chamadas_total Número de chamadas medidas.",
+        "# TYPE calculadora_chamadas_total counter",
+    ]
+    resumo = registro.resumo()
+    linhas += [f'calculadora_chamadas_total{{nome="{_escapar(m["nome"])}"}} {m["chamadas"]}' for m in resumo]
+    linhas += [
+        "# HELP calculadora_segundos_total Tempo total gasto, em segundos.",
+        "# TYPE calculadora_segundos_total counter",
+    ]
+    linhas += [f'calculadora_segundos_total{{nome="{_escapar(m["nome"])}"}} {m["total_s"]:.9f}' for m in resumo]
+    os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    with open(temporario, "w", encoding="utf-8") as arquivo:
+        arquivo.write("\n".join(linhas) + "\n")
+    os.replace(temporario, caminho)
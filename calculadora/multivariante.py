@@ -0,0 +1,137 @@
+"""Análise de testes A/B/n com k variantes.
+
+Todas as funções aceitam contagens com formato (..., k): a última dimensão são
+as variantes e as anteriores, se houver, são experimentos independentes. As
+comparações de todos os pares saem de uma única operação com broadcasting,
+então milhares de experimentos com k braços são avaliados de uma vez.
+"""
+import numpy as np
+
+from .instrumentacao import medir
+
+CORRECOES = ('holm', 'bonferroni', 'bh', 'nenhuma')
+
+
+def ajustar_p_valores(p_valores, metodo='holm'):
+    """Corrige p-valores para comparações múltiplas ao longo da última dimensão"""
+    if metodo not in CORRECOES:
+        raise ValueError(f"metodo deve ser um de {CORRECOES}")
+    p_valores = np.asarray(p_valores, dtype=float)
+    m = p_valores.shape[-1]
+    if metodo == 'nenhuma' or m == 0:
+        return p_valores.copy()
+    if metodo == 'bonferroni':
+        return np.minimum(p_valores * m, 1.0)
+
+    ordem = np.argsort(p_valores, axis=-1)
+    ordenados = np.take_along_axis(p_valores, ordem, axis=-1)
+    posicao = np.arange(1, m + 1)
+    if metodo == 'holm':
+        ajustados = np.maximum.accumulate(ordenados * (m - posicao + 1), axis=-1)
+    else:
+        # Benjamini-Hochberg: mínimo acumulado de trás para frente
+        ajustados = np.minimum.accumulate((ordenados * m / posicao)[..., ::-1], axis=-1)[..., ::-1]
+    resultado = np.empty_like(ajustados)
+    np.put_along_axis(resultado, ordem, np.minimum(ajustados, 1.0), axis=-1)
+    return resultado
+
+
+def _teste_z(conv_i, vis_i, conv_j, vis_j):
+    from scipy import special
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_i, p_j = conv_i / vis_i, conv_j / vis_j
+        diff_abs = p_j - p_i
+        p_agrupada = (conv_i + conv_j) / (vis_i + vis_j)
+        se = np.sqrt(p_agrupada * (1 - p_agrupada) * (1 / vis_i + 1 / vis_j))
+        z = np.where(se > 0, diff_abs / se, 0.0)
+        diff_rel = np.where(p_i > 0, diff_abs / p_i * 100, 0.0)
+    p_value = np.where(z != 0, 2 * special.ndtr(-np.abs(z)), 1.0)
+    return diff_abs, diff_rel, z, p_value
+
+
+@medir()
+def comparacoes_pareadas(conversoes, visitantes, controle=None, correcao='holm', nivel_significancia=0.05):
+    """Testes z de todas as comparações entre variantes.
+
+    Com `controle=None` compara todos os pares e retorna matrizes (..., k, k)
+    em que a posição [i, j] é a variante j contra a variante i. Com `controle`
+    igual ao índice de uma variante compara cada uma contra ela e retorna
+    arrays (..., k), com NaN na posição do controle. A correção é aplicada
+    dentro de cada experimento, sobre as comparações realizadas.
+    """
+    conversoes = np.asarray(conversoes, dtype=float)
+    visitantes = np.asarray(visitantes, dtype=float)
+    k = conversoes.shape[-1]
+
+    if controle is None:
+        i, j = np.triu_indices(k, 1)
+    else:
+        j = np.array([b for b in range(k) if b != controle])
+        i = np.full_like(j, controle)
+
+    diff_abs, diff_rel, z, p_value = _teste_z(conversoes[..., i], visitantes[..., i],
+                                              conversoes[..., j], visitantes[..., j])
+    p_ajustado = ajustar_p_valores(p_value, correcao)
+    metricas = {'diff_abs': diff_abs, 'diff_rel': diff_rel, 'z_score': z,
+                'p_value': p_value, 'p_ajustado': p_ajustado}
+
+    resultado = {}
+    for nome, valores in metricas.items():
+        if controle is None:
+            matriz = np.full(conversoes.shape + (k,), np.nan)
+            matriz[..., i, j] = valores
+            # Posição espelhada: mesma comparação vista a partir da outra variante
+            matriz[..., j, i] = -valores if nome in ('diff_abs', 'z_score') else valores
+            if nome == 'diff_rel':
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    p = conversoes / visitantes
+                    matriz[..., j, i] = np.where(p[..., j] > 0,
+                                                 (p[..., i] - p[..., j]) / p[..., j] * 100, 0.0)
+            resultado[nome] = matriz
+        else:
+            vetor = np.full(conversoes.shape, np.nan)
+            vetor[..., j] = valores
+            resultado[nome] = vetor
+    resultado['significativo'] = resultado['p_ajustado'] < nivel_significancia
+    return resultado
+
+
+@medir()
+def teste_qui_quadrado(conversoes, visitantes):
+    """Teste qui-quadrado omnibus de homogeneidade das taxas (tabela 2 x k)"""
+    from scipy import special
+
+    conversoes = np.asarray(conversoes, dtype=float)
+    visitantes = np.asarray(visitantes, dtype=float)
+    k = conversoes.shape[-1]
+    taxa_geral = conversoes.sum(axis=-1, keepdims=True) / visitantes.sum(axis=-1, keepdims=True)
+    esperado_sim = visitantes * taxa_geral
+    esperado_nao = visitantes * (1 - taxa_geral)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        termos = ((conversoes - esperado_sim) ** 2 / esperado_sim
+                  + ((visitantes - conversoes) - esperado_nao) ** 2 / esperado_nao)
+    qui2 = np.nansum(termos, axis=-1)
+    graus = k - 1
+    return {'qui2': qui2, 'graus_liberdade': graus, 'p_value': special.chdtrc(graus, qui2)}
+
+
+def tamanho_amostra_k_bracos(taxa_base, melhoria_minima_detectar, k, poder_estatistico=0.80, nivel_significancia=0.05):
+    """Tamanho por braço para k variantes comparadas contra o controle.
+
+    O nível de significância de cada uma das k - 1 comparações é corrigido por
+    Bonferroni, e cada comparação usa braços de mesmo tamanho.
+    """
+    from .solucionador import resolver_tamanho_amostra
+
+    k = np.asarray(k)
+    alpha_comparacao = np.asarray(nivel_significancia, dtype=float) / np.maximum(k - 1, 1)
+    resultado = resolver_tamanho_amostra(taxa_base, melhoria_minima_detectar, poder_estatistico,
+                                         alpha_comparacao, 0.5)
+    n_por_braco = np.maximum(np.asarray(resultado['n_controle']), np.asarray(resultado['n_variacao']))
+    return {
+        'n_por_braco': n_por_braco,
+        'n_total': n_por_braco * k,
+        'nivel_por_comparacao': alpha_comparacao,
+        'taxa_variacao': resultado['taxa_variacao'],
+    }
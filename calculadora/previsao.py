@@ -0,0 +1,131 @@
+"""Previsão da duração de um teste a partir do tráfego diário.
+
+Substitui a conta `n_total // trafego_diario`, que supõe tráfego constante.
+O histórico diário é decomposto em log: nível recente + fator por dia da
+semana + ruído. Muitos caminhos de tráfego futuros são simulados de uma vez
+(matriz caminhos × dias), com incerteza no nível, ruído diário, rampa de
+entrada e a divisão entre os grupos, e o dia em que cada grupo atinge sua
+amostra sai do acumulado de cada caminho.
+"""
+import datetime
+
+import numpy as np
+
+from .instrumentacao import medir
+
+QUANTIS_PADRAO = (0.1, 0.5, 0.9)
+
+
+@medir()
+def ajustar_trafego(historico, janela=28):
+    """Estima nível, sazonalidade semanal e ruído de uma série diária de visitantes.
+
+    `historico` é uma Series indexada por data. A sazonalidade só é estimada
+    com pelo menos duas semanas de dados; o nível e o ruído usam os últimos
+    `janela` dias. Retorna um dicionário com `nivel_log`, `sazonal` (7 valores
+    em log, segunda = 0), `sigma` (desvio diário em log), `erro_nivel` e
+    `ultima_data`.
+    """
+    import pandas as pd
+
+    serie = pd.Series(historico, dtype=float).dropna()
+    serie.index = pd.to_datetime(serie.index)
+    serie = serie.sort_index()
+    if len(serie) == 0:
+        raise ValueError("O histórico de tráfego está vazio")
+
+    log_trafego = np.log(np.maximum(serie.to_numpy(), 1.0))
+    dia_semana = serie.index.dayofweek.to_numpy()
+    sazonal = np.zeros(7)
+    if len(serie) >= 14:
+        medias = pd.Series(log_trafego).groupby(dia_semana).mean()
+        sazonal[medias.index.to_numpy()] = medias.to_numpy() - medias.mean()
+
+    recente = slice(max(len(serie) - janela, 0), None)
+    dessazonalizado = log_trafego[recente] - sazonal[dia_semana[recente]]
+    nivel_log = dessazonalizado.mean()
+    sigma = dessazonalizado.std(ddof=1) if len(dessazonalizado) > 1 else 0.0
+    return {
+        'nivel_log': float(nivel_log),
+        'sazonal': sazonal,
+        'sigma': float(sigma),
+        'erro_nivel': float(sigma / np.sqrt(len(dessazonalizado))),
+        'ultima_data': serie.index[-1].date(),
+    }
+
+
+def _dia_alcance(acumulado, alvos):
+    """Primeiro dia (1 = primeiro dia do teste) em que cada caminho atinge cada alvo; inf se não atingir"""
+    horizonte = acumulado.shape[-1]
+    dias = np.stack([(acumulado < alvo).sum(axis=-1) + 1.0 for alvo in np.atleast_1d(alvos)], axis=-1)
+    dias[dias > horizonte] = np.inf
+    return dias
+
+
+@medir()
+def prever_duracao(n_controle, n_variacao, split_ratio=0.5, trafego_diario=None, historico=None,
+                   dias_rampa=0, alocacao=1.0, data_inicio=None, caminhos=2000, semente=0,
+                   horizonte_max=730, quantis=QUANTIS_PADRAO):
+    """Projeta o dia em que cada grupo atinge sua amostra, com bandas de incerteza.
+
+    Usa `historico` (Series diária) quando houver; senão, tráfego constante de
+    `trafego_diario`, sem incerteza. Do tráfego do dia, a fração `alocacao`
+    entra no teste, crescendo linearmente durante `dias_rampa` dias, e a
+    fração `split_ratio` vai para o controle. `n_controle` e `n_variacao`
+    aceitam arrays (vários planos avaliados sobre os mesmos caminhos).
+
+    Retorna quantis (`dias_controle`, `dias_variacao`, `dias` = quando os dois
+    terminam, com formato (planos, quantis)), `prob_concluir` dentro do
+    horizonte, os dias de cada caminho em `dias_caminhos` e os quantis do
+    total acumulado por dia em `acumulado_quantis`.
+    """
+    if historico is not None:
+        modelo = ajustar_trafego(historico)
+    elif trafego_diario is not None and trafego_diario > 0:
+        modelo = {'nivel_log': float(np.log(trafego_diario)), 'sazonal': np.zeros(7), 'sigma': 0.0,
+                  'erro_nivel': 0.0, 'ultima_data': None}
+    else:
+        raise ValueError("Informe o histórico de tráfego ou um tráfego diário positivo")
+
+    if data_inicio is None:
+        data_inicio = (modelo['ultima_data'] + datetime.timedelta(days=1)
+                       if modelo['ultima_data'] is not None else datetime.date.today())
+    n_controle = np.atleast_1d(np.asarray(n_controle, dtype=float))
+    n_variacao = np.atleast_1d(np.asarray(n_variacao, dtype=float))
+
+    # Horizonte: folga sobre a estimativa pelo nível médio, limitado a horizonte_max
+    trafego_medio = alocacao * np.exp(modelo['nivel_log'] + modelo['sigma'] ** 2 / 2)
+    estimativa = max(n_controle.max() / split_ratio, n_variacao.max() / (1 - split_ratio)) / trafego_medio
+    horizonte = int(min(horizonte_max, np.ceil(1.5 * (estimativa + dias_rampa)) + 14))
+
+    incerto = modelo['sigma'] > 0
+    caminhos = caminhos if incerto else 1
+    rng = np.random.default_rng(semente)
+    dias_semana = (data_inicio.weekday() + np.arange(horizonte)) % 7
+    log_trafego = modelo['nivel_log'] + modelo['sazonal'][dias_semana]
+    if incerto:
+        log_trafego = (log_trafego
+                       + rng.normal(0.0, modelo['erro_nivel'], (caminhos, 1))
+                       + rng.normal(0.0, modelo['sigma'], (caminhos, horizonte)))
+    fracao = alocacao * np.minimum(1.0, np.arange(1, horizonte + 1) / (dias_rampa + 1))
+    acumulado = np.cumsum(np.exp(np.atleast_2d(log_trafego)) * fracao, axis=-1)
+
+    dias_controle = _dia_alcance(acumulado * split_ratio, n_controle)
+    dias_variacao = _dia_alcance(acumulado * (1 - split_ratio), n_variacao)
+    dias = np.maximum(dias_controle, dias_variacao)
+
+    def resumir(valores):
+        return np.quantile(valores, quantis, axis=0, method='inverted_cdf').T
+
+    return {
+        'dias': resumir(dias),
+        'dias_controle': resumir(dias_controle),
+        'dias_variacao': resumir(dias_variacao),
+        'prob_concluir': np.isfinite(dias).mean(axis=0),
+        'dias_caminhos': dias,
+        'quantis': tuple(quantis),
+        'acumulado_quantis': np.quantile(acumulado, quantis, axis=0),
+        'data_inicio': data_inicio,
+        'horizonte': horizonte,
+        'modelo': modelo,
+    }
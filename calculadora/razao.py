@@ -0,0 +1,148 @@
+"""Métricas de razão (cliques por sessão, receita por pedido) pelo método delta.
+
+As sessões de um mesmo usuário são correlacionadas, então o erro-padrão
+binomial de calcular_teste_atual, que trata cada sessão como independente,
+subestima a incerteza. Aqui o usuário é o cluster: cada um contribui com
+N (soma do numerador) e D (soma do denominador), e a variância da razão
+ΣN / ΣD sai do método delta sobre os momentos por usuário.
+
+Os momentos por variante (usuários, ΣN, ΣD, ΣN², ΣD², ΣND) se somam entre
+shards, de modo que um diretório de logs é processado em paralelo e
+combinado sem uma segunda leitura, desde que cada usuário esteja em um só
+shard (logs particionados por usuário). Quando isso não vale, os shards
+devolvem somas por usuário, que também se combinam por soma.
+"""
+import numpy as np
+
+from .ingestao import ler_em_blocos, mapear_arquivos
+from .instrumentacao import medir
+
+COLUNAS_RAZAO = ('usuarios', 'linhas', 'soma_num', 'soma_den', 'soma_num2', 'soma_den2', 'soma_num_den')
+
+
+@medir()
+def somas_por_usuario(arquivo, numerador='clicks', denominador=None, coluna_usuario='user_id',
+                      coluna_variante='variant', tamanho_lote=500_000):
+    """Somas do numerador e do denominador por (variante, usuário) em um shard.
+
+    Com `denominador=None` cada linha conta 1 (por exemplo, uma sessão).
+    Valores ausentes contam como zero.
+    """
+    import pandas as pd
+
+    colunas = [coluna_usuario, coluna_variante, numerador] + ([denominador] if denominador else [])
+    acumulado = None
+    for bloco in ler_em_blocos(arquivo, colunas, tamanho_lote):
+        partes = pd.DataFrame({
+            'num': pd.to_numeric(bloco[numerador], errors='coerce').fillna(0.0).to_numpy(dtype=float),
+            'den': (pd.to_numeric(bloco[denominador], errors='coerce').fillna(0.0).to_numpy(dtype=float)
+                    if denominador else 1.0),
+            'linhas': 1.0,
+        })
+        chaves = [bloco[coluna_variante].astype(str).to_numpy(), bloco[coluna_usuario].to_numpy()]
+        parcial = partes.groupby(chaves, sort=False).sum()
+        acumulado = parcial if acumulado is None else acumulado.add(parcial, fill_value=0.0)
+
+    if acumulado is None:
+        raise ValueError("O arquivo não contém linhas")
+    acumulado.index.names = ['variante', 'usuario']
+    return acumulado
+
+
+def momentos_razao(somas):
+    """Momentos por variante a partir das somas por usuário"""
+    import pandas as pd
+
+    num, den = somas['num'], somas['den']
+    partes = pd.DataFrame({
+        'usuarios': 1.0, 'linhas': somas['linhas'], 'soma_num': num, 'soma_den': den,
+        'soma_num2': num * num, 'soma_den2': den * den, 'soma_num_den': num * den,
+    })
+    return partes.groupby(level='variante').sum()[list(COLUNAS_RAZAO)]
+
+
+@medir()
+def estatisticas_razao(arquivo, **kwargs):
+    """Momentos por variante de um shard (válido se os usuários não se repetem em outros shards)"""
+    return momentos_razao(somas_por_usuario(arquivo, **kwargs))
+
+
+def combinar_momentos(parciais):
+    """Soma associativa de momentos (ou de somas por usuário) de shards diferentes"""
+    total = None
+    for parcial in parciais:
+        total = parcial if total is None else total.add(parcial, fill_value=0.0)
+    if total is None:
+        raise ValueError("Nenhum parcial para combinar")
+    return total.sort_index()
+
+
+@medir()
+def agregar_razao(arquivos, processos=None, usuarios_particionados=True, **kwargs):
+    """Map-reduce dos momentos de razão sobre um diretório, glob ou lista de shards.
+
+    Com `usuarios_particionados=True` cada shard já devolve os momentos por
+    variante. Com `False` os shards devolvem somas por usuário, que são
+    somadas antes dos momentos (memória proporcional ao número de usuários).
+    Os demais argumentos vão para somas_por_usuario.
+    """
+    if usuarios_particionados:
+        return combinar_momentos(mapear_arquivos(estatisticas_razao, arquivos, processos, **kwargs))
+    return momentos_razao(combinar_momentos(mapear_arquivos(somas_por_usuario, arquivos, processos, **kwargs)))
+
+
+@medir()
+def analisar_razao(momentos, controle, variacao, nivel_significancia=0.05):
+    """Teste da diferença entre as razões ΣN/ΣD de duas variantes pelo método delta.
+
+    Var(R) ≈ [var(N) - 2R cov(N, D) + R² var(D)] / (n · média(D)²), com os
+    momentos por usuário. Retorna razões, diferenças absoluta e relativa
+    (com ICs delta), z e p-valor. Quando as duas razões estão em [0, 1],
+    inclui o p-valor binomial por linha (`p_value_ingenuo`) e o efeito de
+    desenho (variância delta / variância binomial) para comparação.
+    """
+    from scipy import special
+
+    grupos = momentos.loc[[controle, variacao]]
+    n = grupos['usuarios'].to_numpy(dtype=float)
+    if np.any(n < 2):
+        raise ValueError("Cada grupo precisa de pelo menos dois usuários")
+    soma_num, soma_den = grupos['soma_num'].to_numpy(), grupos['soma_den'].to_numpy()
+    if np.any(soma_den <= 0):
+        raise ValueError("O denominador precisa ter soma positiva em cada grupo")
+
+    razao = soma_num / soma_den
+    media_num, media_den = soma_num / n, soma_den / n
+    var_num = (grupos['soma_num2'].to_numpy() - n * media_num ** 2) / (n - 1)
+    var_den = (grupos['soma_den2'].to_numpy() - n * media_den ** 2) / (n - 1)
+    cov = (grupos['soma_num_den'].to_numpy() - n * media_num * media_den) / (n - 1)
+    variancia = np.clip((var_num - 2 * razao * cov + razao ** 2 * var_den) / (n * media_den ** 2), 0, None)
+
+    z_critico = special.ndtri(1 - nivel_significancia / 2)
+    diff_abs = razao[1] - razao[0]
+    se = np.sqrt(variancia.sum())
+    z = diff_abs / se if se > 0 else 0.0
+    # Razão entre as razões: delta sobre log(R_b / R_a)
+    se_log = np.sqrt(variancia[0] / razao[0] ** 2 + variancia[1] / razao[1] ** 2) if np.all(razao > 0) else np.nan
+    resultado = {
+        'razao_a': float(razao[0]), 'razao_b': float(razao[1]),
+        'usuarios_a': int(n[0]), 'usuarios_b': int(n[1]),
+        'diff_abs': float(diff_abs),
+        'diff_rel': float(diff_abs / razao[0] * 100) if razao[0] != 0 else 0.0,
+        'z_score': float(z),
+        'p_value': float(2 * special.ndtr(-abs(z))) if z != 0 else 1.0,
+        'ci_lower': float(diff_abs - z_critico * se),
+        'ci_upper': float(diff_abs + z_critico * se),
+        'diff_rel_ci_lower': float((razao[1] / razao[0] * np.exp(-z_critico * se_log) - 1) * 100),
+        'diff_rel_ci_upper': float((razao[1] / razao[0] * np.exp(z_critico * se_log) - 1) * 100),
+        'se_delta': float(se),
+    }
+
+    if np.all((razao >= 0) & (razao <= 1)):
+        from .teste import calcular_teste_atual
+
+        ingenuo = calcular_teste_atual(soma_num[0], soma_den[0], soma_num[1], soma_den[1])
+        se_ingenuo = np.sqrt((razao * (1 - razao) / soma_den).sum())
+        resultado['p_value_ingenuo'] = ingenuo['p_value']
+        resultado['efeito_desenho'] = float((se / se_ingenuo) ** 2) if se_ingenuo > 0 else float('nan')
+    return resultado
@@ -0,0 +1,149 @@
+"""Quebra dos resultados por segmento a partir de arquivos colunares.
+
+O arquivo bruto (uma linha por usuário) passa por um único groupby até a
+célula mais fina variante × segmentos. Os cruzamentos mais grossos saem da
+soma dessas células, que são poucas, e o teste de significância é aplicado a
+todos os segmentos de uma vez, com correção para comparações múltiplas.
+"""
+import itertools
+
+from .instrumentacao import medir
+
+TOTAL = '(todos)'
+AUSENTE = '(ausente)'
+FORMATOS_PARQUET = ('.parquet', '.pq')
+FORMATOS_ARROW = ('.arrow', '.feather', '.ipc')
+
+
+def _nome(arquivo):
+    return str(getattr(arquivo, 'name', arquivo)).lower()
+
+
+def _fonte_arrow(arquivo):
+    import pyarrow as pa
+
+    if hasattr(arquivo, 'getbuffer'):
+        # Upload em memória: o Arrow lê direto do buffer existente, sem cópia
+        return pa.BufferReader(pa.py_buffer(arquivo.getbuffer()))
+    return arquivo
+
+
+def colunas_disponiveis(arquivo):
+    """Nomes das colunas do arquivo, lidos só do esquema/cabeçalho"""
+    import pandas as pd
+
+    nome = _nome(arquivo)
+    if nome.endswith(FORMATOS_PARQUET):
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(_fonte_arrow(arquivo), memory_map=True).names)
+    if nome.endswith(FORMATOS_ARROW):
+        import pyarrow as pa
+        if hasattr(arquivo, 'read'):
+            return list(pa.ipc.open_file(_fonte_arrow(arquivo)).schema.names)
+        with pa.memory_map(str(arquivo)) as mapa:
+            return list(pa.ipc.open_file(mapa).schema.names)
+    colunas = list(pd.read_csv(arquivo, nrows=0).columns)
+    if hasattr(arquivo, 'seek'):
+        arquivo.seek(0)
+    return colunas
+
+
+def _ler_colunas(arquivo, colunas, categoricas):
+    """Carrega só `colunas`; Parquet e Arrow são mapeados em memória em vez de copiados"""
+    import pandas as pd
+
+    nome = _nome(arquivo)
+    if nome.endswith(FORMATOS_PARQUET):
+        import pyarrow.parquet as pq
+        tabela = pq.read_table(_fonte_arrow(arquivo), columns=colunas, memory_map=True)
+    elif nome.endswith(FORMATOS_ARROW):
+        from pyarrow import feather
+        tabela = feather.read_table(_fonte_arrow(arquivo), columns=colunas, memory_map=True)
+    else:
+        return pd.read_csv(arquivo, usecols=colunas, dtype={c: 'category' for c in categoricas})
+    return tabela.to_pandas(strings_to_categorical=True, self_destruct=True)
+
+
+@medir()
+def agregar_por_segmento(arquivo, segmentos, coluna_variante='variant', metrica='converted', profundidade=2):
+    """Conta visitantes e conversões por variante em cada segmento.
+
+    `segmentos` são as colunas de segmentação (ex.: device, country, channel) e
+    `profundidade` é o maior número delas cruzadas entre si; o total geral
+    também é incluído. Retorna um DataFrame indexado por `dimensoes` e pelas
+    colunas de segmento (com TOTAL nas que não fazem parte do cruzamento) e
+    com colunas ('n' | 'conversoes', variante).
+    """
+    import pandas as pd
+
+    segmentos = list(segmentos)
+    chaves = [coluna_variante] + segmentos
+    df = _ler_colunas(arquivo, chaves + [metrica], chaves)
+    if df.empty:
+        raise ValueError("O arquivo não contém eventos")
+
+    # Única passada sobre os dados brutos, até a célula mais fina
+    valores = pd.to_numeric(df[metrica], errors='coerce').fillna(0.0)
+    celulas = valores.groupby([df[c] for c in chaves], observed=True, dropna=False, sort=False).agg(['size', 'sum'])
+    del df, valores
+    celulas.columns = ['n', 'conversoes']
+    celulas = celulas.reset_index()
+    for coluna in chaves:
+        celulas[coluna] = celulas[coluna].astype(object).where(celulas[coluna].notna(), AUSENTE).astype(str)
+
+    partes = []
+    for tamanho in range(min(profundidade, len(segmentos)) + 1):
+        for cruzamento in itertools.combinations(segmentos, tamanho):
+            parte = celulas.groupby([coluna_variante, *cruzamento], sort=False)[['n', 'conversoes']].sum().reset_index()
+            for coluna in segmentos:
+                if coluna not in cruzamento:
+                    parte[coluna] = TOTAL
+            parte['dimensoes'] = ' × '.join(cruzamento) or TOTAL
+            partes.append(parte)
+
+    longo = pd.concat(partes, ignore_index=True)
+    return longo.pivot_table(index=['dimensoes', *segmentos], columns=coluna_variante,
+                             values=['n', 'conversoes'], aggfunc='sum', fill_value=0)
+
+
+@medir()
+def testar_segmentos(agregado, controle, variacao, correcao='bh', nivel_significancia=0.05, minimo_visitantes=1,
+                     metodo='auto'):
+    """Aplica calcular_teste_exato a todos os segmentos de uma vez.
+
+    Segmentos com menos de `minimo_visitantes` em algum dos grupos ficam de
+    fora. Com `metodo='auto'`, segmentos com contagens pequenas recebem um
+    p-valor exato. A correção é feita sobre todos os segmentos testados, de
+    todos os cruzamentos, como uma única família de comparações.
+    """
+    import pandas as pd
+
+    from .exato import calcular_teste_exato
+    from .multivariante import ajustar_p_valores
+
+    entradas = pd.DataFrame({
+        'conversions_a': agregado[('conversoes', controle)],
+        'visitors_a': agregado[('n', controle)],
+        'conversions_b': agregado[('conversoes', variacao)],
+        'visitors_b': agregado[('n', variacao)],
+    })
+    minimo = max(minimo_visitantes, 1)
+    entradas = entradas[(entradas['visitors_a'] >= minimo) & (entradas['visitors_b'] >= minimo)]
+
+    resultado = entradas.assign(**calcular_teste_exato(**{c: entradas[c].to_numpy() for c in entradas},
+                                                        metodo=metodo))
+    resultado['p_ajustado'] = ajustar_p_valores(resultado['p_value'].to_numpy(), correcao)
+    resultado['significativo'] = resultado['p_ajustado'] < nivel_significancia
+    return resultado
+
+
+def matriz_segmentos(resultado, linha, coluna=None, valor='diff_rel'):
+    """Tabela linha × coluna de um cruzamento, pronta para um mapa de calor"""
+    segmentos = list(resultado.index.names[1:])
+    dimensoes = ' × '.join(s for s in segmentos if s in (linha, coluna))
+    if dimensoes not in resultado.index.get_level_values('dimensoes'):
+        raise ValueError(f"O cruzamento {dimensoes} não foi calculado")
+    parte = resultado.xs(dimensoes, level='dimensoes').reset_index()
+    if coluna is None or coluna == linha:
+        return parte.set_index(linha)[[valor]]
+    return parte.pivot(index=linha, columns=coluna, values=valor)
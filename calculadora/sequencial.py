@@ -0,0 +1,100 @@
+"""Teste sequencial sempre válido (mSPRT) para acompanhar testes em andamento.
+
+Implementa o mSPRT com mistura normal sobre a diferença de proporções
+(Johari et al., "Peeking at A/B Tests", 2017). O estado guarda apenas os
+totais acumulados e o menor p-valor já visto, então cada nova parcial de
+contagens é incorporada em O(1), sem reprocessar o histórico.
+"""
+import math
+from dataclasses import dataclass, field
+
+import numpy as np
+
+
+@dataclass
+class EstadoSequencial:
+    tau2: float
+    alpha: float = 0.05
+    conversions_a: float = 0.0
+    visitors_a: float = 0.0
+    conversions_b: float = 0.0
+    visitors_b: float = 0.0
+    p_valor: float = 1.0
+    z_score: float = 0.0
+    limite_z: float = math.inf
+    olhadas: int = 0
+    guardar_trajetoria: bool = True
+    trajetoria: list = field(default_factory=list)
+
+    @property
+    def significativo(self):
+        return self.p_valor <= self.alpha
+
+
+def tau2_padrao(taxa_base, melhoria_relativa):
+    """Variância da mistura centrada no efeito absoluto que se espera detectar"""
+    return (taxa_base * melhoria_relativa) ** 2
+
+
+def estatisticas_msprt(conversions_a, visitors_a, conversions_b, visitors_b, tau2, alpha=0.05):
+    """Retorna (z, log da razão de verossimilhança misturada, limite de |z|).
+
+    Aceita escalares ou arrays; sem variância estimada retorna (0, 0, inf).
+    """
+    escalar = all(np.ndim(v) == 0 for v in (conversions_a, visitors_a, conversions_b, visitors_b))
+    conversions_a, visitors_a, conversions_b, visitors_b = (
+        np.asarray(v, dtype=float) for v in (conversions_a, visitors_a, conversions_b, visitors_b)
+    )
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_a = conversions_a / visitors_a
+        p_b = conversions_b / visitors_b
+        variancia = p_a * (1 - p_a) / visitors_a + p_b * (1 - p_b) / visitors_b
+        valida = variancia > 0
+        z = np.where(valida, (p_b - p_a) / np.sqrt(variancia), 0.0)
+        soma = variancia + tau2
+        log_lambda = np.where(valida, 0.5 * np.log(variancia / soma) + z * z * tau2 / (2 * soma), 0.0)
+        limite_z = np.where(valida, np.sqrt(soma / tau2 * (2 * np.log(1 / alpha) + np.log(soma / variancia))),
+                            np.inf)
+    if escalar:
+        return float(z), float(log_lambda), float(limite_z)
+    return z, log_lambda, limite_z
+
+
+def atualizar_sequencial(estado, conversions_a, visitors_a, conversions_b, visitors_b):
+    """Incorpora uma nova parcial (incrementos de contagem) ao estado, em O(1)"""
+    estado.conversions_a += conversions_a
+    estado.visitors_a += visitors_a
+    estado.conversions_b += conversions_b
+    estado.visitors_b += visitors_b
+    estado.olhadas += 1
+    if estado.visitors_a <= 0 or estado.visitors_b <= 0:
+        return estado
+
+    z, log_lambda, limite_z = estatisticas_msprt(
+        estado.conversions_a, estado.visitors_a, estado.conversions_b, estado.visitors_b,
+        estado.tau2, estado.alpha
+    )
+    # p-valor sempre válido: nunca aumenta entre olhadas
+    estado.p_valor = min(estado.p_valor, math.exp(-max(log_lambda, 0.0)))
+    estado.z_score = z
+    estado.limite_z = limite_z
+    if estado.guardar_trajetoria:
+        estado.trajetoria.append({
+            'olhada': estado.olhadas,
+            'visitantes': estado.visitors_a + estado.visitors_b,
+            'z_score': z,
+            'limite_z': limite_z,
+            'p_valor': estado.p_valor,
+        })
+    return estado
+
+
+def registrar_acumulado(estado, conversions_a, visitors_a, conversions_b, visitors_b):
+    """Atualiza o estado a partir de totais acumulados, usando só a diferença para o último registro"""
+    incrementos = (
+        conversions_a - estado.conversions_a, visitors_a - estado.visitors_a,
+        conversions_b - estado.conversions_b, visitors_b - estado.visitors_b,
+    )
+    if min(incrementos) < 0:
+        raise ValueError("Os totais acumulados não podem diminuir entre olhadas")
+    return atualizar_sequencial(estado, *incrementos)
@@ -0,0 +1,300 @@
+"""API HTTP/JSON assíncrona para os cálculos de amostra e significância.
+
+Uso:
+    python -m calculadora servir --porta 8000 --processos 4
+
+Rotas (todas recebem e devolvem JSON):
+    POST /amostra       parâmetros de calcular_tamanho_amostra_ab
+    POST /teste         contagens de calcular_teste_atual
+    POST /amostra/lote  os mesmos parâmetros como listas (broadcasting)
+    POST /teste/lote    as mesmas contagens como listas
+    GET  /saude         estado do serviço e contadores de cache
+
+Requisições escalares que chegam juntas são agrupadas em uma única chamada
+vetorizada no próximo ciclo do event loop, requisições idênticas em andamento
+compartilham o mesmo resultado e as respostas ficam em um cache LRU já
+serializadas. Lotes grandes vão para um pool de processos para não travar o
+event loop. Só usa a biblioteca padrão além do NumPy/SciPy.
+"""
+import asyncio
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .cache import CacheLRU, normalizar
+
+PARAMETROS = {
+    'amostra': {'taxa_base': None, 'melhoria_minima_detectar': None, 'poder_estatistico': 0.80,
+                'nivel_significancia': 0.05, 'split_ratio': 0.5},
+    'teste': {'conversions_a': None, 'visitors_a': None, 'conversions_b': None, 'visitors_b': None},
+}
+LIMITE_CORPO = 64 * 1024 * 1024
+LIMITE_LOTE_EM_LINHA = 20_000
+LIMITE_BYTES_CACHE = 1 << 20
+STATUS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+          413: 'Payload Too Large', 500: 'Internal Server Error'}
+
+
+class ErroRequisicao(ValueError):
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def _para_json(valor):
+    """Arrays viram listas e valores não finitos viram null (JSON não tem NaN)"""
+    if isinstance(valor, dict):
+        return {k: _para_json(v) for k, v in valor.items()}
+    if isinstance(valor, np.ndarray):
+        if valor.dtype.kind == 'f':
+            return [None if not math.isfinite(v) else v for v in valor.tolist()]
+        return valor.tolist()
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def _validar(tipo, corpo, lote):
+    if not isinstance(corpo, dict):
+        raise ErroRequisicao("O corpo deve ser um objeto JSON")
+    desconhecidos = set(corpo) - set(PARAMETROS[tipo])
+    if desconhecidos:
+        raise ErroRequisicao(f"Parâmetros desconhecidos: {', '.join(sorted(desconhecidos))}")
+    entrada = {}
+    for nome, padrao in PARAMETROS[tipo].items():
+        valor = corpo.get(nome, padrao)
+        if valor is None:
+            raise ErroRequisicao(f"Parâmetro obrigatório ausente: {nome}")
+        try:
+            valor = np.asarray(valor, dtype=float)
+        except (TypeError, ValueError):
+            raise ErroRequisicao(f"{nome} deve ser numérico") from None
+        if not lote and valor.ndim != 0:
+            raise ErroRequisicao(f"{nome} deve ser um número; use /{tipo}/lote para listas")
+        if valor.ndim > 1 or not np.all(np.isfinite(valor)):
+            raise ErroRequisicao(f"{nome} deve ser um número ou uma lista de números finitos")
+        entrada[nome] = valor
+    try:
+        return dict(zip(entrada, np.broadcast_arrays(*entrada.values())))
+    except ValueError:
+        raise ErroRequisicao("As listas precisam ter o mesmo tamanho (ou tamanho 1)") from None
+
+
+def calcular_lote(tipo, entrada):
+    """Executa o cálculo vetorizado; roda no processo principal ou em um worker"""
+    entrada = {n: np.atleast_1d(v) for n, v in entrada.items()}
+    if tipo == 'amostra':
+        from .amostra import calcular_tamanho_amostra_ab_lote
+        return calcular_tamanho_amostra_ab_lote(**entrada)
+    from .teste import calcular_teste_atual
+    return calcular_teste_atual(**entrada)
+
+
+def calcular_lote_json(tipo, entrada):
+    """calcular_lote já serializado, para que o worker devolva bytes e não arrays"""
+    return json.dumps(_para_json(calcular_lote(tipo, entrada)), allow_nan=False).encode()
+
+
+def _linha(resultado, i):
+    return {k: v[i].item() for k, v in resultado.items()}
+
+
+class Agrupador:
+    """Junta requisições escalares do mesmo ciclo do event loop em um único lote"""
+
+    def __init__(self, tipo, max_lote=4096):
+        self.tipo = tipo
+        self.max_lote = max_lote
+        self._pendentes = []
+        self.lotes = 0
+
+    def submeter(self, entrada):
+        futuro = asyncio.get_running_loop().create_future()
+        self._pendentes.append((entrada, futuro))
+        if len(self._pendentes) == 1:
+            asyncio.get_running_loop().call_soon(self._executar)
+        elif len(self._pendentes) >= self.max_lote:
+            self._executar()
+        return futuro
+
+    def _executar(self):
+        pendentes, self._pendentes = self._pendentes, []
+        if not pendentes:
+            return
+        self.lotes += 1
+        nomes = PARAMETROS[self.tipo]
+        entrada = {n: np.array([e[n] for e, _ in pendentes], dtype=float) for n in nomes}
+        try:
+            resultado = calcular_lote(self.tipo, entrada)
+            linhas = [_linha(resultado, i) for i in range(len(pendentes))]
+        except ValueError:
+            # Um elemento inválido derruba o lote: refaz um a um para isolar o erro
+            for unitaria, futuro in pendentes:
+                try:
+                    valor = _linha(calcular_lote(self.tipo, unitaria), 0)
+                except Exception as erro:
+                    if not futuro.done():
+                        futuro.set_exception(ErroRequisicao(str(erro)) if isinstance(erro, ValueError) else erro)
+                else:
+                    if not futuro.done():
+                        futuro.set_result(valor)
+            return
+        except Exception as erro:
+            # Roda dentro de um callback do loop: sem isso, todas as requisições do lote ficariam penduradas
+            for _, futuro in pendentes:
+                if not futuro.done():
+                    futuro.set_exception(erro)
+            return
+        for (_, futuro), linha in zip(pendentes, linhas):
+            if not futuro.done():
+                futuro.set_result(linha)
+
+
+class ServicoCalculadora:
+    """Roteamento, coalescência, cache de respostas e pool de workers"""
+
+    def __init__(self, processos=None, max_itens_cache=8192, ttl_cache=3600.0):
+        self.processos = processos if processos is not None else (os.cpu_count() or 1)
+        self.cache = CacheLRU(max_itens=max_itens_cache, ttl=ttl_cache)
+        self.agrupadores = {tipo: Agrupador(tipo) for tipo in PARAMETROS}
+        self._em_andamento = {}
+        self._pool = ProcessPoolExecutor(self.processos) if self.processos > 1 else None
+        self.requisicoes = 0
+
+    def fechar(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+
+    async def _calcular(self, tipo, lote, entrada):
+        if not lote:
+            valor = await self.agrupadores[tipo].submeter(entrada)
+            return json.dumps(_para_json(valor), allow_nan=False).encode()
+        tamanho = max(np.size(v) for v in entrada.values())
+        try:
+            if self._pool is not None and tamanho > LIMITE_LOTE_EM_LINHA:
+                return await asyncio.get_running_loop().run_in_executor(
+                    self._pool, calcular_lote_json, tipo, entrada
+                )
+            return calcular_lote_json(tipo, entrada)
+        except ValueError as erro:
+            raise ErroRequisicao(str(erro)) from None
+
+    async def responder(self, tipo, lote, corpo):
+        """Resposta JSON já serializada, vinda do cache quando possível"""
+        entrada = _validar(tipo, corpo, lote)
+        chave = (tipo, lote, normalizar(entrada))
+        futuro = self._em_andamento.get(chave)
+        if futuro is None:
+            # Requisições idênticas que chegam enquanto esta calcula esperam o mesmo futuro
+            async def obter():
+                try:
+                    valor = self.cache.obter(chave)
+                    if valor is None:
+                        valor = await self._calcular(tipo, lote, entrada)
+                        # Respostas de lotes enormes não ocupam o cache
+                        if len(valor) <= LIMITE_BYTES_CACHE:
+                            self.cache.guardar(chave, valor)
+                    return valor
+                finally:
+                    del self._em_andamento[chave]
+
+            futuro = self._em_andamento[chave] = asyncio.ensure_future(obter())
+        return await asyncio.shield(futuro)
+
+    def saude(self):
+        return json.dumps({
+            'status': 'ok', 'processos': self.processos, 'requisicoes': self.requisicoes,
+            'lotes_agrupados': {t: a.lotes for t, a in self.agrupadores.items()},
+            'cache': self.cache.estatisticas(),
+        }).encode()
+
+    async def tratar(self, metodo, caminho, corpo):
+        """Retorna (status, corpo JSON em bytes)"""
+        self.requisicoes += 1
+        if caminho == '/saude':
+            return (200, self.saude()) if metodo == 'GET' else (405, b'{"erro": "use GET"}')
+        partes = caminho.strip('/').split('/')
+        if partes[0] not in PARAMETROS or len(partes) > 2 or (len(partes) == 2 and partes[1] != 'lote'):
+            return 404, json.dumps({'erro': f"rota inexistente: {caminho}"}).encode()
+        if metodo != 'POST':
+            return 405, b'{"erro": "use POST"}'
+        try:
+            dados = json.loads(corpo or b'{}')
+            return 200, await self.responder(partes[0], len(partes) == 2, dados)
+        except json.JSONDecodeError as erro:
+            return 400, json.dumps({'erro': f"JSON inválido: {erro}"}).encode()
+        except ErroRequisicao as erro:
+            return erro.status, json.dumps({'erro': str(erro)}).encode()
+
+
+async def _ler_requisicao(leitor):
+    linha = await leitor.readline()
+    if not linha:
+        return None
+    try:
+        metodo, alvo, versao = linha.decode('latin-1').split()
+    except ValueError:
+        raise ErroRequisicao("Linha de requisição inválida") from None
+    cabecalhos = {}
+    while True:
+        linha = await leitor.readline()
+        if linha in (b'\r\n', b'\n', b''):
+            break
+        nome, _, valor = linha.decode('latin-1').partition(':')
+        cabecalhos[nome.strip().lower()] = valor.strip()
+    tamanho = int(cabecalhos.get('content-length', 0) or 0)
+    if tamanho > LIMITE_CORPO:
+        raise ErroRequisicao("Corpo da requisição grande demais", 413)
+    corpo = await leitor.readexactly(tamanho) if tamanho else b''
+    manter = (cabecalhos.get('connection', '').lower() != 'close') and versao != 'HTTP/1.0'
+    return metodo.upper(), alvo.split('?', 1)[0], corpo, manter
+
+
+def _resposta(status, corpo, manter):
+    cabecalho = (f"HTTP/1.1 {status} {STATUS.get(status, '')}\r\n"
+                 f"Content-Type: application/json\r\nContent-Length: {len(corpo)}\r\n"
+                 f"Connection: {'keep-alive' if manter else 'close'}\r\n\r\n")
+    return cabecalho.encode('latin-1') + corpo
+
+
+async def servir(host='127.0.0.1', porta=8000, processos=None, pronto=None):
+    """Sobe o servidor HTTP/1.1 (keep-alive) e atende até ser cancelado"""
+    servico = ServicoCalculadora(processos)
+
+    async def conexao(leitor, escritor):
+        try:
+            while True:
+                try:
+                    requisicao = await _ler_requisicao(leitor)
+                except ErroRequisicao as erro:
+                    escritor.write(_resposta(erro.status, json.dumps({'erro': str(erro)}).encode(), False))
+                    break
+                if requisicao is None:
+                    break
+                metodo, caminho, corpo, manter = requisicao
+                try:
+                    status, resposta = await servico.tratar(metodo, caminho, corpo)
+                except Exception as erro:  # noqa: BLE001 - a conexão não pode cair por um erro de cálculo
+                    status, resposta = 500, json.dumps({'erro': f"{type(erro).__name__}: {erro}"}).encode()
+                escritor.write(_resposta(status, resposta, manter))
+                await escritor.drain()
+                if not manter:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    servidor = await asyncio.start_server(conexao, host, porta, reuse_address=True)
+    if pronto is not None:
+        pronto(servidor.sockets[0].getsockname()[1])
+    try:
+        async with servidor:
+            await servidor.serve_forever()
+    finally:
+        servico.fechar()
@@ -0,0 +1,80 @@
+"""Simulação Monte Carlo do poder e do erro tipo I de um plano de teste A/B.
+
+As réplicas são divididas em blocos de tamanho fixo, cada um com sua própria
+semente derivada de `np.random.SeedSequence`, então o resultado depende só da
+semente e do tamanho do bloco, não do número de processos.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .instrumentacao import medir
+from .teste import calcular_teste_atual
+
+
+def _rejeicoes_bloco(tarefa):
+    semente, replicas, taxa_a, taxa_b, n_a, n_b, alpha = tarefa
+    rng = np.random.default_rng(semente)
+    conversoes_a = rng.binomial(n_a, taxa_a, replicas)
+    conversoes_b = rng.binomial(n_b, taxa_b, replicas)
+    p_value = calcular_teste_atual(conversoes_a, n_a, conversoes_b, n_b)['p_value']
+    return int(np.count_nonzero(p_value < alpha))
+
+
+def intervalo_wilson(sucessos, n, confianca=0.95):
+    """Intervalo de Wilson para uma proporção estimada por simulação"""
+    from scipy import special
+
+    z = special.ndtri(0.5 + confianca / 2)
+    p = sucessos / n
+    centro = (p + z**2 / (2 * n)) / (1 + z**2 / n)
+    margem = z * np.sqrt(p * (1 - p) / n + z**2 / (4 * n**2)) / (1 + z**2 / n)
+    return float(centro - margem), float(centro + margem)
+
+
+@medir()
+def simular_poder(taxa_base, taxa_variacao, n_controle, n_variacao, nivel_significancia=0.05,
+                  replicas=1_000_000, semente=None, processos=None, tamanho_bloco=250_000):
+    """Estima por simulação o poder e o erro tipo I do teste de calcular_teste_atual.
+
+    Para cada réplica sorteia conversões binomiais nos dois grupos e aplica o
+    mesmo teste z usado no app: com `taxa_variacao` para o poder e com
+    `taxa_base` nos dois grupos para o erro tipo I. Com `processos` maior que 1
+    os blocos são distribuídos em um pool de processos.
+    """
+    n_blocos = int(np.ceil(replicas / tamanho_bloco))
+    tamanhos = [tamanho_bloco] * (n_blocos - 1) + [replicas - tamanho_bloco * (n_blocos - 1)]
+    sementes = np.random.SeedSequence(semente).spawn(2 * n_blocos)
+
+    tarefas = []
+    for cenario, taxa_b in enumerate((taxa_variacao, taxa_base)):
+        for bloco, tamanho in enumerate(tamanhos):
+            tarefas.append((sementes[cenario * n_blocos + bloco], tamanho, taxa_base, taxa_b,
+                            int(n_controle), int(n_variacao), nivel_significancia))
+
+    processos = min(processos or os.cpu_count() or 1, len(tarefas))
+    if processos > 1:
+        with ProcessPoolExecutor(max_workers=processos) as executor:
+            rejeicoes = list(executor.map(_rejeicoes_bloco, tarefas))
+    else:
+        rejeicoes = [_rejeicoes_bloco(t) for t in tarefas]
+
+    rejeicoes_h1 = sum(rejeicoes[:n_blocos])
+    rejeicoes_h0 = sum(rejeicoes[n_blocos:])
+    return {
+        'poder': rejeicoes_h1 / replicas,
+        'poder_ic': intervalo_wilson(rejeicoes_h1, replicas),
+        'erro_tipo_i': rejeicoes_h0 / replicas,
+        'erro_tipo_i_ic': intervalo_wilson(rejeicoes_h0, replicas),
+        'replicas': replicas,
+    }
+
+
+def simular_plano(resultado_plano, **kwargs):
+    """Simula um plano retornado por calcular_tamanho_amostra_ab"""
+    return simular_poder(
+        resultado_plano['taxa_base'], resultado_plano['taxa_variacao'],
+        resultado_plano['n_controle'], resultado_plano['n_variacao'],
+        nivel_significancia=resultado_plano['nivel_significancia'], **kwargs
+    )
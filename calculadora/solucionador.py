@@ -0,0 +1,222 @@
+"""Solucionador de tamanho de amostra e de efeito mínimo detectável.
+
+A fórmula fechada de calcular_tamanho_amostra_ab usa uma variância agrupada
+única e depois divide o n por grupo pelo split, o que superdimensiona os dois
+grupos quando o split não é 50/50. Aqui o n total é procurado diretamente: a
+função de poder é avaliada com as variâncias de cada grupo e a alocação
+desigual, e a raiz é encontrada por bisseção com intervalo garantido,
+vetorizada sobre todos os cenários de uma vez.
+"""
+import numpy as np
+
+from .instrumentacao import medir
+
+VARIANCIAS = ('agrupada', 'nao_agrupada')
+LIMITE_CELULAS = 1 << 20
+
+
+def _taxa_variacao(taxa_base, melhoria):
+    # Mesma regra do app: melhoria maior que a taxa base é relativa
+    return np.where(melhoria > taxa_base, taxa_base * (1 + melhoria), taxa_base + melhoria)
+
+
+def _dividir(n_total, split_ratio):
+    n_controle = np.clip(np.rint(n_total * split_ratio), 1, None)
+    return n_controle, np.clip(n_total - n_controle, 1, None)
+
+
+def poder_teste(taxa_base, taxa_variacao, n_controle, n_variacao, nivel_significancia=0.05, variancia='agrupada'):
+    """Poder bicaudal aproximado do teste z de duas proporções (vetorizado).
+
+    Com `variancia='agrupada'` o teste sob H0 usa a proporção agrupada, como
+    calcular_teste_atual; com `'nao_agrupada'` usa as variâncias de cada grupo.
+    """
+    from scipy import special
+
+    if variancia not in VARIANCIAS:
+        raise ValueError(f"variancia deve ser uma de {VARIANCIAS}")
+    p_a, p_b = np.asarray(taxa_base, dtype=float), np.asarray(taxa_variacao, dtype=float)
+    n_a, n_b = np.asarray(n_controle, dtype=float), np.asarray(n_variacao, dtype=float)
+
+    se_h1 = np.sqrt(p_a * (1 - p_a) / n_a + p_b * (1 - p_b) / n_b)
+    if variancia == 'agrupada':
+        p_agrupada = (n_a * p_a + n_b * p_b) / (n_a + n_b)
+        se_h0 = np.sqrt(p_agrupada * (1 - p_agrupada) * (1 / n_a + 1 / n_b))
+    else:
+        se_h0 = se_h1
+
+    z_alpha = special.ndtri(1 - np.asarray(nivel_significancia, dtype=float) / 2)
+    delta = p_b - p_a
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (special.ndtr((delta - z_alpha * se_h0) / se_h1)
+                + special.ndtr((-delta - z_alpha * se_h0) / se_h1))
+
+
+def poder_exato(taxa_base, taxa_variacao, n_controle, n_variacao, nivel_significancia=0.05, caudas=10.0):
+    """Poder exato (binomial) do teste de calcular_teste_atual (vetorizado).
+
+    Para cada número de conversões do controle x_a, o teste z agrupado rejeita
+    H0 quando z² > c², uma desigualdade quadrática em x_b: rejeita fora do
+    intervalo entre as duas raízes. O poder é a soma, sobre x_a, de
+    P(x_a) × (cauda inferior + cauda superior da binomial de x_b), com x_a
+    restrito a `caudas` desvios-padrão em torno da média (a massa ignorada é
+    desprezível). Custo proporcional ao suporte de x_a em cada cenário.
+    """
+    from scipy import special, stats
+
+    p_a, p_b, n_a, n_b, alpha = (np.ravel(v) for v in np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (taxa_base, taxa_variacao, n_controle, n_variacao,
+                                                nivel_significancia))))
+    forma = np.broadcast_shapes(*(np.shape(v) for v in (taxa_base, taxa_variacao, n_controle, n_variacao,
+                                                         nivel_significancia)))
+    n_a, n_b = np.rint(n_a), np.rint(n_b)
+    desvio = np.sqrt(n_a * p_a * (1 - p_a))
+    inicio = np.clip(np.floor(n_a * p_a - caudas * desvio - 1), 0, None)
+    fim = np.minimum(n_a, np.ceil(n_a * p_a + caudas * desvio + 1))
+
+    # Em u = x_b / n_b: (u - x_a/n_a)² - c² (1/n_a + 1/n_b) p(1 - p) > 0, com p = (x_a + n_b u) / N
+    total = n_a + n_b
+    c2k = special.ndtri(1 - alpha / 2) ** 2 * (1 / n_a + 1 / n_b)
+    s = n_b / total
+    poder = np.empty(len(p_a))
+    largura = int(np.max(fim - inicio)) + 1
+    passo = max(1, LIMITE_CELULAS // largura)
+    for i in range(0, len(p_a), passo):
+        bloco = slice(i, i + passo)
+        x_a = inicio[bloco, None] + np.arange(largura)
+        validos = x_a <= fim[bloco, None]
+        x_a = np.minimum(x_a, fim[bloco, None])
+        q_a, t = x_a / n_a[bloco, None], x_a / total[bloco, None]
+        c2k_b, s_b, n_b_b, p_b_b = (v[bloco, None] for v in (c2k, s, n_b, p_b))
+        a = 1 + c2k_b * s_b ** 2
+        b = -2 * q_a - c2k_b * s_b * (1 - 2 * t)
+        c = q_a ** 2 - c2k_b * t * (1 - t)
+        raiz = np.sqrt(np.clip(b ** 2 - 4 * a * c, 0, None))
+        # x_b rejeita estritamente abaixo da menor raiz ou acima da maior
+        abaixo = np.ceil(n_b_b * (-b - raiz) / (2 * a)) - 1
+        acima = np.floor(n_b_b * (-b + raiz) / (2 * a)) + 1
+        rejeicao = stats.binom.cdf(abaixo, n_b_b, p_b_b) + stats.binom.sf(acima - 1, n_b_b, p_b_b)
+        pmf_a = np.where(validos, stats.binom.pmf(x_a, n_a[bloco, None], p_a[bloco, None]), 0.0)
+        poder[bloco] = np.sum(pmf_a * rejeicao, axis=1)
+    poder = poder.reshape(forma)
+    return float(poder) if poder.ndim == 0 else poder
+
+
+def _bissecao_inteira(atinge, inferior, superior):
+    """Menor inteiro em (inferior, superior] com atinge(n) verdadeiro, elemento a elemento"""
+    while np.any(superior - inferior > 1):
+        meio = np.floor((inferior + superior) / 2)
+        ok = atinge(meio)
+        superior = np.where(ok, meio, superior)
+        inferior = np.where(ok, inferior, meio)
+    return superior
+
+
+@medir()
+def resolver_tamanho_amostra(taxa_base, melhoria_minima_detectar, poder_estatistico=0.80, nivel_significancia=0.05,
+                             split_ratio=0.5, variancia='nao_agrupada', exato=False):
+    """Menor n total que atinge o poder desejado, para um ou vários cenários.
+
+    Aceita escalares ou arrays (broadcasting) e retorna as mesmas chaves de
+    calcular_tamanho_amostra_ab. Com `exato=True` o poder é o binomial exato
+    (poder_exato), resolvido para todos os cenários de uma vez a partir da
+    solução aproximada; como o poder exato oscila levemente com n, o resultado
+    é o n encontrado pela bisseção.
+    """
+    escalar = all(np.ndim(v) == 0 for v in (taxa_base, melhoria_minima_detectar, poder_estatistico,
+                                            nivel_significancia, split_ratio))
+    taxa_base, melhoria, poder, alpha, split = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in
+          (taxa_base, melhoria_minima_detectar, poder_estatistico, nivel_significancia, split_ratio))
+    )
+    taxa_variacao = _taxa_variacao(taxa_base, melhoria)
+    if np.any(taxa_variacao == taxa_base) or np.any(taxa_variacao >= 1):
+        raise ValueError("Há combinações com efeito nulo ou taxa da variação fora de (0, 1)")
+
+    def atinge(n_total):
+        n_a, n_b = _dividir(n_total, split)
+        return poder_teste(taxa_base, taxa_variacao, n_a, n_b, alpha, variancia) >= poder
+
+    # Expande o limite superior até que todos os cenários atinjam o poder
+    inferior = np.full(taxa_base.shape, 2.0)
+    superior = np.full(taxa_base.shape, 64.0)
+    while not np.all(ok := atinge(superior)):
+        inferior = np.where(ok, inferior, superior)
+        superior = np.where(ok, superior, superior * 2)
+    n_total = _bissecao_inteira(atinge, inferior, superior)
+
+    if exato:
+        def atinge_exato(n_total):
+            n_a, n_b = _dividir(n_total, split)
+            return poder_exato(taxa_base, taxa_variacao, n_a, n_b, alpha) >= poder
+
+        # Intervalo a partir da solução aproximada: o inferior precisa falhar e o superior atingir
+        inferior, superior = np.maximum(np.floor(n_total / 2), 2.0), n_total
+        while np.any(ok := atinge_exato(inferior) & (inferior > 2)):
+            superior = np.where(ok, inferior, superior)
+            inferior = np.where(ok, np.maximum(np.floor(inferior / 2), 2.0), inferior)
+        while not np.all(ok := atinge_exato(superior)):
+            inferior = np.where(ok, inferior, superior)
+            superior = np.where(ok, superior, superior * 2)
+        n_total = _bissecao_inteira(atinge_exato, inferior, superior)
+
+    n_controle, n_variacao = _dividir(n_total, split)
+    effect_size = taxa_variacao - taxa_base
+    resultado = {
+        'n_controle': n_controle.astype(np.int64),
+        'n_variacao': n_variacao.astype(np.int64),
+        'n_total': (n_controle + n_variacao).astype(np.int64),
+        'taxa_base': taxa_base,
+        'taxa_variacao': taxa_variacao,
+        'effect_size': effect_size,
+        'melhoria_relativa': effect_size / taxa_base * 100,
+        'poder_estatistico': poder,
+        'nivel_significancia': alpha,
+        'tipo_melhoria': np.where(melhoria > taxa_base, "relativa", "absoluta")
+    }
+    if escalar:
+        resultado = {k: v.item() for k, v in resultado.items()}
+    return resultado
+
+
+@medir()
+def resolver_efeito_minimo(taxa_base, trafego_diario, orcamento_dias, poder_estatistico=0.80, nivel_significancia=0.05,
+                           split_ratio=0.5, variancia='nao_agrupada', iteracoes=60):
+    """Menor efeito absoluto detectável com o tráfego disponível no orçamento.
+
+    Procura por bisseção, em todos os cenários ao mesmo tempo, o menor aumento
+    da taxa base que atinge o poder com n total = trafego_diario * orcamento_dias.
+    Cenários em que nem a taxa de variação 100% atinge o poder retornam NaN.
+    """
+    escalar = all(np.ndim(v) == 0 for v in (taxa_base, trafego_diario, orcamento_dias, poder_estatistico,
+                                            nivel_significancia, split_ratio))
+    taxa_base, trafego, dias, poder, alpha, split = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in
+          (taxa_base, trafego_diario, orcamento_dias, poder_estatistico, nivel_significancia, split_ratio))
+    )
+    n_controle, n_variacao = _dividir(trafego * dias, split)
+
+    def atinge(efeito):
+        return poder_teste(taxa_base, taxa_base + efeito, n_controle, n_variacao, alpha, variancia) >= poder
+
+    inferior = np.zeros(taxa_base.shape)
+    superior = (1 - taxa_base) * (1 - 1e-9)
+    possivel = atinge(superior)
+    for _ in range(iteracoes):
+        meio = (inferior + superior) / 2
+        ok = atinge(meio)
+        superior = np.where(ok, meio, superior)
+        inferior = np.where(ok, inferior, meio)
+
+    effect_size = np.where(possivel, superior, np.nan)
+    resultado = {
+        'effect_size': effect_size,
+        'taxa_variacao': taxa_base + effect_size,
+        'melhoria_relativa': effect_size / taxa_base * 100,
+        'n_controle': n_controle.astype(np.int64),
+        'n_variacao': n_variacao.astype(np.int64),
+        'n_total': (n_controle + n_variacao).astype(np.int64),
+    }
+    if escalar:
+        resultado = {k: v.item() for k, v in resultado.items()}
+    return resultado
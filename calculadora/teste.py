@@ -0,0 +1,44 @@
+"""Testes de significância para taxas de conversão"""
+import numpy as np
+
+from .instrumentacao import medir
+
+
+@medir()
+def calcular_teste_atual(conversions_a, visitors_a, conversions_b, visitors_b):
+    """Calcula métricas do teste atual
+
+    Aceita escalares ou colunas inteiras (arrays/Series). Com colunas, todas as
+    métricas são calculadas linha a linha em uma única passada vetorizada.
+    """
+    from scipy import special
+
+    escalar = all(np.ndim(v) == 0 for v in (conversions_a, visitors_a, conversions_b, visitors_b))
+    conversions_a, visitors_a, conversions_b, visitors_b = (
+        np.asarray(v, dtype=float) for v in (conversions_a, visitors_a, conversions_b, visitors_b)
+    )
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p_a = conversions_a / visitors_a
+        p_b = conversions_b / visitors_b
+        diff_abs = p_b - p_a
+        diff_rel = np.where(p_a > 0, diff_abs / p_a * 100, 0.0)
+
+        # Teste estatístico
+        p_pooled = (conversions_a + conversions_b) / (visitors_a + visitors_b)
+        se_diff = np.sqrt(p_pooled * (1 - p_pooled) * (1/visitors_a + 1/visitors_b))
+        z_score = np.where(se_diff > 0, diff_abs / se_diff, 0.0)
+    p_value = np.where(z_score != 0, 2 * special.ndtr(-np.abs(z_score)), 1.0)
+
+    # IC 95%
+    margin = 1.96 * se_diff
+    ci_lower = diff_abs - margin
+    ci_upper = diff_abs + margin
+
+    resultado = {
+        'p_a': p_a, 'p_b': p_b, 'diff_abs': diff_abs, 'diff_rel': diff_rel,
+        'z_score': z_score, 'p_value': p_value, 'ci_lower': ci_lower, 'ci_upper': ci_upper
+    }
+    if escalar:
+        resultado = {k: float(v) for k, v in resultado.items()}
+    return resultado
@@ -0,0 +1,72 @@
+"""Comparação dos testes exatos com o SciPy"""
+import numpy as np
+import pytest
+
+stats = pytest.importorskip("scipy.stats")
+
+from calculadora.exato import calcular_teste_exato, contagens_validas
+
+TABELAS = [
+    (0, 5, 3, 5), (1, 10, 6, 12), (3, 10, 11, 13), (8, 17, 2, 2), (9, 19, 13, 20),
+    (4, 25, 4, 25), (12, 30, 5, 28), (23, 30, 33, 38), (0, 1, 1, 1), (17, 40, 30, 45),
+]
+
+
+def _tabela(a, na, b, nb):
+    return [[a, b], [na - a, nb - b]]
+
+
+def _barnard_forca_bruta(a, na, b, nb, pontos=20_000):
+    """Barnard (z agrupado, bilateral) com supremo numa grade densa da taxa comum"""
+    xa, xb = np.arange(na + 1)[:, None], np.arange(nb + 1)[None, :]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        p = (xa + xb) / (na + nb)
+        z = np.nan_to_num((xb / nb - xa / na) / np.sqrt(p * (1 - p) * (1 / na + 1 / nb)))
+    extremas = np.abs(z) >= np.abs(z[a, b]) - 1e-9
+    taxas = np.linspace(0, 1, pontos + 2)[1:-1]
+    pa = stats.binom.pmf(np.arange(na + 1)[None, :], na, taxas[:, None])
+    pb = stats.binom.pmf(np.arange(nb + 1)[None, :], nb, taxas[:, None])
+    return np.einsum('ti,tj,ij->t', pa, pb, extremas).max()
+
+
+@pytest.mark.parametrize("tabela", TABELAS)
+def test_fisher_igual_scipy(tabela):
+    esperado = stats.fisher_exact(_tabela(*tabela)).pvalue
+    assert calcular_teste_exato(*tabela, metodo='fisher')['p_value'] == pytest.approx(esperado, rel=1e-9)
+
+
+@pytest.mark.parametrize("tabela", TABELAS)
+def test_boschloo_igual_scipy(tabela):
+    esperado = stats.boschloo_exact(_tabela(*tabela), n=128).pvalue
+    assert calcular_teste_exato(*tabela, metodo='boschloo')['p_value'] == pytest.approx(esperado, abs=5e-4)
+
+
+@pytest.mark.parametrize("tabela", TABELAS)
+def test_barnard_supremo(tabela):
+    # O otimizador do SciPy às vezes para num máximo local (ex.: 8/17 contra 2/2), então o
+    # p-valor dele é só um limite inferior; a referência é a grade densa.
+    obtido = calcular_teste_exato(*tabela, metodo='barnard')['p_value']
+    assert obtido >= stats.barnard_exact(_tabela(*tabela), n=128).pvalue - 5e-4
+    assert obtido == pytest.approx(_barnard_forca_bruta(*tabela), abs=5e-4)
+
+
+def test_lote_igual_escalar():
+    a, na, b, nb = (np.array(v) for v in zip(*TABELAS))
+    lote = calcular_teste_exato(a, na, b, nb, metodo='boschloo')['p_value']
+    escalares = [calcular_teste_exato(*t, metodo='boschloo')['p_value'] for t in TABELAS]
+    np.testing.assert_allclose(lote, escalares)
+
+
+def test_lote_com_linhas_invalidas():
+    a, na, b, nb = [5, 12, 3, 2], [10, 10, 0, 20], [4, 4, 1, 25], [10, 10, 10, 20]
+    assert contagens_validas(a, na, b, nb).tolist() == [True, False, False, False]
+    resultado = calcular_teste_exato(a, na, b, nb)
+    assert np.isfinite(resultado['p_value'][0])
+    assert np.isnan(resultado['p_value'][1:]).all()
+    assert np.isnan(resultado['p_value_normal'][1:]).all()
+
+
+@pytest.mark.parametrize("tabela", [(12, 10, 4, 10), (1, 0, 1, 10), (-1, 10, 1, 10)])
+def test_escalar_invalido(tabela):
+    with pytest.raises(ValueError):
+        calcular_teste_exato(*tabela)